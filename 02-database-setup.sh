@@ -78,6 +78,14 @@ DB_HOST = 'localhost'
 DB_USER = '${DB_USER}'
 DB_PASSWORD = '${DB_PASSWORD}'
 DB_NAME = '${DB_NAME}'
+# Connection pool size: roughly the WSGI threads (threads=5 in the Apache vhost) plus the background
+# schedulers/monitors/SMS senders that also hold connections. mysql-connector caps it at 32.
+DB_POOL_SIZE = 20
+# False skips the COM_RESET_CONNECTION round trip each time a connection goes back to the pool
+DB_POOL_RESET_SESSION = False
+# True gives each thread its own long-lived connection instead of using the pool. Leave it off unless
+# every thread that queries the DB is long-lived: each one keeps a MySQL connection open until it exits.
+DB_PINNED = False
 
 # Asterisk Manager Interface configuration
 # These values are set by 03-asterisk-setup.sh
@@ -101,6 +109,7 @@ TWILIO_MESSAGING_SERVICE_SID = ''
 DEBUG_MODE = False
 MAX_CONCURRENT_CALLS = 4
 MAX_SMS_PER_MINUTE = 10
+PUBLIC_BASE_URL = '' # e.g. 'https://infocall.example.com/' - used for Twilio status callbacks
 EOF
 
 log_message "config.py generated/updated with all default sections and database credentials."
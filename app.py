@@ -35,7 +35,6 @@ from flask import Flask, request, jsonify, redirect, url_for, session, render_te
 from werkzeug.utils import secure_filename
 from functools import wraps
 from zoneinfo import ZoneInfo
-from pydub import AudioSegment
 
 # Application-specific imports
 from config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, AMI_HOST, AMI_PORT, AMI_USERNAME, AMI_SECRET
@@ -108,6 +107,8 @@ root_logger.addFilter(AMIEventFilter())
 # Continue with app initialization
 app = Flask(__name__, template_folder='templates', static_folder='static', static_url_path='/static')
 app.secret_key = os.urandom(24) # Use a random key
+# Keep compiled templates resident; only re-stat template files when debugging (same switch as wsgi.py)
+app.config['TEMPLATES_AUTO_RELOAD'] = os.environ.get("INFOCALL_DEBUG") == "1"
 
 # --- Database Connection Pooling ---
 db_pool = None
@@ -1,5 +1,9 @@
 # app_state.py (formerly globals.py)
 import threading
+import re
+import heapq
+import time
+from array import array
 from datetime import datetime, timedelta, timezone
 import logging
 
@@ -17,16 +21,356 @@ except Exception as tz_error:
     USER_LOCAL_TIMEZONE = timezone.utc
 UTC_TIMEZONE = timezone.utc
 
+# Resolved once: a fixed-offset local zone (e.g. the UTC fallback above) converts with plain
+# arithmetic; a DST zone like America/New_York returns None here and goes through astimezone().
+_USER_LOCAL_FIXED_OFFSET = USER_LOCAL_TIMEZONE.utcoffset(None)
+
+def to_user_local(dt):
+    """Converts a datetime to USER_LOCAL_TIMEZONE. Naive values are treated as UTC (how the DB stores them)."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC_TIMEZONE)
+    if _USER_LOCAL_FIXED_OFFSET is not None:
+        return (dt - dt.utcoffset() + _USER_LOCAL_FIXED_OFFSET).replace(tzinfo=USER_LOCAL_TIMEZONE)
+    return dt.astimezone(USER_LOCAL_TIMEZONE)
+
 # Global variables for application state that require thread safety
 # These variables will be modified during runtime by multiple threads.
 
 # Dictionary to track active calls
-# Format: {campaign_id: {phone_number: {'status': status, 'details': details, 'timestamp': time, 'action_id': uuid_str, 'uniqueid': unique_asterisk_id, 'finalized_in_memory': bool}}}
+# Format: {campaign_id: {phone_number: CallEntry(status, details, ts, action_id, uniqueid, finalized)}}
+# Each campaign's inner dict is guarded by its lock stripe (campaign_calls_lock), so updates for
+# different campaigns mostly don't serialize on each other. active_calls_lock only guards the outer
+# dict: adding/removing campaign keys and taking the list of campaigns.
 active_calls = {}
-active_calls_lock = threading.Lock() # Lock to protect 'active_calls' dictionary
+active_calls_lock = threading.Lock() # Lock to protect the top level of 'active_calls'
+# Striped: a campaign maps to one of a fixed set of locks, so there's no per-campaign lock to create
+# or reclaim. Two campaigns may share a stripe; never hold one campaign's lock while taking another's.
+_CAMPAIGN_LOCK_STRIPES = 16
+_campaign_call_locks = tuple(threading.Lock() for _ in range(_CAMPAIGN_LOCK_STRIPES))
+
+class CallEntry:
+    """
+    One phone's entry in active_calls[campaign_id]. A slots object instead of a 6-key dict per
+    phone: a fraction of the memory on big campaigns. Read or modify it only under the campaign's lock.
+    """
+    __slots__ = ('status', 'details', 'ts', 'action_id', 'uniqueid', 'finalized')
+
+    def __init__(self, status, details=None, ts=None, action_id=None, uniqueid=None, finalized=False):
+        self.status = status
+        self.details = details
+        self.ts = ts if ts is not None else time.time() # epoch seconds of the last change; formatted on read
+        self.action_id = action_id
+        self.uniqueid = uniqueid
+        self.finalized = finalized
+
+    def to_dict(self):
+        """Plain dict copy, in the shape active_calls entries have always had in JSON/debug output."""
+        return {
+            'status': self.status,
+            'details': self.details,
+            'timestamp': datetime.fromtimestamp(self.ts, UTC_TIMEZONE),
+            'action_id': self.action_id,
+            'uniqueid': self.uniqueid,
+            'finalized_in_memory': self.finalized
+        }
+
+    def __repr__(self):
+        return f"CallEntry({self.to_dict()!r})"
+
+def campaign_calls_lock(campaign_id):
+    """Returns the lock guarding active_calls[campaign_id] (its stripe)."""
+    return _campaign_call_locks[hash(campaign_id) & (_CAMPAIGN_LOCK_STRIPES - 1)]
+
+def get_campaign_calls(campaign_id, create=False):
+    """
+    Returns the {phone: call_data} dict for a campaign (optionally creating it), or None.
+    Read or modify it only while holding campaign_calls_lock(campaign_id).
+    """
+    calls = active_calls.get(campaign_id)
+    if calls is None and create:
+        with active_calls_lock:
+            calls = active_calls.get(campaign_id)
+            added = calls is None
+            if added:
+                calls = active_calls[campaign_id] = {}
+        if added:
+            for listener in _campaign_added_listeners:
+                listener()
+    return calls
+
+# Called whenever get_campaign_calls adds a campaign; the call scheduler uses this to switch to its shorter
+# stuck-call check interval as soon as a campaign starts, wherever it was started from. Callers of
+# get_campaign_calls(create=True) usually hold that campaign's campaign_calls_lock stripe, so a listener
+# must be quick and must not block or take any campaign lock (e.g. just set an Event)
+_campaign_added_listeners = []
+
+def on_campaign_added(listener):
+    """
+    Registers a no-argument callable to run each time a campaign is added to active_calls.
+    It may run with the campaign's stripe lock held: don't block in it or take campaign locks.
+    """
+    _campaign_added_listeners.append(listener)
+
+def active_campaign_items():
+    """Snapshot list of (campaign_id, calls) pairs; lock each campaign before looking inside its calls."""
+    with active_calls_lock:
+        return list(active_calls.items())
+
+def active_campaign_ids():
+    """Snapshot tuple of campaign ids only; fetch each campaign's calls with get_campaign_calls under its lock."""
+    with active_calls_lock:
+        return tuple(active_calls)
+
+# Reverse indexes: action_id / Asterisk uniqueid -> (campaign_id, phone_number), so an AMI event is
+# matched to its call with one dict lookup instead of a scan over every campaign. They are updated
+# (under the campaign's lock) wherever an entry's ids change or an entry is dropped; an index can
+# still briefly point at a replaced entry, so callers re-check the entry under its lock.
+_action_id_index = {}
+_uniqueid_index = {}
+
+def index_call_ids(campaign_id, phone_number, entry, action_id=None, uniqueid=None):
+    """Sets entry's action_id/uniqueid (None leaves that id as is) and records them in the indexes."""
+    key = (campaign_id, phone_number)
+    if action_id is not None:
+        if entry.action_id is not None and entry.action_id != action_id:
+            _action_id_index.pop(entry.action_id, None)
+        entry.action_id = action_id
+        _action_id_index[action_id] = key
+    if uniqueid is not None:
+        if entry.uniqueid is not None and entry.uniqueid != uniqueid:
+            _uniqueid_index.pop(entry.uniqueid, None)
+        entry.uniqueid = uniqueid
+        _uniqueid_index[uniqueid] = key
+
+def unindex_call(entry):
+    """Drops an entry's ids from the indexes (when it's removed from or replaced in active_calls)."""
+    if entry.action_id is not None:
+        _action_id_index.pop(entry.action_id, None)
+    if entry.uniqueid is not None:
+        _uniqueid_index.pop(entry.uniqueid, None)
+
+def lookup_call_by_action_id(action_id):
+    """(campaign_id, phone_number) last indexed for action_id, or (None, None)."""
+    return _action_id_index.get(action_id, (None, None))
+
+def lookup_call_by_uniqueid(uniqueid):
+    """(campaign_id, phone_number) last indexed for uniqueid, or (None, None)."""
+    return _uniqueid_index.get(uniqueid, (None, None))
+
+# phone_number -> set of campaign_ids with an active_calls entry for it. Updated wherever a phone's
+# entry is added to or dropped from a campaign; its own small lock because two campaigns (on
+# different stripes) can touch the same phone at once. Take it after a campaign lock, never before.
+_phone_index = {}
+_phone_index_lock = threading.Lock()
+
+def index_phone(campaign_id, phone_number):
+    """Records that campaign_id has an entry for phone_number (no-op if already recorded)."""
+    with _phone_index_lock:
+        campaigns = _phone_index.get(phone_number)
+        if campaigns is None:
+            campaigns = _phone_index[phone_number] = set()
+        campaigns.add(campaign_id)
+
+def unindex_phone(campaign_id, phone_number):
+    """Forgets campaign_id's entry for phone_number."""
+    with _phone_index_lock:
+        campaigns = _phone_index.get(phone_number)
+        if campaigns is not None:
+            campaigns.discard(campaign_id)
+            if not campaigns:
+                del _phone_index[phone_number]
+
+def lookup_campaigns_by_phone(phone_number):
+    """Snapshot tuple of the campaign_ids that have an entry for phone_number."""
+    with _phone_index_lock:
+        return tuple(_phone_index.get(phone_number, ()))
+
+# Min-heap of (epoch seconds, campaign_id, phone_number), pushed whenever a call goes 'ringing'/'dialing',
+# so the stuck-call check pops just the calls that have been waiting long enough instead of walking every
+# entry. Items go stale once a call moves on; whoever pops one re-checks the live entry under its lock.
+_STUCK_WATCH_STATUSES = frozenset({'ringing', 'dialing'})
+_stuck_watch_heap = []
+_stuck_watch_lock = threading.Lock()
 
-# Dictionary to track active SMS messages (e.g., for rate limiting)
+def push_stuck_watch(ts, campaign_id, phone_number):
+    """(Re)schedules a stuck check for a call that has been ringing/dialing since ts."""
+    with _stuck_watch_lock:
+        heapq.heappush(_stuck_watch_heap, (ts, campaign_id, phone_number))
+
+def pop_stuck_watch_due(cutoff):
+    """Pops and returns every (ts, campaign_id, phone_number) pushed with ts before cutoff, oldest first."""
+    due = []
+    with _stuck_watch_lock:
+        while _stuck_watch_heap and _stuck_watch_heap[0][0] < cutoff:
+            due.append(heapq.heappop(_stuck_watch_heap))
+    return due
+
+# campaign_id -> {status: set of phone_numbers}: a campaign's active_calls entries grouped by status,
+# so counting the calls still in progress doesn't mean visiting every entry. Kept in step (under the
+# campaign's lock) wherever an entry is added, changes status or is dropped.
+_campaign_status_sets = {}
+
+def track_call_status(campaign_id, phone_number, old_status, new_status):
+    """Moves phone_number from old_status's set to new_status's; None means no entry on that side."""
+    if old_status == new_status:
+        return
+    status_sets = _campaign_status_sets.get(campaign_id)
+    if status_sets is None:
+        status_sets = _campaign_status_sets.setdefault(campaign_id, {})
+    if old_status is not None:
+        phones = status_sets.get(old_status)
+        if phones is not None:
+            phones.discard(phone_number)
+            if not phones:
+                del status_sets[old_status]
+    if new_status is not None:
+        phones = status_sets.get(new_status)
+        if phones is None:
+            phones = status_sets[new_status] = set()
+        phones.add(phone_number)
+        if new_status in _STUCK_WATCH_STATUSES:
+            push_stuck_watch(time.time(), campaign_id, phone_number)
+
+def drop_campaign_status_sets(campaign_id):
+    """Forgets a campaign's status sets (when the campaign is removed from active_calls)."""
+    _campaign_status_sets.pop(campaign_id, None)
+
+def campaign_status_sets(campaign_id):
+    """{status: set of phones} for a campaign; read it only while holding campaign_calls_lock(campaign_id)."""
+    return _campaign_status_sets.get(campaign_id, {})
+
+# Monotonic counter bumped on every mutation of 'active_calls'. Pollers compare it
+# against the value they last saw so they can skip re-walking an unchanged dict.
+_active_calls_generation = 0
+# Own lock (not a campaign lock), so a change in any campaign wakes waiters the same way
+active_calls_changed = threading.Condition()
+
+def bump_active_calls_generation():
+    """Marks 'active_calls' as changed. Safe to call while holding a campaign lock."""
+    global _active_calls_generation
+    with active_calls_changed:
+        _active_calls_generation += 1
+        active_calls_changed.notify_all()
+        return _active_calls_generation
+
+def get_active_calls_generation():
+    """Returns the current 'active_calls' generation (no lock needed for an int read)."""
+    return _active_calls_generation
+
+def wait_for_active_calls_generation(last_seen, timeout=None):
+    """
+    Blocks until the 'active_calls' generation differs from last_seen.
+    Returns the new generation, or None if the timeout expired first.
+    Must NOT be called with a campaign lock held.
+    """
+    with active_calls_changed:
+        if active_calls_changed.wait_for(lambda: _active_calls_generation != last_seen, timeout=timeout):
+            return _active_calls_generation
+        return None
+
+# --- SMS recipient state ---
+# One byte per recipient instead of a small dict per status update. Codes index SMS_STATUSES.
+SMS_STATUSES = ('unknown', 'pending', 'queued', 'sending', 'sent', 'delivered', 'failed',
+                'opted_out', 'waiting', 'aborted', 'receiving', 'received')
+SMS_STATUS_CODES = {name: code for code, name in enumerate(SMS_STATUSES)}
+SMS_UNKNOWN = SMS_STATUS_CODES['unknown']
+SMS_ABORTED = SMS_STATUS_CODES['aborted']
+# Still-outstanding states an admin abort flips to 'aborted'; the table/regex let that run as C-level byte scans
+_SMS_ABORTABLE = bytes(SMS_STATUS_CODES[name] for name in ('pending', 'sending', 'queued', 'unknown'))
+_SMS_ABORT_TABLE = bytes(SMS_ABORTED if code in _SMS_ABORTABLE else code for code in range(256))
+_SMS_ABORTABLE_RE = re.compile(b'[' + re.escape(_SMS_ABORTABLE) + b']')
+
+class SMSCampaignState:
+    """
+    Per-campaign recipient state in column (SoA) layout: a phone's slot index addresses
+    parallel status/timestamp/details columns. Slots are only ever appended, so an index
+    handed out stays valid. Read or mutate only while holding the campaign's own lock.
+    """
+    __slots__ = ('lock', 'phones', 'phone_index', 'status', 'timestamps', 'details', 'version')
+
+    def __init__(self):
+        self.lock = threading.Lock() # per campaign, so callbacks/polls for different campaigns don't contend
+        self.phones = []
+        self.phone_index = {}
+        self.status = bytearray()
+        self.timestamps = array('d') # epoch seconds (UTC)
+        self.details = []
+        self.version = 0 # bumped on every change
+
+    def __len__(self):
+        return len(self.phones)
+
+    def __contains__(self, phone):
+        return phone in self.phone_index
+
+    def get_status(self, phone, default=''):
+        """Status name for phone, or default if it has no entry."""
+        idx = self.phone_index.get(phone)
+        return default if idx is None else SMS_STATUSES[self.status[idx]]
+
+    def get(self, phone):
+        """Returns {'status', 'details', 'timestamp'} for phone, or None if it has no entry."""
+        idx = self.phone_index.get(phone)
+        if idx is None:
+            return None
+        return {'status': SMS_STATUSES[self.status[idx]], 'details': self.details[idx],
+                'timestamp': datetime.fromtimestamp(self.timestamps[idx], timezone.utc)}
+
+    def set(self, phone, status, details, epoch_seconds):
+        """Records status for phone (as of epoch_seconds, UTC), allocating a slot on first sight."""
+        code = SMS_STATUS_CODES.get(status)
+        if code is None:
+            logging.warning(f"Unrecognised SMS status '{status}' for {phone}; storing as 'unknown'")
+            code = SMS_UNKNOWN
+        idx = self.phone_index.get(phone)
+        if idx is None:
+            self.phone_index[phone] = len(self.phones)
+            self.phones.append(phone)
+            self.status.append(code)
+            self.timestamps.append(epoch_seconds)
+            self.details.append(details)
+        else:
+            self.status[idx] = code
+            self.timestamps[idx] = epoch_seconds
+            self.details[idx] = details
+        self.version += 1
+
+    def abort_outstanding(self, details, epoch_seconds):
+        """Flips every pending/sending/queued/unknown slot to 'aborted'. Returns the affected phones."""
+        positions = [match.start() for match in _SMS_ABORTABLE_RE.finditer(self.status)]
+        if not positions:
+            return []
+        self.status[:] = self.status.translate(_SMS_ABORT_TABLE)
+        for idx in positions:
+            self.timestamps[idx] = epoch_seconds
+            self.details[idx] = details
+        self.version += 1
+        return [self.phones[idx] for idx in positions]
+
+    def snapshot(self):
+        """
+        Copies the columns so they can be read after the lock is released:
+        (phone_index, status_bytes, timestamps, details). phone_index is shared rather than copied;
+        it only grows, so any index >= len(status_bytes) just means "added after the snapshot".
+        """
+        return self.phone_index, bytes(self.status), array('d', self.timestamps), list(self.details)
+
+# Tracks active SMS recipients: {campaign_id: SMSCampaignState}
 active_sms = {}
-active_sms_lock = threading.Lock() # Lock to protect 'active_sms' dictionary
+active_sms_lock = threading.Lock() # Only guards adding campaigns to 'active_sms'; each state has its own lock
+
+def get_sms_campaign_state(campaign_id, create=False):
+    """
+    Looks up (optionally creating) a campaign's SMSCampaignState. No lock needed by the caller;
+    take state.lock before touching the state itself.
+    """
+    state = active_sms.get(campaign_id)
+    if state is None and create:
+        with active_sms_lock:
+            # Re-check under the lock so two threads can't both create the campaign
+            state = active_sms.get(campaign_id)
+            if state is None:
+                state = active_sms[campaign_id] = SMSCampaignState()
+    return state
 
 # Note: concurrent_call_limit and concurrent_sms_limit have been moved to config.py
\ No newline at end of file
@@ -119,6 +119,7 @@ CREATE TABLE `scheduled_calls` (
   PRIMARY KEY (`id`),
   KEY `announcement_id` (`announcement_id`),
   KEY `created_by` (`created_by`),
+  KEY `status_scheduled_datetime` (`status`,`scheduled_datetime`),
   CONSTRAINT `scheduled_calls_ibfk_1` FOREIGN KEY (`announcement_id`) REFERENCES `announcements` (`id`),
   CONSTRAINT `scheduled_calls_ibfk_2` FOREIGN KEY (`created_by`) REFERENCES `users` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=14 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
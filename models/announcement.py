@@ -12,7 +12,7 @@ class Announcement:
     def get_all_paged(cls, per_page, offset):
         """Fetches announcements with pagination."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 query = "SELECT id, filename, upload_date FROM announcements ORDER BY upload_date DESC LIMIT %s OFFSET %s"
                 cursor.execute(query, (per_page, offset))
                 return cursor.fetchall()
@@ -24,7 +24,7 @@ class Announcement:
     def get_count(cls):
         """Fetches the total count of announcements."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 cursor.execute("SELECT COUNT(*) as count FROM announcements")
                 result = cursor.fetchone()
                 return result['count'] if result else 0
@@ -36,7 +36,7 @@ class Announcement:
     def get_by_filename(cls, filename):
         """Checks if an announcement with a given filename exists."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 cursor.execute("SELECT id, filename, upload_date FROM announcements WHERE filename = %s", (filename,))
                 data = cursor.fetchone()
                 if data:
@@ -91,7 +91,7 @@ class Announcement:
     def get_all_filenames(cls):
         """Retrieves all filenames from the database mapped to their IDs."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 cursor.execute("SELECT id, filename FROM announcements")
                 return {row['filename']: row['id'] for row in cursor.fetchall()}
         except Exception as e:
@@ -120,7 +120,7 @@ class Announcement:
     def get_filename_by_id(cls, announcement_id):
         """Fetches the filename for a given announcement ID."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 cursor.execute("SELECT filename FROM announcements WHERE id = %s", (announcement_id,))
                 result = cursor.fetchone()
                 return result['filename'] if result else None
@@ -11,7 +11,7 @@ class AppSetting:
     def get(cls, setting_name):
         """Fetches a single application setting by name."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 cursor.execute("SELECT setting_value FROM app_settings WHERE setting_name = %s", (setting_name,))
                 result = cursor.fetchone()
                 return result['setting_value'] if result else None
@@ -18,7 +18,7 @@ class Call:
     def get_all_scheduled(cls):
         """Fetches all scheduled calls with associated announcement and group names."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 query = """
                     SELECT sc.id, a.filename, sc.scheduled_datetime, sc.caller_id_name,
                            COALESCE(g.name, 'all') as group_filter_name, sc.status
@@ -37,7 +37,7 @@ class Call:
     def get_by_id(cls, call_id):
         """Fetches a single scheduled call by ID with associated details."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 query = """
                     SELECT sc.id, a.id as announcement_id, a.filename,
                            sc.scheduled_datetime, sc.group_filter, sc.caller_id_name, sc.status,
@@ -104,7 +104,7 @@ class Call:
     def get_pending_calls_for_scheduling(cls, now_utc):
         """Fetches pending calls whose scheduled_datetime (UTC) has passed."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 query = """
                     SELECT id, announcement_id, group_filter, caller_id_name
                     FROM scheduled_calls
@@ -117,11 +117,37 @@ class Call:
             logging.error(f"Error fetching pending calls for scheduling: {e}", exc_info=True)
             return []
 
+    @classmethod
+    def get_next_scheduled_time(cls):
+        """Earliest scheduled_datetime (UTC, naive as stored) among pending calls, or None."""
+        try:
+            with get_db_cursor(readonly=True) as (cursor, connection):
+                cursor.execute("SELECT MIN(scheduled_datetime) FROM scheduled_calls WHERE status = 'pending'")
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            logging.error(f"Error fetching next scheduled call time: {e}", exc_info=True)
+            return None
+
+    @classmethod
+    def get_statuses_by_ids(cls, campaign_ids):
+        """{str(id): status} for the given campaign IDs in one query (missing IDs are left out); None on DB error."""
+        if not campaign_ids:
+            return {}
+        try:
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
+                format_strings = ','.join(['%s'] * len(campaign_ids))
+                cursor.execute(f"SELECT id, status FROM scheduled_calls WHERE id IN ({format_strings})", tuple(campaign_ids))
+                return {str(row['id']): row['status'] for row in cursor.fetchall()}
+        except Exception as e:
+            logging.error(f"Error fetching campaign statuses: {e}", exc_info=True)
+            return None
+
     @classmethod
     def get_active_campaign_ids(cls, campaign_ids):
         """Fetches active campaign IDs from the database."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 format_strings = ','.join(['%s'] * len(campaign_ids))
                 cursor.execute(f"SELECT id, status FROM scheduled_calls WHERE id IN ({format_strings})", tuple(campaign_ids))
                 return {str(row['id']) for row in cursor.fetchall() if row['status'] in ['in_progress', 'ready']}
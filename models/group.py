@@ -1,7 +1,14 @@
 # models/group.py
 import logging
+import threading
+import time
 from utils.db import get_db_cursor
 
+# Short-lived process-local cache for get_all_simple(); groups change rarely but are listed on every form
+GROUPS_CACHE_TTL_SECONDS = 30
+_groups_cache = None # (expires_at, rows)
+_groups_cache_lock = threading.Lock()
+
 class Group:
     def __init__(self, id, name, description):
         self.id = id
@@ -12,7 +19,7 @@ class Group:
     def get_all_with_member_count(cls):
         """Fetches all groups with their member counts."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 query = """
                     SELECT g.*, COUNT(mg.member_id) as member_count
                     FROM groups g
@@ -28,15 +35,30 @@ class Group:
 
     @classmethod
     def get_all_simple(cls):
-        """Fetches all groups (ID and Name only)."""
+        """Fetches all groups (ID and Name only), served from a short TTL cache."""
+        global _groups_cache
+        with _groups_cache_lock:
+            cached = _groups_cache
+        if cached and cached[0] > time.monotonic():
+            return list(cached[1])
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 cursor.execute("SELECT id, name FROM groups ORDER BY name")
-                return cursor.fetchall()
+                rows = cursor.fetchall()
+            with _groups_cache_lock:
+                _groups_cache = (time.monotonic() + GROUPS_CACHE_TTL_SECONDS, rows)
+            return list(rows)
         except Exception as e:
             logging.error(f"Error fetching simple group list: {e}", exc_info=True)
             return []
 
+    @classmethod
+    def invalidate_cache(cls):
+        """Drops the cached group list so the next get_all_simple() hits the database."""
+        global _groups_cache
+        with _groups_cache_lock:
+            _groups_cache = None
+
     @classmethod
     def add(cls, name, description):
         """Adds a new group."""
@@ -45,6 +67,7 @@ class Group:
                 query = "INSERT INTO groups (name, description) VALUES (%s, %s)"
                 cursor.execute(query, (name, description))
                 connection.commit()
+                cls.invalidate_cache()
                 return cursor.lastrowid
         except Exception as e:
             logging.error(f"Error adding group {name}: {e}", exc_info=True)
@@ -59,24 +82,8 @@ class Group:
                 cursor.execute(query, (group_id,))
                 rows_affected = cursor.rowcount
                 connection.commit()
+                cls.invalidate_cache()
                 return rows_affected > 0
         except Exception as e:
             logging.error(f"Error deleting group {group_id}: {e}", exc_info=True)
             raise
-
-    @classmethod
-    def get_by_name(cls, group_name):
-        """Fetches a group by name, creating it if it doesn't exist."""
-        try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
-                cursor.execute("SELECT id FROM groups WHERE name = %s", (group_name,))
-                group_result = cursor.fetchone()
-                group_id = group_result['id'] if group_result else None
-                if not group_id:
-                    cursor.execute("INSERT INTO groups (name) VALUES (%s)", (group_name,))
-                    group_id = cursor.lastrowid
-                    connection.commit() # Commit the new group creation
-                return group_id
-        except Exception as e:
-            logging.error(f"Error getting/creating group by name {group_name}: {e}", exc_info=True)
-            raise
\ No newline at end of file
@@ -3,6 +3,9 @@ import logging
 from utils.db import get_db_cursor
 
 class Member:
+    # Fixed attribute set: no per-instance __dict__, and templates only see these fields
+    __slots__ = ('id', 'first_name', 'last_name', 'phone_number', 'remove_from_call')
+
     def __init__(self, id, first_name, last_name, phone_number, remove_from_call=False):
         self.id = id
         self.first_name = first_name
@@ -12,13 +15,14 @@ class Member:
 
     @classmethod
     def get_all_with_groups(cls):
-        """Fetches all members with their associated groups."""
+        """Fetches all members with their associated groups in a single query."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
+                # Unit separator keeps the id/name lists aligned even if a group name contains a comma
                 query = """
                     SELECT m.id, m.last_name, m.first_name, m.phone_number, m.remove_from_call,
-                           GROUP_CONCAT(g.id ORDER BY g.name SEPARATOR ',') as group_ids,
-                           GROUP_CONCAT(g.name ORDER BY g.name SEPARATOR ',') as group_names
+                           GROUP_CONCAT(g.id ORDER BY g.name SEPARATOR 0x1f) as group_ids,
+                           GROUP_CONCAT(g.name ORDER BY g.name SEPARATOR 0x1f) as group_names
                     FROM members m
                     LEFT JOIN member_groups mg ON m.id = mg.member_id
                     LEFT JOIN groups g ON mg.group_id = g.id
@@ -27,11 +31,12 @@ class Member:
                 cursor.execute(query)
                 members_data = cursor.fetchall()
                 for member_data in members_data:
-                    member_data['groups'] = []
-                    if member_data.get('group_ids'):
-                        group_ids = member_data['group_ids'].split(',')
-                        group_names = member_data.get('group_names', '').split(',') if member_data.get('group_names') else []
-                        member_data['groups'] = [{'id': gid, 'name': name} for gid, name in zip(group_ids, group_names)]
+                    group_ids = member_data.get('group_ids')
+                    group_names = member_data.get('group_names')
+                    if group_ids:
+                        member_data['groups'] = [{'id': gid, 'name': name} for gid, name in zip(group_ids.split('\x1f'), (group_names or '').split('\x1f'))]
+                    else:
+                        member_data['groups'] = []
                 return members_data
         except Exception as e:
             logging.error(f"Error fetching all members with groups: {e}", exc_info=True)
@@ -41,7 +46,7 @@ class Member:
     def get_by_id(cls, member_id):
         """Fetches a single member by ID."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 cursor.execute("SELECT id, first_name, last_name, phone_number, remove_from_call FROM members WHERE id = %s", (member_id,))
                 member_data = cursor.fetchone()
                 if member_data:
@@ -52,21 +57,33 @@ class Member:
             return None
 
     @classmethod
-    def get_member_groups(cls, member_id):
-        """Fetches groups associated with a member."""
+    def get_by_id_with_groups(cls, member_id):
+        """Fetches a member and their group IDs (as strings) in one query. Returns (member, group_ids)."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
-                cursor.execute("SELECT group_id FROM member_groups WHERE member_id = %s", (member_id,))
-                return [str(row['group_id']) for row in cursor.fetchall()]
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
+                query = """
+                    SELECT m.id, m.first_name, m.last_name, m.phone_number, m.remove_from_call,
+                           GROUP_CONCAT(mg.group_id) as group_ids
+                    FROM members m
+                    LEFT JOIN member_groups mg ON m.id = mg.member_id
+                    WHERE m.id = %s
+                    GROUP BY m.id
+                """
+                cursor.execute(query, (member_id,))
+                member_data = cursor.fetchone()
+                if not member_data:
+                    return None, []
+                group_ids = member_data.pop('group_ids')
+                return cls(**member_data), group_ids.split(',') if group_ids else []
         except Exception as e:
-            logging.error(f"Error fetching groups for member {member_id}: {e}", exc_info=True)
-            return []
+            logging.error(f"Error fetching member {member_id} with groups: {e}", exc_info=True)
+            return None, []
 
     @classmethod
     def exists_by_phone_number(cls, phone_number, exclude_member_id=None):
         """Checks if a phone number already exists, optionally excluding a specific member ID."""
         try:
-            with get_db_cursor() as (cursor, connection):
+            with get_db_cursor(readonly=True) as (cursor, connection):
                 if exclude_member_id:
                     cursor.execute("SELECT COUNT(*) FROM members WHERE phone_number = %s AND id != %s", (phone_number, exclude_member_id))
                 else:
@@ -162,7 +179,7 @@ class Member:
             else:
                 member_query = base_member_query + " ORDER BY m.last_name, m.first_name"
 
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 cursor.execute(member_query, tuple(member_params))
                 return cursor.fetchall()
         except Exception as e:
@@ -184,7 +201,7 @@ class Member:
             filter_clause = " AND (m.remove_from_call = 0 OR m.remove_from_call IS NULL)" if group_filter else " WHERE (m.remove_from_call = 0 OR m.remove_from_call IS NULL)"
             full_query = base_member_query + (filter_clause if not is_completed_sms else "") + " ORDER BY m.id"
 
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 cursor.execute(full_query, tuple(member_params))
                 return cursor.fetchall()
         except Exception as e:
@@ -3,6 +3,10 @@ import logging
 from utils.db import get_db_cursor
 from datetime import datetime
 
+# Fixed statements for the write paths, built once at import
+_INSERT_SCHEDULED_SMS = "INSERT INTO scheduled_sms (message_text, scheduled_datetime, group_filter, created_by, status) VALUES (%s, %s, %s, %s, %s)"
+_UPDATE_SMS_STATUS = "UPDATE scheduled_sms SET status = %s WHERE id = %s"
+
 class SMS:
     def __init__(self, id, message_text, scheduled_datetime, group_filter, created_by, status):
         self.id = id
@@ -16,7 +20,7 @@ class SMS:
     def get_all_scheduled(cls):
         """Fetches all scheduled SMS with associated group names."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 query = """
                     SELECT ss.id, ss.message_text, ss.scheduled_datetime,
                            COALESCE(g.name, 'all') as group_filter_name, ss.status
@@ -34,7 +38,7 @@ class SMS:
     def get_by_id(cls, sms_id):
         """Fetches a single scheduled SMS by ID with associated details."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 query = """
                     SELECT ss.id, ss.message_text, ss.scheduled_datetime, ss.group_filter, ss.status,
                            COALESCE(g.name, 'all') as group_name
@@ -52,8 +56,7 @@ class SMS:
         """Creates a new scheduled SMS record."""
         try:
             with get_db_cursor() as (cursor, connection):
-                query = "INSERT INTO scheduled_sms (message_text, scheduled_datetime, group_filter, created_by, status) VALUES (%s, %s, %s, %s, %s)"
-                cursor.execute(query, (message_text, scheduled_datetime, group_id, user_id, status))
+                cursor.execute(_INSERT_SCHEDULED_SMS, (message_text, scheduled_datetime, group_id, user_id, status))
                 last_row_id = cursor.lastrowid
                 connection.commit()
                 return last_row_id
@@ -80,10 +83,10 @@ class SMS:
         """Updates the status of a scheduled SMS campaign."""
         try:
             with get_db_cursor() as (cursor, connection):
+                # scheduled_sms has no details column; the reason only goes to the log
+                cursor.execute(_UPDATE_SMS_STATUS, (status, sms_id))
                 if details:
-                    cursor.execute("UPDATE scheduled_sms SET status = %s, details = %s WHERE id = %s", (status, details, sms_id))
-                else:
-                    cursor.execute("UPDATE scheduled_sms SET status = %s WHERE id = %s", (status, sms_id))
+                    logging.debug(f"SMS {sms_id} -> {status}: {details}")
                 rows_updated = cursor.rowcount
                 connection.commit()
                 return rows_updated > 0
@@ -91,11 +94,40 @@ class SMS:
             logging.error(f"Error updating status for SMS {sms_id} to {status}: {e}", exc_info=True)
             raise
 
+    @classmethod
+    def update_status_with_previous(cls, sms_id, status, details=None):
+        """
+        Updates a campaign's status and reports what it was, in one transaction.
+        Returns (updated, previous_status); previous_status is None if the campaign doesn't exist.
+        A campaign already in the target status is left untouched and reported as not updated.
+        """
+        try:
+            with get_db_cursor() as (cursor, connection):
+                cursor.execute("SELECT status FROM scheduled_sms WHERE id = %s FOR UPDATE", (sms_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    connection.rollback()
+                    return False, None
+                previous_status = row[0]
+                if previous_status == status:
+                    connection.rollback() # nothing to write; just releases the row lock
+                    return False, previous_status
+                # scheduled_sms has no details column; the reason only goes to the log
+                cursor.execute(_UPDATE_SMS_STATUS, (status, sms_id))
+                if details:
+                    logging.debug(f"SMS {sms_id} -> {status}: {details}")
+                rows_updated = cursor.rowcount
+                connection.commit()
+                return rows_updated > 0, previous_status
+        except Exception as e:
+            logging.error(f"Error updating status for SMS {sms_id} to {status}: {e}", exc_info=True)
+            raise
+
     @classmethod
     def get_pending_sms_for_scheduling(cls, now):
         """Fetches pending SMS whose scheduled_datetime has passed."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 query = "SELECT id, message_text, group_filter FROM scheduled_sms WHERE scheduled_datetime <= %s AND status = 'pending'"
                 cursor.execute(query, (now,))
                 return cursor.fetchall()
@@ -103,6 +135,18 @@ class SMS:
             logging.error(f"Error fetching pending SMS for scheduling: {e}", exc_info=True)
             return []
 
+    @classmethod
+    def get_next_scheduled_time(cls):
+        """Earliest scheduled_datetime (UTC, naive as stored) among pending SMS campaigns, or None."""
+        try:
+            with get_db_cursor(readonly=True) as (cursor, connection):
+                cursor.execute("SELECT MIN(scheduled_datetime) FROM scheduled_sms WHERE status = 'pending'")
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            logging.error(f"Error fetching next scheduled SMS time: {e}", exc_info=True)
+            return None
+
 class SMSSessionStatus:
     def __init__(self, id, scheduled_sms_id, member_id, phone_number, status, details, twilio_sid=None, created_at=None, updated_at=None):
         self.id = id
@@ -145,7 +189,7 @@ class SMSSessionStatus:
     def get_by_twilio_sid(cls, twilio_sid):
         """Fetches SMS status details by Twilio SID."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 query = "SELECT scheduled_sms_id, member_id, phone_number FROM sms_status WHERE twilio_sid = %s LIMIT 1"
                 cursor.execute(query, (twilio_sid,))
                 return cursor.fetchone()
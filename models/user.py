@@ -16,7 +16,7 @@ class User:
     def get_by_email(cls, email):
         """Fetches a user by email."""
         try:
-            with get_db_cursor(dictionary=True) as (cursor, connection):
+            with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
                 query = "SELECT id, email, password, phone_number, ivr_passcode_hash, role FROM users WHERE email = %s"
                 cursor.execute(query, (email,))
                 user_data = cursor.fetchone()
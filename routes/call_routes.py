@@ -2,12 +2,16 @@ import os
 import subprocess
 import math
 from datetime import datetime, timedelta
-from flask import render_template, request, redirect, url_for, flash, session, jsonify, abort
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, abort, Response
 from werkzeug.utils import secure_filename
 import logging
 import uuid
 import time # Added for sleep in retry logic
-from pydub import AudioSegment
+import concurrent.futures
+import threading
+import json
+import gzip
+import hashlib
 
 from . import call_bp
 from models.announcement import Announcement
@@ -19,13 +23,14 @@ from models.member import Member
 # REMOVED is_call_complete and run_asterisk_command from direct import.
 # run_asterisk_command will be accessed via the services.asterisk_service module.
 from services.asterisk_service import ami_client_instance, update_call_status 
+from services.call_service import wake_call_scheduler
 # Import the entire asterisk_service module to access run_asterisk_command
 import services.asterisk_service as asterisk_service_module # Renamed for clarity
 from utils.security import login_required
 from utils.validation import validate_caller_id_name
 
 # Corrected Imports to resolve circular dependency
-from app_state import active_calls, active_calls_lock, USER_LOCAL_TIMEZONE, UTC_TIMEZONE # type: ignore
+from app_state import CallEntry, unindex_call, index_phone, track_call_status, active_calls, active_campaign_items, campaign_calls_lock, get_campaign_calls, bump_active_calls_generation, get_active_calls_generation, wait_for_active_calls_generation, USER_LOCAL_TIMEZONE, UTC_TIMEZONE # type: ignore
 from config import MAX_CONCURRENT_CALLS # type: ignore
 
 
@@ -83,6 +88,7 @@ def ann_upload():
 
                 try:
                     logging.info(f"Adding 3 seconds of leading silence to {final_file_path}")
+                    from pydub import AudioSegment # imported on first upload rather than at worker start
                     audio = AudioSegment.from_wav(final_file_path) # This should be 8000Hz from ffmpeg
 
                     # Ensure silence is also 8000Hz (or matches the audio's frame rate)
@@ -356,6 +362,7 @@ def call_mem():
         group_id = group if group != "all" else None
         last_row_id = Call.create(announcement_id, scheduled_dt_utc, group_id, user_id, caller_id_name)
         logging.info(f"Scheduled call inserted with ID: {last_row_id} for UTC time {scheduled_dt_utc}")
+        wake_call_scheduler()
 
         # Format local time for display in flash message
         flash(f"Call scheduled successfully for {local_dt_aware.strftime('%Y-%m-%d %I:%M %p %Z')} (ID: {last_row_id}). Status: PENDING.", "success")
@@ -480,14 +487,13 @@ def execute_call(call_id):
         campaign_calls_data = active_calls.get(str(call_id), {})
         for member in members:
             phone = member['phone_number']
-            status_data = campaign_calls_data.get(phone, {})
-            member['call_status'] = status_data.get('status', 'pending')
-            member['call_details'] = status_data.get('details', '')
+            status_data = campaign_calls_data.get(phone)
+            member['call_status'] = status_data.status if status_data else 'pending'
+            member['call_details'] = status_data.details if status_data else ''
             
             # Format timestamp for display only here
-            timestamp_utc = status_data.get('timestamp')
-            if isinstance(timestamp_utc, datetime):
-                member['call_timestamp'] = timestamp_utc.astimezone(USER_LOCAL_TIMEZONE).strftime('%I:%M:%S %p')
+            if status_data is not None:
+                member['call_timestamp'] = datetime.fromtimestamp(status_data.ts, USER_LOCAL_TIMEZONE).strftime('%I:%M:%S %p')
             else:
                 member['call_timestamp'] = '-' # Or original string if conversion fails
 
@@ -527,10 +533,10 @@ def execute_call(call_id):
 @login_required
 def originate_call():
     active_call_count = 0
-    with active_calls_lock:
-        for campaign_id_key in active_calls:
-            for phone_status_data in active_calls[campaign_id_key].values():
-                if phone_status_data.get('status') in ['ringing', 'dialing', 'answered']:
+    for campaign_id_key, calls in active_campaign_items():
+        with campaign_calls_lock(campaign_id_key):
+            for phone_status_data in calls.values():
+                if phone_status_data.status in ['ringing', 'dialing', 'answered']:
                     active_call_count += 1
     if active_call_count >= MAX_CONCURRENT_CALLS: # Used MAX_CONCURRENT_CALLS from config.py
         logging.warning(f"Max concurrent call limit ({MAX_CONCURRENT_CALLS}) reached. Call request rejected.")
@@ -698,6 +704,8 @@ def abort_calls(call_id):
 
         if Call.update_status(call_id, 'cancelled', 'Aborted by admin'):
             logging.info(f"Marked call campaign {call_id} as 'cancelled' in DB by user {session.get('user_email')}.")
+            from services.call_service import stop_campaign_dialing
+            stop_campaign_dialing(call_id)
         else:
             call_info_check = Call.get_by_id(call_id)
             if call_info_check:
@@ -707,15 +715,18 @@ def abort_calls(call_id):
         
         # Use the imported run_asterisk_command
         phones_to_hangup = []
-        with active_calls_lock:
-            if campaign_id_str in active_calls:
-                for phone_number, status_data in list(active_calls[campaign_id_str].items()):
-                    if status_data.get('status') in ['ringing', 'dialing', 'answered']:
+        campaign_calls = get_campaign_calls(campaign_id_str)
+        if campaign_calls is not None:
+            with campaign_calls_lock(campaign_id_str):
+                for phone_number, status_data in campaign_calls.items():
+                    if status_data.status in ['ringing', 'dialing', 'answered']:
                         phones_to_hangup.append(phone_number)
-                        # Mark as aborted with current UTC time
-                        update_call_status(campaign_id_str, phone_number, 'aborted', 'Aborted by admin') # Use the update_call_status function
-                        aborted_in_memory_count += 1
-                        logging.info(f"Marked call to {phone_number} for campaign {campaign_id_str} as 'aborted' in memory.")
+        # update_call_status takes the campaign lock itself, so it has to run after we release it
+        for phone_number in phones_to_hangup:
+            # Mark as aborted with current UTC time
+            update_call_status(campaign_id_str, phone_number, 'aborted', 'Aborted by admin') # Use the update_call_status function
+            aborted_in_memory_count += 1
+            logging.info(f"Marked call to {phone_number} for campaign {campaign_id_str} as 'aborted' in memory.")
         
         if not phones_to_hangup:
             logging.info(f"No active calls found in memory for campaign {campaign_id_str} to abort.")
@@ -775,11 +786,12 @@ def batch_call_status():
     if not phone_numbers:
         return jsonify({"success": False, "message": "No phone numbers provided"}), 400
     results = {}
-    with active_calls_lock:
-        campaign_calls = active_calls.get(campaign_id_str, {})
+    campaign_calls = get_campaign_calls(campaign_id_str) or {}
+    with campaign_calls_lock(campaign_id_str):
         for phone in phone_numbers:
             clean_phone = phone.strip()
-            status_data = campaign_calls.get(clean_phone, {}).copy()
+            entry = campaign_calls.get(clean_phone)
+            status_data = entry.to_dict() if entry is not None else {}
             # If timestamp is a datetime object, convert it to string for JSON response
             if 'timestamp' in status_data and isinstance(status_data['timestamp'], datetime):
                 status_data['timestamp'] = status_data['timestamp'].astimezone(USER_LOCAL_TIMEZONE).strftime('%I:%M:%S %p')
@@ -799,7 +811,19 @@ from flask import jsonify, request
 from datetime import datetime
 import services.call_service as call_service
 import services.asterisk_service as asterisk_service
-from app_state import active_calls, active_calls_lock
+from app_state import active_calls
+
+# Small dedicated pool for the AMI connection test so a hung socket only ties up these threads
+AMI_TEST_TIMEOUT_SECONDS = 3
+_ami_test_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='ami-test')
+DEBUG_STREAM_KEEPALIVE_SECONDS = 20
+# Each open stream holds a mod_wsgi thread (threads=5), so only a couple may be open at once; the rest get a 503
+# and the dashboard falls back to polling. Streams also end after a while and the browser reconnects.
+DEBUG_STREAM_MAX_CLIENTS = 2
+DEBUG_STREAM_MAX_SECONDS = 300
+DEBUG_STREAM_MIN_INTERVAL_SECONDS = 0.5 # at most two snapshots a second, however fast calls change
+DEBUG_STREAM_RETRY_MS = 2000
+_debug_stream_slots = threading.BoundedSemaphore(DEBUG_STREAM_MAX_CLIENTS)
 
 @call_bp.route("/api/debug/call_history/<campaign_id>/<phone_number>", methods=["GET"])
 @login_required
@@ -811,20 +835,33 @@ def get_call_debug_history(campaign_id, phone_number):
         # Format timestamps for JSON
         formatted_history = []
         for entry in history:
-            formatted_entry = entry.copy()
-            formatted_entry['timestamp'] = entry['timestamp'].isoformat()
+            formatted_entry = {'timestamp': call_service.call_debug_entry_time(entry).isoformat(), 'action': entry['action'], 'details': entry['details']}
             formatted_history.append(formatted_entry)
         
         return jsonify({
             "success": True,
             "campaign_id": campaign_id,
             "phone_number": phone_number,
-            "history": formatted_history
+            "history": formatted_history,
+            "capture_enabled": call_service.is_debug_capture_enabled()
         })
     except Exception as e:
         logging.error(f"Error getting call debug history: {e}", exc_info=True)
         return jsonify({"success": False, "message": str(e)}), 500
 
+@call_bp.route("/api/debug/capture", methods=["GET", "POST"])
+@login_required
+def debug_capture():
+    """Get or set whether per-call debug history is being captured"""
+    try:
+        if request.method == "POST":
+            data = request.get_json(silent=True) or {}
+            call_service.set_debug_capture(data.get('enabled', False))
+        return jsonify({"success": True, "enabled": call_service.is_debug_capture_enabled()})
+    except Exception as e:
+        logging.error(f"Error updating call debug capture: {e}", exc_info=True)
+        return jsonify({"success": False, "message": str(e)}), 500
+
 @call_bp.route("/api/debug/ami_history", methods=["GET"])
 @login_required
 def get_ami_debug_history():
@@ -836,8 +873,7 @@ def get_ami_debug_history():
         # Format timestamps for JSON
         formatted_history = []
         for entry in history:
-            formatted_entry = entry.copy()
-            formatted_entry['timestamp'] = entry['timestamp'].isoformat()
+            formatted_entry = {'timestamp': asterisk_service.ami_debug_entry_time(entry).isoformat(), 'action': entry['action'], 'details': entry['details']}
             formatted_history.append(formatted_entry)
         
         return jsonify({
@@ -848,32 +884,125 @@ def get_ami_debug_history():
         logging.error(f"Error getting AMI debug history: {e}", exc_info=True)
         return jsonify({"success": False, "message": str(e)}), 500
 
+def _snapshot_active_calls_debug(soa=False):
+    """
+    Copies active_calls into a JSON-ready payload. Returns (generation, payload).
+    With soa=True the calls are flattened into parallel column lists (grouped by
+    campaign, in iteration order) instead of a nested {campaign: {phone: {...}}} tree.
+    """
+    if soa:
+        columns = {key: [] for key in ("campaign_ids", "phones", "statuses", "timestamps", "details", "action_ids", "uniqueids")}
+        # Generation is read before copying: a change racing the copy just triggers one more refresh
+        generation = get_active_calls_generation()
+        campaigns = active_campaign_items()
+        total_campaigns = len(campaigns)
+        for campaign_id, calls in campaigns:
+            with campaign_calls_lock(campaign_id):
+                for phone, call_data in calls.items():
+                    timestamp = datetime.fromtimestamp(call_data.ts, UTC_TIMEZONE)
+                    columns["campaign_ids"].append(campaign_id)
+                    columns["phones"].append(phone)
+                    columns["statuses"].append(call_data.status)
+                    columns["timestamps"].append(timestamp.isoformat())
+                    columns["details"].append(call_data.details)
+                    columns["action_ids"].append(call_data.action_id)
+                    columns["uniqueids"].append(call_data.uniqueid)
+
+        return generation, {
+            "success": True,
+            "format": "soa",
+            **columns,
+            "total_campaigns": total_campaigns,
+            "total_calls": len(columns["phones"])
+        }
+
+    generation = get_active_calls_generation()
+    active_calls_copy = {}
+    for campaign_id, calls in active_campaign_items():
+        active_calls_copy[campaign_id] = {}
+        with campaign_calls_lock(campaign_id):
+            for phone, call_data in calls.items():
+                call_data_copy = call_data.to_dict()
+                # Convert timestamp to string for JSON
+                if 'timestamp' in call_data_copy and isinstance(call_data_copy['timestamp'], datetime):
+                    call_data_copy['timestamp'] = call_data_copy['timestamp'].isoformat()
+                active_calls_copy[campaign_id][phone] = call_data_copy
+
+    return generation, {
+        "success": True,
+        "active_calls": active_calls_copy,
+        "total_campaigns": len(active_calls_copy),
+        "total_calls": sum(len(calls) for calls in active_calls_copy.values())
+    }
+
 @call_bp.route("/api/debug/active_calls", methods=["GET"])
 @login_required
 def get_active_calls_debug():
     """Get current active_calls state for debugging"""
     try:
-        with active_calls_lock:
-            active_calls_copy = {}
-            for campaign_id, calls in active_calls.items():
-                active_calls_copy[campaign_id] = {}
-                for phone, call_data in calls.items():
-                    call_data_copy = call_data.copy()
-                    # Convert timestamp to string for JSON
-                    if 'timestamp' in call_data_copy and isinstance(call_data_copy['timestamp'], datetime):
-                        call_data_copy['timestamp'] = call_data_copy['timestamp'].isoformat()
-                    active_calls_copy[campaign_id][phone] = call_data_copy
-        
-        return jsonify({
-            "success": True,
-            "active_calls": active_calls_copy,
-            "total_campaigns": len(active_calls_copy),
-            "total_calls": sum(len(calls) for calls in active_calls_copy.values())
-        })
+        soa = request.args.get('format') == 'soa'
+        etag_suffix = '-soa' if soa else ''
+
+        # The generation only moves when active_calls is mutated, so a matching
+        # If-None-Match lets us answer without walking or copying the dict.
+        if request.if_none_match.contains_weak(f"{get_active_calls_generation()}{etag_suffix}"):
+            return '', 304
+
+        generation, payload = _snapshot_active_calls_debug(soa=soa)
+        response = jsonify(payload)
+        response.set_etag(f"{generation}{etag_suffix}", weak=True)
+        return response
     except Exception as e:
         logging.error(f"Error getting active calls debug: {e}", exc_info=True)
         return jsonify({"success": False, "message": str(e)}), 500
 
+@call_bp.route("/api/debug/stream", methods=["GET"])
+@login_required
+def debug_stream():
+    """Server-Sent Events stream that pushes the active_calls state whenever it changes"""
+    soa = request.args.get('format') == 'soa'
+
+    if not _debug_stream_slots.acquire(blocking=False):
+        return jsonify({"success": False, "message": "Too many open debug streams, use polling"}), 503
+
+    def generate():
+        deadline = time.monotonic() + DEBUG_STREAM_MAX_SECONDS
+        last_generation = None
+        last_sent = 0.0
+        yield f"retry: {DEBUG_STREAM_RETRY_MS}\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return # EventSource reconnects on its own, which frees this thread in the meantime
+            if last_generation is not None and wait_for_active_calls_generation(last_generation, timeout=min(DEBUG_STREAM_KEEPALIVE_SECONDS, remaining)) is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            # Changes that land during this pause are folded into the one snapshot taken after it
+            delay = last_sent + DEBUG_STREAM_MIN_INTERVAL_SECONDS - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            last_generation, payload = _snapshot_active_calls_debug(soa=soa)
+            last_sent = time.monotonic()
+            yield f"event: active_calls\nid: {last_generation}\ndata: {json.dumps(payload)}\n\n"
+
+    released = threading.Event()
+    def release_slot():
+        # WSGI calls close() once, even if the client left before the generator started
+        if not released.is_set():
+            released.set()
+            _debug_stream_slots.release()
+
+    try:
+        response = Response(generate(), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.call_on_close(release_slot)
+    except Exception:
+        release_slot()
+        raise
+    return response
+
 @call_bp.route("/api/debug/ami_status", methods=["GET"])
 @login_required
 def get_ami_status():
@@ -920,14 +1049,24 @@ def test_ami_connection():
             return jsonify({"success": False, "message": "No AMI client instance"}), 400
         
         client = asterisk_service.ami_client_instance
-        
-        # Test connection
-        if not client.ensure_connected():
+
+        def _do_test():
+            # Test connection, then send a simple Ping action
+            if not client.ensure_connected():
+                return False, None
+            return True, client.send_action('Ping')
+
+        # Both steps can block on a wedged AMI socket; run them off the request
+        # thread so a dead Asterisk can't pin a web worker.
+        try:
+            connected, ping_success = _ami_test_pool.submit(_do_test).result(timeout=AMI_TEST_TIMEOUT_SECONDS)
+        except concurrent.futures.TimeoutError:
+            logging.warning(f"AMI connection test timed out after {AMI_TEST_TIMEOUT_SECONDS}s")
+            return jsonify({"success": False, "message": f"AMI test timed out after {AMI_TEST_TIMEOUT_SECONDS}s"}), 504
+
+        if not connected:
             return jsonify({"success": False, "message": "Failed to establish AMI connection"}), 500
         
-        # Send a simple Ping action
-        ping_success = client.send_action('Ping')
-        
         return jsonify({
             "success": True,
             "connection_test": "passed",
@@ -941,17 +1080,12 @@ def test_ami_connection():
 
 # Add this route to call_routes.py
 
-@call_bp.route("/debug_dashboard")
-@login_required  
-def debug_dashboard():
-    """Serve the debug dashboard page"""
-    # Only allow admin users to access debug dashboard
-    if session.get('role') != 'admin':
-        flash("Access denied. Admin privileges required.", "error")
-        return redirect(url_for('auth.main_menu'))
-    
-    # For now, return the HTML directly. In production, you'd use render_template
-    return '''<!DOCTYPE html>
+# Static debug dashboard page, built once at import instead of per request.
+_DEBUG_DASHBOARD_JS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'debug_dashboard.js')
+with open(_DEBUG_DASHBOARD_JS_PATH, 'rb') as _js_file:
+    _DEBUG_DASHBOARD_JS_VERSION = hashlib.md5(_js_file.read()).hexdigest()[:12]
+
+DEBUG_DASHBOARD_HTML = '''<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -1088,7 +1222,7 @@ def debug_dashboard():
                 <span>📞 Active Calls State</span>
                 <div>
                     <label class="auto-refresh">
-                        <input type="checkbox" id="auto-refresh-calls" checked> Auto-refresh (3s)
+                        <input type="checkbox" id="auto-refresh-calls" checked> Live updates
                     </label>
                     <button class="button" onclick="refreshActiveCalls()">Refresh</button>
                 </div>
@@ -1119,6 +1253,9 @@ def debug_dashboard():
             <div class="debug-header" onclick="toggleSection('call-history')">
                 <span>🎯 Call Debug History</span>
                 <div>
+                    <label class="auto-refresh">
+                        <input type="checkbox" id="debug-capture"> Capture
+                    </label>
                     <input type="text" id="campaign-id-input" placeholder="Campaign ID" style="margin-right: 5px; background: #333; color: #fff; border: 1px solid #666; padding: 5px;">
                     <input type="text" id="phone-number-input" placeholder="Phone Number" style="margin-right: 5px; background: #333; color: #fff; border: 1px solid #666; padding: 5px;">
                     <button class="button" onclick="loadCallHistory()">Load History</button>
@@ -1130,230 +1267,37 @@ def debug_dashboard():
         </div>
     </div>
 
-    <script>
-        // Auto-refresh intervals
-        let amiStatusInterval, activeCallsInterval, amiLogInterval;
-        
-        // Initialize page
-        document.addEventListener('DOMContentLoaded', function() {
-            refreshAMIStatus();
-            refreshActiveCalls();
-            refreshAMILog();
-            
-            // Set up auto-refresh
-            setupAutoRefresh();
-        });
-
-        function setupAutoRefresh() {
-            // AMI Status auto-refresh
-            const amiCheckbox = document.getElementById('auto-refresh-ami');
-            amiCheckbox.addEventListener('change', function() {
-                if (this.checked) {
-                    amiStatusInterval = setInterval(refreshAMIStatus, 5000);
-                } else {
-                    clearInterval(amiStatusInterval);
-                }
-            });
-            if (amiCheckbox.checked) {
-                amiStatusInterval = setInterval(refreshAMIStatus, 5000);
-            }
-
-            // Active Calls auto-refresh
-            const callsCheckbox = document.getElementById('auto-refresh-calls');
-            callsCheckbox.addEventListener('change', function() {
-                if (this.checked) {
-                    activeCallsInterval = setInterval(refreshActiveCalls, 3000);
-                } else {
-                    clearInterval(activeCallsInterval);
-                }
-            });
-            if (callsCheckbox.checked) {
-                activeCallsInterval = setInterval(refreshActiveCalls, 3000);
-            }
-
-            // AMI Log auto-refresh
-            const logCheckbox = document.getElementById('auto-refresh-ami-log');
-            logCheckbox.addEventListener('change', function() {
-                if (this.checked) {
-                    amiLogInterval = setInterval(refreshAMILog, 2000);
-                } else {
-                    clearInterval(amiLogInterval);
-                }
-            });
-            if (logCheckbox.checked) {
-                amiLogInterval = setInterval(refreshAMILog, 2000);
-            }
-        }
-
-        function toggleSection(sectionId) {
-            const content = document.getElementById(sectionId);
-            content.classList.toggle('collapse');
-        }
-
-        async function refreshAMIStatus() {
-            try {
-                const response = await fetch('/api/debug/ami_status');
-                const data = await response.json();
-                
-                if (data.success) {
-                    const status = data.ami_status;
-                    const indicator = status.connected ? 
-                        '<span class="status-indicator status-connected"></span>Connected' :
-                        '<span class="status-indicator status-disconnected"></span>Disconnected';
-                    
-                    document.getElementById('ami-status-content').innerHTML = `
-                        <div><strong>Status:</strong> ${indicator}</div>
-                        <div><strong>Connection ID:</strong> ${status.connection_id || 'N/A'}</div>
-                        <div><strong>Host:</strong> ${status.host || 'N/A'}:${status.port || 'N/A'}</div>
-                        <div><strong>Username:</strong> ${status.username || 'N/A'}</div>
-                        <div><strong>Event Handlers:</strong> ${status.event_handlers_count}</div>
-                        <div><strong>Listener Thread:</strong> ${status.listener_thread_alive ? 'Alive' : 'Dead'}</div>
-                        <div><strong>Last Activity:</strong> ${status.last_activity ? new Date(status.last_activity * 1000).toLocaleString() : 'N/A'}</div>
-                        <div class="json-data">${JSON.stringify(status, null, 2)}</div>
-                    `;
-                } else {
-                    document.getElementById('ami-status-content').innerHTML = `<div class="log-error">Error: ${data.message}</div>`;
-                }
-            } catch (error) {
-                document.getElementById('ami-status-content').innerHTML = `<div class="log-error">Fetch Error: ${error.message}</div>`;
-            }
-        }
-
-        async function refreshActiveCalls() {
-            try {
-                const response = await fetch('/api/debug/active_calls');
-                const data = await response.json();
-                
-                if (data.success) {
-                    let html = `
-                        <div><strong>Total Campaigns:</strong> ${data.total_campaigns}</div>
-                        <div><strong>Total Active Calls:</strong> ${data.total_calls}</div>
-                        <hr>
-                    `;
-                    
-                    if (data.total_calls === 0) {
-                        html += '<div>No active calls</div>';
-                    } else {
-                        for (const [campaignId, calls] of Object.entries(data.active_calls)) {
-                            html += `<div><strong>Campaign ${campaignId}:</strong></div>`;
-                            for (const [phone, callData] of Object.entries(calls)) {
-                                const statusClass = getStatusClass(callData.status);
-                                html += `
-                                    <div class="log-entry ${statusClass}">
-                                        📞 ${phone}: ${callData.status} 
-                                        <span class="timestamp">${callData.timestamp ? new Date(callData.timestamp).toLocaleTimeString() : 'N/A'}</span>
-                                        <br>&nbsp;&nbsp;&nbsp;&nbsp;${callData.details || 'No details'}
-                                        <br>&nbsp;&nbsp;&nbsp;&nbsp;ActionID: ${callData.action_id || 'N/A'} | UniqueID: ${callData.uniqueid || 'N/A'}
-                                    </div>
-                                `;
-                            }
-                        }
-                    }
-                    
-                    document.getElementById('active-calls-content').innerHTML = html;
-                } else {
-                    document.getElementById('active-calls-content').innerHTML = `<div class="log-error">Error: ${data.message}</div>`;
-                }
-            } catch (error) {
-                document.getElementById('active-calls-content').innerHTML = `<div class="log-error">Fetch Error: ${error.message}</div>`;
-            }
-        }
-
-        async function refreshAMILog() {
-            try {
-                const response = await fetch('/api/debug/ami_history');
-                const data = await response.json();
-                
-                if (data.success) {
-                    let html = '';
-                    const recentEntries = data.history.slice(-50).reverse();
-                    
-                    for (const entry of recentEntries) {
-                        const timestamp = new Date(entry.timestamp).toLocaleTimeString();
-                        html += `
-                            <div class="log-entry log-ami">
-                                <span class="timestamp">${timestamp}</span> 
-                                <strong>${entry.action}</strong> - ${entry.details}
-                            </div>
-                        `;
-                    }
-                    
-                    if (html === '') {
-                        html = '<div>No AMI events logged yet</div>';
-                    }
-                    
-                    document.getElementById('ami-log-content').innerHTML = html;
-                } else {
-                    document.getElementById('ami-log-content').innerHTML = `<div class="log-error">Error: ${data.message}</div>`;
-                }
-            } catch (error) {
-                document.getElementById('ami-log-content').innerHTML = `<div class="log-error">Fetch Error: ${error.message}</div>`;
-            }
-        }
-
-        async function loadCallHistory() {
-            const campaignId = document.getElementById('campaign-id-input').value.trim();
-            const phoneNumber = document.getElementById('phone-number-input').value.trim();
-            
-            if (!campaignId || !phoneNumber) {
-                document.getElementById('call-history-content').innerHTML = '<div class="log-error">Please enter both Campaign ID and Phone Number</div>';
-                return;
-            }
-            
-            try {
-                const response = await fetch(`/api/debug/call_history/${campaignId}/${phoneNumber}`);
-                const data = await response.json();
-                
-                if (data.success) {
-                    let html = `<div><strong>Campaign:</strong> ${data.campaign_id} | <strong>Phone:</strong> ${data.phone_number}</div><hr>`;
-                    
-                    if (data.history.length === 0) {
-                        html += '<div>No debug history found for this call</div>';
-                    } else {
-                        for (const entry of data.history.reverse()) {
-                            const timestamp = new Date(entry.timestamp).toLocaleTimeString();
-                            html += `
-                                <div class="log-entry log-call">
-                                    <span class="timestamp">${timestamp}</span> 
-                                    <strong>${entry.action}</strong> - ${entry.details}
-                                </div>
-                            `;
-                        }
-                    }
-                    
-                    document.getElementById('call-history-content').innerHTML = html;
-                } else {
-                    document.getElementById('call-history-content').innerHTML = `<div class="log-error">Error: ${data.message}</div>`;
-                }
-            } catch (error) {
-                document.getElementById('call-history-content').innerHTML = `<div class="log-error">Fetch Error: ${error.message}</div>`;
-            }
-        }
+    <script src="/static/debug_dashboard.js?v=__DEBUG_JS_VERSION__"></script>
+</body>
+</html>'''.replace('__DEBUG_JS_VERSION__', _DEBUG_DASHBOARD_JS_VERSION)
 
-        async function testAMIConnection() {
-            try {
-                const response = await fetch('/api/debug/test_ami_connection', { method: 'POST' });
-                const data = await response.json();
-                
-                if (data.success) {
-                    alert(`AMI Connection Test: SUCCESS\\nConnection ID: ${data.connection_id}\\nPing Sent: ${data.ping_sent}`);
-                } else {
-                    alert(`AMI Connection Test: FAILED\\nError: ${data.message}`);
-                }
-            } catch (error) {
-                alert(`AMI Connection Test: ERROR\\n${error.message}`);
-            }
-        }
+_DEBUG_DASHBOARD_BYTES = DEBUG_DASHBOARD_HTML.encode('utf-8')
+_DEBUG_DASHBOARD_GZ = gzip.compress(_DEBUG_DASHBOARD_BYTES, compresslevel=9)
+_DEBUG_DASHBOARD_ETAG = hashlib.md5(_DEBUG_DASHBOARD_BYTES).hexdigest()
 
-        function getStatusClass(status) {
-            if (['completed', 'answered'].includes(status)) return 'log-success';
-            if (['failed', 'rejected', 'aborted'].includes(status)) return 'log-error';
-            if (['dialing', 'ringing'].includes(status)) return 'log-ami';
-            return 'log-call';
-        }
-    </script>
-</body>
-</html>'''        
+@call_bp.route("/debug_dashboard")
+@login_required  
+def debug_dashboard():
+    """Serve the debug dashboard page"""
+    # Only allow admin users to access debug dashboard
+    if session.get('role') != 'admin':
+        flash("Access denied. Admin privileges required.", "error")
+        return redirect(url_for('auth.main_menu'))
+    
+    # Page is static; it is only re-sent when it changes, gzipped when the browser accepts it
+    if request.if_none_match.contains_weak(_DEBUG_DASHBOARD_ETAG):
+        response = Response(status=304)
+    elif 'gzip' in request.accept_encodings:
+        response = Response(_DEBUG_DASHBOARD_GZ, mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(_DEBUG_DASHBOARD_BYTES, mimetype='text/html')
+    # Weak: the gzip and identity encodings share one tag
+    response.set_etag(_DEBUG_DASHBOARD_ETAG, weak=True)
+    response.headers['Vary'] = 'Accept-Encoding'
+    # private: the page sits behind an admin login, so shared caches must not keep it
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    return response
 
 @call_bp.route("/api/call_status/<phone_number>", methods=["GET"])
 @login_required
@@ -1363,24 +1307,26 @@ def get_call_status(phone_number):
     reset_status = request.args.get('reset', '0') == '1'
     logging.info(f"API Call Status Check: Campaign {campaign_id_str}, Phone {clean_phone}, Reset: {reset_status}")
     status_data_to_return = {}
-    with active_calls_lock:
-        if campaign_id_str not in active_calls:
-            active_calls[campaign_id_str] = {}
+    with campaign_calls_lock(campaign_id_str):
+        campaign_calls = get_campaign_calls(campaign_id_str, create=True)
         if reset_status:
-            prev_status = active_calls[campaign_id_str].get(clean_phone, {}).get('status', 'unknown')
+            prev_entry = campaign_calls.get(clean_phone)
+            prev_status = prev_entry.status if prev_entry is not None else 'unknown'
+            if prev_entry is not None:
+                unindex_call(prev_entry) # the reset entry starts with no action_id/uniqueid
             logging.info(f"Resetting status for Campaign {campaign_id_str}, Phone {clean_phone} - Previous status was: {prev_status}")
-            new_status_info = {
-                'status': 'waiting',
-                'details': 'Status manually reset by user',
-                'timestamp': datetime.now(UTC_TIMEZONE) # Store as UTC datetime object
-            }
-            active_calls[campaign_id_str][clean_phone] = new_status_info
-            status_data_to_return = new_status_info.copy()
+            new_status_info = CallEntry('waiting', 'Status manually reset by user', time.time())
+            campaign_calls[clean_phone] = new_status_info
+            index_phone(campaign_id_str, clean_phone)
+            track_call_status(campaign_id_str, clean_phone, prev_entry.status if prev_entry is not None else None, 'waiting')
+            bump_active_calls_generation()
+            status_data_to_return = new_status_info.to_dict()
         else:
-            status_data_to_return = active_calls[campaign_id_str].get(
-                clean_phone,
-                {'status': 'unknown', 'details': None, 'timestamp': datetime.now(UTC_TIMEZONE)} # Default to UTC datetime
-            ).copy()
+            entry = campaign_calls.get(clean_phone)
+            if entry is not None:
+                status_data_to_return = entry.to_dict()
+            else:
+                status_data_to_return = {'status': 'unknown', 'details': None, 'timestamp': datetime.now(UTC_TIMEZONE)} # Default to UTC datetime
     
     # Format timestamp for JSON response
     if 'timestamp' in status_data_to_return and isinstance(status_data_to_return['timestamp'], datetime):
@@ -1433,6 +1379,7 @@ def ivr_schedule_trigger():
 
         if last_row_id:
             logging.info(f"IVR Schedule Trigger: Successfully scheduled call ID: {last_row_id} for announcement ID: {announcement_id} by user: {user_id}")
+            wake_call_scheduler()
             return jsonify({"success": True, "message": f"Announcement scheduled successfully with Call ID: {last_row_id}"}), 200
         else:
             logging.error(f"IVR Schedule Trigger: Failed to create scheduled call record for announcement ID: {announcement_id} by user: {user_id}.")
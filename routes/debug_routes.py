@@ -4,7 +4,7 @@ from flask import jsonify, request
 from datetime import datetime
 import services.call_service as call_service
 import services.asterisk_service as asterisk_service
-from app_state import active_calls, active_calls_lock
+from app_state import active_campaign_items, campaign_calls_lock
 
 @call_bp.route("/api/debug/call_history/<campaign_id>/<phone_number>", methods=["GET"])
 @login_required
@@ -16,20 +16,33 @@ def get_call_debug_history(campaign_id, phone_number):
         # Format timestamps for JSON
         formatted_history = []
         for entry in history:
-            formatted_entry = entry.copy()
-            formatted_entry['timestamp'] = entry['timestamp'].isoformat()
+            formatted_entry = {'timestamp': call_service.call_debug_entry_time(entry).isoformat(), 'action': entry['action'], 'details': entry['details']}
             formatted_history.append(formatted_entry)
         
         return jsonify({
             "success": True,
             "campaign_id": campaign_id,
             "phone_number": phone_number,
-            "history": formatted_history
+            "history": formatted_history,
+            "capture_enabled": call_service.is_debug_capture_enabled()
         })
     except Exception as e:
         logging.error(f"Error getting call debug history: {e}", exc_info=True)
         return jsonify({"success": False, "message": str(e)}), 500
 
+@call_bp.route("/api/debug/capture", methods=["GET", "POST"])
+@login_required
+def debug_capture():
+    """Get or set whether per-call debug history is being captured"""
+    try:
+        if request.method == "POST":
+            data = request.get_json(silent=True) or {}
+            call_service.set_debug_capture(data.get('enabled', False))
+        return jsonify({"success": True, "enabled": call_service.is_debug_capture_enabled()})
+    except Exception as e:
+        logging.error(f"Error updating call debug capture: {e}", exc_info=True)
+        return jsonify({"success": False, "message": str(e)}), 500
+
 @call_bp.route("/api/debug/ami_history", methods=["GET"])
 @login_required
 def get_ami_debug_history():
@@ -41,8 +54,7 @@ def get_ami_debug_history():
         # Format timestamps for JSON
         formatted_history = []
         for entry in history:
-            formatted_entry = entry.copy()
-            formatted_entry['timestamp'] = entry['timestamp'].isoformat()
+            formatted_entry = {'timestamp': asterisk_service.ami_debug_entry_time(entry).isoformat(), 'action': entry['action'], 'details': entry['details']}
             formatted_history.append(formatted_entry)
         
         return jsonify({
@@ -58,12 +70,12 @@ def get_ami_debug_history():
 def get_active_calls_debug():
     """Get current active_calls state for debugging"""
     try:
-        with active_calls_lock:
-            active_calls_copy = {}
-            for campaign_id, calls in active_calls.items():
-                active_calls_copy[campaign_id] = {}
+        active_calls_copy = {}
+        for campaign_id, calls in active_campaign_items():
+            active_calls_copy[campaign_id] = {}
+            with campaign_calls_lock(campaign_id):
                 for phone, call_data in calls.items():
-                    call_data_copy = call_data.copy()
+                    call_data_copy = call_data.to_dict()
                     # Convert timestamp to string for JSON
                     if 'timestamp' in call_data_copy and isinstance(call_data_copy['timestamp'], datetime):
                         call_data_copy['timestamp'] = call_data_copy['timestamp'].isoformat()
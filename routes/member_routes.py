@@ -1,15 +1,17 @@
 # routes/member_routes.py
-from flask import render_template, request, redirect, url_for, flash, session, send_file, jsonify
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context
 import logging
 import csv
-from io import StringIO, BytesIO
+import codecs
+from io import StringIO
 from werkzeug.utils import secure_filename
 import os
 from . import member_bp
 from models.member import Member
 from models.group import Group
 from utils.security import login_required
-from utils.validation import validate_phone_number # Assuming you create this helper
+from utils.db import get_db_cursor
+from utils.validation import normalize_phone_number
 
 # Function to re-fetch members for rendering the directory
 def _get_members_for_render():
@@ -61,18 +63,19 @@ def member_dir():
     member = None
     member_groups = []
     duplicate_message = None
-    all_groups = Group.get_all_simple()
     members = [] # Initialize members list
 
+    if request.method == "GET":
+        # Notice left by a rejected add, shown next to the duplicate rules after the redirect
+        duplicate_message = session.pop('member_dir_notice', None)
+
     # Handle GET request for editing a member
     if request.method == "GET" and request.args.get('action') == 'edit':
         member_id = request.args.get('member_id')
         if member_id:
             try:
-                member_obj = Member.get_by_id(member_id)
-                if member_obj:
-                    member = member_obj.__dict__ # Convert object to dict for template if needed
-                    member_groups = Member.get_member_groups(member_id)
+                member, member_groups = Member.get_by_id_with_groups(member_id)
+                if member:
                     editing = True
                 else:
                     flash("Member not found.")
@@ -92,24 +95,22 @@ def member_dir():
                 groups_selected = request.form.getlist("groups[]")
                 logging.debug(f"Add action details: FName='{first_name}', LName='{last_name}', Phone='{phone_number_raw}', Groups={groups_selected}")
 
-                is_valid, error_message = validate_phone_number(phone_number_raw)
-                if not is_valid:
+                # Error paths redirect (PRG) rather than re-rendering, so they skip the full directory query
+                clean_phone_number, error_message = normalize_phone_number(phone_number_raw)
+                if error_message:
                     flash(error_message, "warning")
-                    return render_template(
-                        "member_dir.html", members=_get_members_for_render(), all_groups=all_groups,
-                        editing=False, member=None, member_groups=[],
-                        duplicate_message=error_message
-                    )
+                    session['member_dir_notice'] = error_message
+                    return redirect(url_for('member.member_dir'))
 
-                clean_phone_number = ''.join(filter(str.isdigit, phone_number_raw or ""))
                 if Member.exists_by_phone_number(clean_phone_number):
                     duplicate_message = f"Member with phone {clean_phone_number} already exists."
                     flash(duplicate_message, "warning")
                     logging.warning(duplicate_message)
+                    session['member_dir_notice'] = duplicate_message
                 else:
                     Member.add(first_name, last_name, clean_phone_number, groups_selected)
                     flash("Member added successfully.")
-                    return redirect(url_for('member.member_dir'))
+                return redirect(url_for('member.member_dir'))
 
             elif action == "edit":
                 member_id = request.form["member_id"]
@@ -118,12 +119,11 @@ def member_dir():
                 phone_number_raw = request.form["phone_number"]
                 groups_selected = request.form.getlist("groups[]")
 
-                is_valid, error_message = validate_phone_number(phone_number_raw)
-                if not is_valid:
+                clean_phone_number, error_message = normalize_phone_number(phone_number_raw)
+                if error_message:
                     flash(error_message, "warning")
                     return redirect(url_for("member.member_dir", action='edit', member_id=member_id))
 
-                clean_phone_number = ''.join(filter(str.isdigit, phone_number_raw or ""))
                 if Member.exists_by_phone_number(clean_phone_number, exclude_member_id=member_id):
                     flash(f"Another member with phone {clean_phone_number} already exists.", "warning")
                     return redirect(url_for('member.member_dir', action='edit', member_id=member_id))
@@ -148,13 +148,13 @@ def member_dir():
              flash("An unexpected error occurred.", "error")
              return redirect(url_for('member.member_dir'))
 
-    # Common GET or fallthrough from POST (e.g., duplicate found on add)
+    # Common GET (the handled POST actions all redirect)
     members = _get_members_for_render() # Re-fetch members for display
 
     return render_template(
         "member_dir.html",
         members=members,
-        all_groups=all_groups,
+        all_groups=Group.get_all_simple(), # Only needed when rendering, POST redirects skip it
         editing=editing,
         member=member,
         member_groups=member_groups,
@@ -164,11 +164,18 @@ def member_dir():
 @member_bp.route("/api/update_member_status", methods=["POST"])
 @login_required
 def api_update_member_status():
-    data = request.json
+    # Parse once without caching the body on the request; bad or non-JSON bodies fall into the 400 below
+    data = request.get_json(silent=True, cache=False)
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "message": "Missing parameters"}), 400
     member_id = data.get('member_id')
     status = data.get('status')
     if not member_id or not status:
         return jsonify({"success": False, "message": "Missing parameters"}), 400
+    try:
+        member_id = int(member_id)
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "Invalid member_id"}), 400
 
     if status == 'opted_out':
         try:
@@ -181,6 +188,8 @@ def api_update_member_status():
     else:
         return jsonify({"success": True, "message": "Status not 'opted_out', no action taken"})
 
+_CSV_ROW_PADDING = ['', '', '', '']
+
 @member_bp.route("/upload_csv", methods=["POST"])
 @login_required
 def upload_csv():
@@ -195,58 +204,101 @@ def upload_csv():
     if file and file.filename.endswith(".csv"):
         filename = secure_filename(file.filename)
         try:
-            file_content = file.read().decode("utf-8")
-            csv_input = StringIO(file_content)
-            reader = csv.reader(csv_input)
+            # Decode line by line straight off the upload stream instead of holding bytes and str copies of the file
+            reader = csv.reader(codecs.iterdecode(file.stream, "utf-8"))
 
-            header = next(reader)  # Skip header
+            header = next(reader, None)  # Skip header
+            if not header or len(header) < 3:
+                flash("CSV must have a header row with at least First Name, Last Name and Phone Number columns.", "error")
+                return redirect(url_for("member.member_dir"))
             added_count, duplicate_count, invalid_count = 0, 0, 0
-            row_num = 1 # Initialize for error reporting
-
-            from utils.db import get_db_cursor # Need to import here for specific transaction
 
+            # First pass: validate in memory so the database only sees batched statements
+            pending = [] # (row_num, first_name, last_name, clean_phone_number, group_names)
+            seen_phones = set()
+            for row_num, row in enumerate(reader, start=2):
+                # Pad short rows instead of branching on len(row); a missing phone column fails validation as empty
+                first_name, last_name, phone_number_raw, groups_str = (row + _CSV_ROW_PADDING)[:4]
+                clean_phone_number, phone_error = normalize_phone_number(phone_number_raw)
+                if phone_error:
+                    logging.warning(f"CSV {filename} Row {row_num}: Invalid phone '{phone_number_raw}' ({phone_error}).")
+                    invalid_count += 1
+                    continue
+
+                if clean_phone_number in seen_phones:
+                    logging.warning(f"CSV {filename} Row {row_num}: Duplicate phone '{clean_phone_number}' within file.")
+                    duplicate_count += 1
+                    continue
+                seen_phones.add(clean_phone_number)
+
+                group_names = [g.strip() for g in groups_str.split(',') if g.strip()]
+                pending.append((row_num, first_name[:35], last_name[:35], clean_phone_number, group_names))
+
+            created_groups = False
             with get_db_cursor() as (cursor, connection):
                 try:
-                    for row_num, row in enumerate(reader, start=2):
-                        if len(row) < 3:
-                            logging.warning(f"CSV {filename} Row {row_num}: Insufficient columns.")
-                            invalid_count += 1
-                            continue
-
-                        first_name = row[0][:35]
-                        last_name = row[1][:35]
-                        phone_number_raw = row[2]
-                        groups_str = row[3] if len(row) >= 4 else ""
-
-                        is_valid, phone_error = validate_phone_number(phone_number_raw)
-                        if not is_valid:
-                            logging.warning(f"CSV {filename} Row {row_num}: Invalid phone '{phone_number_raw}' ({phone_error}).")
-                            invalid_count += 1
-                            continue
-
-                        clean_phone_number = ''.join(filter(str.isdigit, phone_number_raw or ""))
-
-                        if Member.exists_by_phone_number(clean_phone_number):
-                            logging.warning(f"CSV {filename} Row {row_num}: Duplicate phone '{clean_phone_number}'.")
-                            duplicate_count += 1
-                            continue
-
-                        Member.add(first_name, last_name, clean_phone_number, []) # Add member first without groups
-                        member_id = cursor.lastrowid # Get ID from the transaction's cursor
-                        added_count += 1
-
-                        if groups_str:
-                            group_names = [g.strip() for g in groups_str.split(',') if g.strip()]
-                            group_ids_to_assign = []
-                            for group_name in group_names:
-                                group_id = Group.get_by_name(group_name) # This will create the group if it doesn't exist
-                                if group_id:
-                                    group_ids_to_assign.append(group_id)
-                            if group_ids_to_assign:
-                                group_values = [(member_id, gid) for gid in group_ids_to_assign]
-                                cursor.executemany("INSERT INTO member_groups (member_id, group_id) VALUES (%s, %s)", group_values)
+                    if pending:
+                        # One round trip to find every phone number that is already on file
+                        phones = [p[3] for p in pending]
+                        cursor.execute(f"SELECT phone_number FROM members WHERE phone_number IN ({', '.join(['%s'] * len(phones))})", phones)
+                        existing_phones = {r[0] for r in cursor.fetchall()}
+                        new_members = []
+                        for row_num, first_name, last_name, clean_phone_number, group_names in pending:
+                            if clean_phone_number in existing_phones:
+                                logging.warning(f"CSV {filename} Row {row_num}: Duplicate phone '{clean_phone_number}'.")
+                                duplicate_count += 1
+                            else:
+                                new_members.append((first_name, last_name, clean_phone_number, group_names))
+
+                        if new_members:
+                            # Resolve every group name at once, creating the missing ones in a single batch.
+                            # Names are matched case-insensitively to follow the column collation.
+                            wanted_groups = {}
+                            for member_row in new_members:
+                                for group_name in member_row[3]:
+                                    wanted_groups.setdefault(group_name.lower(), group_name)
+                            group_ids_by_name = {}
+                            if wanted_groups:
+                                names = list(wanted_groups.values())
+                                group_query = f"SELECT id, name FROM groups WHERE name IN ({', '.join(['%s'] * len(names))})"
+                                cursor.execute(group_query, names)
+                                group_ids_by_name = {name.lower(): gid for gid, name in cursor.fetchall()}
+                                missing_groups = [(name,) for key, name in wanted_groups.items() if key not in group_ids_by_name]
+                                if missing_groups:
+                                    cursor.executemany("INSERT INTO groups (name) VALUES (%s)", missing_groups)
+                                    created_groups = True
+                                    cursor.execute(group_query, names)
+                                    group_ids_by_name = {name.lower(): gid for gid, name in cursor.fetchall()}
+
+                            # The unique key on phone_number lets INSERT IGNORE absorb any number added since the check above
+                            cursor.executemany("INSERT IGNORE INTO members (first_name, last_name, phone_number) VALUES (%s, %s, %s)",
+                                               [m[:3] for m in new_members])
+                            added_count = max(cursor.rowcount, 0)
+                            if added_count < len(new_members):
+                                logging.warning(f"CSV {filename}: {len(new_members) - added_count} rows skipped by the phone_number unique key during insert.")
+                                duplicate_count += len(new_members) - added_count
+
+                            # phone_number is unique, so read the new IDs back by phone rather than trusting lastrowid arithmetic
+                            group_values = []
+                            if group_ids_by_name:
+                                new_phones = [m[2] for m in new_members]
+                                cursor.execute(f"SELECT id, phone_number FROM members WHERE phone_number IN ({', '.join(['%s'] * len(new_phones))})", new_phones)
+                                member_ids_by_phone = {phone: mid for mid, phone in cursor.fetchall()}
+                                for first_name, last_name, clean_phone_number, group_names in new_members:
+                                    member_id = member_ids_by_phone.get(clean_phone_number)
+                                    assigned = set()
+                                    for group_name in group_names:
+                                        gid = group_ids_by_name.get(group_name.lower())
+                                        if member_id and gid and gid not in assigned:
+                                            assigned.add(gid)
+                                            group_values.append((member_id, gid))
+                            if group_values:
+                                # One batched insert for the whole file; IGNORE covers a member that raced in ahead of us and already has the pair
+                                cursor.executemany("INSERT IGNORE INTO member_groups (member_id, group_id) VALUES (%s, %s)", group_values)
 
                     connection.commit()
+                    if created_groups:
+                        Group.invalidate_cache()
                     message_parts = []
                     if added_count > 0: message_parts.append(f"{added_count} members added")
                     if duplicate_count > 0: message_parts.append(f"{duplicate_count} duplicates skipped")
@@ -256,8 +308,8 @@ def upload_csv():
 
                 except Exception as inner_err: # Catch errors during processing
                     connection.rollback() # Rollback changes from this CSV on error
-                    logging.error(f"Error processing CSV {filename} at row {row_num}: {inner_err}", exc_info=True)
-                    flash(f"An error occurred processing the CSV at row {row_num}. Changes rolled back.", "error")
+                    logging.error(f"Error processing CSV {filename}: {inner_err}", exc_info=True)
+                    flash("An error occurred saving the CSV records. Changes rolled back.", "error")
 
         except Exception as e:
             logging.error(f"Error processing CSV file {filename}: {e}", exc_info=True)
@@ -267,34 +319,56 @@ def upload_csv():
 
     return redirect(url_for("member.member_dir"))
 
+EXPORT_CSV_CHUNK_ROWS = 5000
+
+def _generate_member_csv():
+    """Yields the member directory as encoded CSV chunks while the cursor streams rows."""
+    buffer = StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+
+    def drain():
+        chunk = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    with get_db_cursor(readonly=True) as (cursor, connection):
+        query = """
+            SELECT m.last_name, m.first_name, m.phone_number,
+                   IFNULL(GROUP_CONCAT(g.name ORDER BY g.name SEPARATOR ', '), '') as groups
+            FROM members m LEFT JOIN member_groups mg ON m.id = mg.member_id LEFT JOIN groups g ON mg.group_id = g.id
+            GROUP BY m.id ORDER BY m.last_name, m.first_name
+        """
+        cursor.execute(query)
+        # Header goes out only after the query succeeds so the route can still redirect on failure
+        writer.writerow(["Last Name", "First Name", "Phone Number", "Groups"])
+        yield drain()
+        # Plain tuple rows already match the column order, so writerows can take each batch as-is
+        for chunk in iter(lambda: cursor.fetchmany(EXPORT_CSV_CHUNK_ROWS), []):
+            writer.writerows(chunk)
+            yield drain()
+
 @member_bp.route("/export_csv")
 @login_required
 def export_csv():
-    output = StringIO()
-    writer = csv.writer(output, quoting=csv.QUOTE_NONNUMERIC)
-    writer.writerow(["Last Name", "First Name", "Phone Number", "Groups"])
+    rows = _generate_member_csv()
     try:
-        from utils.db import get_db_cursor # Need to import here for specific transaction
-        with get_db_cursor(dictionary=True) as (cursor, connection):
-            query = """
-                SELECT m.last_name, m.first_name, m.phone_number,
-                       GROUP_CONCAT(g.name ORDER BY g.name SEPARATOR ', ') as groups
-                FROM members m LEFT JOIN member_groups mg ON m.id = mg.member_id LEFT JOIN groups g ON mg.group_id = g.id
-                GROUP BY m.id ORDER BY m.last_name, m.first_name
-            """
-            cursor.execute(query)
-            for row in cursor:
-                writer.writerow([row['last_name'], row['first_name'], row['phone_number'], row['groups'] or ''])
+        header = next(rows)
     except Exception as e:
         logging.error(f"Unexpected error during CSV export: {e}", exc_info=True)
         flash("Unexpected error during export.", "error")
         return redirect(url_for('member.member_dir'))
 
-    output_bytes = BytesIO()
-    output_bytes.write(output.getvalue().encode('utf-8'))
-    output_bytes.seek(0)
-    output.close()
-    return send_file(output_bytes, mimetype='text/csv', download_name='member_directory.csv', as_attachment=True)
+    def stream():
+        yield header
+        try:
+            yield from rows
+        except Exception as e:
+            # Headers are already sent at this point, so all we can do is log and cut the download short
+            logging.error(f"Error while streaming CSV export: {e}", exc_info=True)
+
+    return Response(stream_with_context(stream()), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=member_directory.csv'})
 
 @member_bp.route("/remove_all_data", methods=["POST"])
 @login_required
@@ -302,27 +376,35 @@ def remove_all_data():
     calls_del, sms_stat_del, sms_del, assoc_del, mem_del, grp_del = 0, 0, 0, 0, 0, 0
     try:
         logging.warning(f"User {session.get('user_email')} initiated complete data removal")
-        from utils.db import get_db_cursor # Import locally for this critical function
         with get_db_cursor() as (cursor, connection):
+            # Advisory lock so two admins can't run overlapping resets
+            cursor.execute("SELECT GET_LOCK('infocall_remove_all_data', 0)")
+            if not cursor.fetchone()[0]:
+                return jsonify({"success": False, "message": "A data reset is already in progress."}), 409
             try:
-                cursor.execute("SET FOREIGN_KEY_CHECKS=0")
+                # sms_status and member_groups rows go via ON DELETE CASCADE, so count them up front
+                cursor.execute("SELECT (SELECT COUNT(*) FROM sms_status), (SELECT COUNT(*) FROM member_groups)")
+                sms_stat_del, assoc_del = cursor.fetchone()
+                # Parents in FK order; foreign key checks stay on the whole time
                 cursor.execute("DELETE FROM scheduled_calls"); calls_del = cursor.rowcount
-                cursor.execute("DELETE FROM sms_status"); sms_stat_del = cursor.rowcount
                 cursor.execute("DELETE FROM scheduled_sms"); sms_del = cursor.rowcount
-                cursor.execute("DELETE FROM member_groups"); assoc_del = cursor.rowcount
                 cursor.execute("DELETE FROM members"); mem_del = cursor.rowcount
                 cursor.execute("DELETE FROM groups"); grp_del = cursor.rowcount
-                cursor.execute("SET FOREIGN_KEY_CHECKS=1")
                 connection.commit()
+                Group.invalidate_cache()
                 logging.warning(f"DB reset complete. Deleted: {calls_del} calls, {sms_del} SMS, {mem_del} members, {grp_del} groups")
                 return jsonify({"success": True, "message": f"All data removed. Deleted: {calls_del} calls, {sms_del} SMS, {mem_del} members, {grp_del} groups",
                                 "stats": {"calls_deleted": calls_del, "sms_status_deleted": sms_stat_del, "sms_deleted": sms_del, "associations_deleted": assoc_del, "members_deleted": mem_del, "groups_deleted": grp_del}})
             except Exception as err:
                  logging.error(f"DB error during data removal: {err}", exc_info=True)
                  connection.rollback()
-                 try: cursor.execute("SET FOREIGN_KEY_CHECKS=1")
-                 except: pass
                  return jsonify({"success": False, "message": f"Database error: {str(err)}"}), 500
+            finally:
+                try:
+                    cursor.execute("SELECT RELEASE_LOCK('infocall_remove_all_data')")
+                    cursor.fetchone()
+                except Exception as lock_err:
+                    logging.warning(f"Could not release remove_all_data lock: {lock_err}")
 
     except Exception as e:
         logging.error(f"Unexpected error in remove_all_data: {e}", exc_info=True)
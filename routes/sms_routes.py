@@ -1,41 +1,108 @@
-import os
-import subprocess
-import math
+import functools
+import json
+import zlib
+from collections import Counter
 from datetime import datetime, timedelta
-from flask import render_template, request, redirect, url_for, flash, session, jsonify, abort
-from werkzeug.utils import secure_filename
+from flask import render_template, request, redirect, url_for, flash, session, Response
+from werkzeug.http import http_date
 import logging
-import uuid
-from pydub import AudioSegment
+import time
 
 from . import sms_bp
 from models.group import Group
 from models.member import Member
 from models.sms import SMS # Ensure SMS model is imported
-from services.sms_service import update_sms_status, is_sms_complete, current_sms_session, sms_session_lock # Import from new SMS service
+from services.sms_service import update_sms_status, current_sms_session, sms_session_lock, wake_sms_scheduler, cancel_sms_campaign # Import from new SMS service
 from utils.security import login_required
-from utils.validation import validate_phone_number
+from utils.validation import is_e164_phone_number
 
 # Corrected Imports to resolve circular dependency
-from app_state import active_sms, active_sms_lock, USER_LOCAL_TIMEZONE, UTC_TIMEZONE # type: ignore
+from app_state import get_sms_campaign_state, SMS_STATUSES, USER_LOCAL_TIMEZONE, UTC_TIMEZONE, to_user_local # type: ignore
 from config import MAX_SMS_PER_MINUTE # type: ignore
+import config # type: ignore
+
+_TERMINAL_CAMPAIGN_STATUSES = frozenset({'completed', 'cancelled', 'failed', 'completed_with_errors'})
+
+# Twilio SmsStatus -> our internal status; anything not listed is 'unknown'
+_TWILIO_STATUS_MAP = {
+    'queued': 'sending', 'sending': 'sending',
+    'sent': 'sent', 'delivered': 'delivered',
+    'undelivered': 'failed', 'failed': 'failed',
+}
+_OPT_OUT_ERROR_CODES = frozenset({'21610'}) # 21610: recipient replied STOP / unsubscribed
+
+# Public base URL Twilio should post status callbacks to (e.g. 'https://infocall.example.com/').
+# Stable per deployment, so the callback URL is built once here; falls back to request.url_root when unset.
+PUBLIC_BASE_URL = getattr(config, 'PUBLIC_BASE_URL', '') or ''
+SMS_STATUS_CALLBACK_URL = f"{PUBLIC_BASE_URL.rstrip('/')}/api/sms_status_callback" if PUBLIC_BASE_URL else None
+
+
+@functools.lru_cache(maxsize=512)
+def _format_local_minute(epoch_minute):
+    """Formats one UTC minute (epoch seconds // 60) as a local display string; cached since campaigns share minutes."""
+    return to_user_local(datetime.fromtimestamp(epoch_minute * 60, UTC_TIMEZONE)).strftime('%Y-%m-%d %I:%M %p %Z')
+
+def _format_scheduled_local(dt):
+    """Local display string for a scheduled (minute-granular) datetime; naive values are UTC."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC_TIMEZONE)
+    return _format_local_minute(int(dt.timestamp() // 60))
+
+
+def _json_default(value):
+    # Same datetime rendering jsonify uses (the session start_time rides along in batch responses)
+    if isinstance(value, datetime):
+        return http_date(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _json_response(payload, status=200):
+    """Compact, unsorted JSON for the polled status endpoints; skips jsonify's key sorting."""
+    body = json.dumps(payload, separators=(',', ':'), default=_json_default)
+    return Response(body, status=status, mimetype='application/json')
+
+
+def _format_clock_local(epoch_seconds):
+    """'%I:%M:%S %p' local display for a status timestamp stored as UTC epoch seconds."""
+    return to_user_local(datetime.fromtimestamp(epoch_seconds, UTC_TIMEZONE)).strftime('%I:%M:%S %p')
+
+def _snapshot_sms_campaign(campaign_id_str):
+    """
+    Copies a campaign's SMS columns under its lock and returns a lookup
+    phone -> (status, details, epoch_seconds) or None, usable after the lock is released.
+    """
+    state = get_sms_campaign_state(campaign_id_str)
+    if state is None:
+        return lambda phone: None
+    with state.lock:
+        phone_index, status_codes, timestamps, details = state.snapshot()
+    count = len(status_codes)
+
+    def lookup(phone):
+        idx = phone_index.get(phone)
+        if idx is None or idx >= count: # >= count: recipient added after the snapshot
+            return None
+        return SMS_STATUSES[status_codes[idx]], details[idx], timestamps[idx]
+    return lookup
+
+
+def _render_sms_mem_form():
+    """Renders the SMS scheduling form; the group list comes from Group's short TTL cache."""
+    groups = []
+    try:
+        groups = Group.get_all_simple()
+    except Exception as e:
+        logging.error(f"Error fetching groups for SMS scheduling form: {e}", exc_info=True)
+        flash("An error occurred loading form data.", "error")
+    today_local = datetime.now(USER_LOCAL_TIMEZONE).strftime("%Y-%m-%d")
+    return render_template("sms_mem.html", groups=groups, today=today_local)
 
 
 @sms_bp.route("/sms_mem", methods=["GET", "POST"])
 @login_required
 def sms_mem():
     if request.method != "POST":
-        groups = []
-        try:
-            groups = Group.get_all_simple()
-            logging.debug("Fetched data for SMS scheduling form (GET).")
-        except Exception as e:
-            logging.error(f"Error fetching data for sms_mem GET: {e}", exc_info=True)
-            flash("An error occurred loading form data.", "error")
-            groups = []
-
-        today_local = datetime.now(USER_LOCAL_TIMEZONE).strftime("%Y-%m-%d")
-        return render_template("sms_mem.html", groups=groups, today=today_local)
+        logging.debug("Rendering SMS scheduling form (GET).")
+        return _render_sms_mem_form()
 
     # POST request for scheduling SMS
     message_content = request.form.get("message_content")
@@ -47,30 +114,21 @@ def sms_mem():
 
     logging.info(f"Scheduling SMS POST: Message='{message_content[:50]}...', Source={source_phone_number}, Date={scheduled_date}, Time={scheduled_time}, Group={group}, User={user_id}")
 
-    def fetch_form_data_for_error_render():
-        groups_form = []
-        try:
-            groups_form = Group.get_all_simple()
-        except Exception as e_fetch:
-            logging.error(f"Error re-fetching form data after validation error: {e_fetch}")
-        today_local_err = datetime.now(USER_LOCAL_TIMEZONE).strftime("%Y-%m-%d")
-        return groups_form, today_local_err
-
     if not all([message_content, source_phone_number, scheduled_date, scheduled_time, user_id]):
         flash("Missing required fields (message, source number, date, time).", "warning")
         logging.warning("SMS schedule failed: Missing required fields.")
-        grp, today_err = fetch_form_data_for_error_render()
-        return render_template("sms_mem.html", groups=grp, today=today_err)
+        return _render_sms_mem_form()
 
-    if not validate_phone_number(source_phone_number):
-        flash("Invalid source phone number format.", "warning")
+    # Sending number goes to Twilio as-is, so it must be E.164 (validate_phone_number is for 4/10-digit member numbers)
+    if not is_e164_phone_number(source_phone_number):
+        flash("Invalid source phone number format. Use E.164, e.g. +15551234567.", "warning")
         logging.warning(f"SMS schedule failed: Invalid source phone number {source_phone_number}.")
-        grp, today_err = fetch_form_data_for_error_render()
-        return render_template("sms_mem.html", groups=grp, today=today_err)
+        return _render_sms_mem_form()
 
     try:
-        scheduled_datetime_str = f"{scheduled_date} {scheduled_time}"
-        naive_datetime_obj = datetime.strptime(scheduled_datetime_str, "%Y-%m-%d %H:%M")
+        # Date/time inputs arrive as YYYY-MM-DD and HH:MM; fromisoformat parses that far faster than strptime
+        scheduled_datetime_str = f"{scheduled_date}T{scheduled_time}"
+        naive_datetime_obj = datetime.fromisoformat(scheduled_datetime_str).replace(tzinfo=None)
 
         # Corrected Timezone Localization for zoneinfo:
         # Assume naive_datetime_obj is in the user's local time, make it aware in that zone.
@@ -84,21 +142,18 @@ def sms_mem():
         if scheduled_dt_utc < (now_utc - timedelta(seconds=1)):
             flash("Cannot schedule SMS in the past.", "warning")
             logging.warning(f"SMS schedule failed: Time in past. Scheduled UTC: {scheduled_dt_utc}, Now UTC: {now_utc}")
-            grp, today_err = fetch_form_data_for_error_render()
-            return render_template("sms_mem.html", groups=grp, today=today_err)
+            return _render_sms_mem_form()
 
         group_id = group if group != "all" else None
         
-        # Determine webhook URL based on current environment or config
-        # For a production environment, this should be a stable, publicly accessible URL
-        # For development, you might use ngrok or similar.
-        # This is a placeholder; you might need to make this configurable.
-        webhook_base_url = request.url_root.replace('http://', 'https://') if request.is_secure else request.url_root
-        status_callback_webhook_url = f"{webhook_base_url}api/sms_status_callback"
+        # Webhook URL comes from PUBLIC_BASE_URL in config.py (computed once at import).
+        # Without it, fall back to the URL this request came in on (fine behind ngrok or similar for dev).
+        status_callback_webhook_url = SMS_STATUS_CALLBACK_URL or f"{request.url_root}api/sms_status_callback"
         logging.info(f"Using SMS status callback webhook URL: {status_callback_webhook_url}")
 
         last_row_id = SMS.create(message_content, source_phone_number, scheduled_dt_utc, group_id, user_id, status_callback_webhook_url)
         logging.info(f"Scheduled SMS inserted with ID: {last_row_id} for UTC time {scheduled_dt_utc}")
+        wake_sms_scheduler()
 
         # Format local time for display in flash message
         flash(f"SMS campaign scheduled successfully for {local_dt_aware.strftime('%Y-%m-%d %I:%M %p %Z')} (ID: {last_row_id}). Status: PENDING.", "success")
@@ -107,48 +162,49 @@ def sms_mem():
     except ValueError as ve:
         logging.error(f"Invalid date/time format submitted: '{scheduled_datetime_str}' - {ve}")
         flash("Invalid date or time format selected. Please use appropriate date-MM-DD and HH:MM.", "error")
-        grp, today_err = fetch_form_data_for_error_render()
-        return render_template("sms_mem.html", groups=grp, today=today_err)
+        return _render_sms_mem_form()
     except Exception as e:
         logging.error(f"Unexpected error scheduling SMS: {e}", exc_info=True)
         flash("An unexpected error occurred while scheduling the SMS campaign.", "error")
         return redirect(url_for("sms.sms_mem"))
 
 
+def _iter_scheduled_sms(scheduled_sms_raw):
+    """Formats scheduled SMS rows for display one at a time, as the template consumes them."""
+    for sms_data in scheduled_sms_raw:
+        db_datetime_utc = sms_data.get('scheduled_datetime')
+        if isinstance(db_datetime_utc, datetime):
+            # Treated as UTC from DB and converted to local for display
+            sms_data['formatted_datetime'] = _format_scheduled_local(db_datetime_utc)
+        elif isinstance(db_datetime_utc, str):
+            try:
+                sms_data['formatted_datetime'] = _format_scheduled_local(datetime.fromisoformat(db_datetime_utc))
+            except ValueError:
+                sms_data['formatted_datetime'] = db_datetime_utc + " (Unparseable UTC string)"
+                logging.warning(f"Could not parse string datetime for SMS {sms_data.get('id')}: {db_datetime_utc}")
+        else:
+            sms_data['formatted_datetime'] = 'N/A'
+            logging.warning(f"Unexpected type or missing scheduled_datetime for SMS {sms_data.get('id')}: {db_datetime_utc}")
+
+        message_text = sms_data.get('message_text') or ''
+        sms_data['message_text_short'] = message_text if len(message_text) <= 50 else message_text[:50] + '...'
+        sms_data['group_filter'] = sms_data.get('group_filter_name', 'all')
+        yield sms_data
+
 @sms_bp.route("/view_scheduled_sms")
 @login_required
 def view_scheduled_sms():
-    scheduled_sms_campaigns = []
     try:
         scheduled_sms_raw = SMS.get_all_scheduled()
-        for sms_data in scheduled_sms_raw:
-            db_datetime_utc = sms_data.get('scheduled_datetime')
-            if isinstance(db_datetime_utc, datetime):
-                # Ensure it's treated as UTC from DB and convert to local for display
-                if db_datetime_utc.tzinfo is None:
-                    db_datetime_utc = db_datetime_utc.replace(tzinfo=UTC_TIMEZONE)
-                dt_local = db_datetime_utc.astimezone(USER_LOCAL_TIMEZONE)
-                sms_data['formatted_datetime'] = dt_local.strftime('%Y-%m-%d %I:%M %p %Z')
-            elif isinstance(db_datetime_utc, str):
-                try:
-                    naive_dt = datetime.fromisoformat(db_datetime_utc)
-                    aware_utc_dt = naive_dt.replace(tzinfo=UTC_TIMEZONE)
-                    dt_local = aware_utc_dt.astimezone(USER_LOCAL_TIMEZONE)
-                    sms_data['formatted_datetime'] = dt_local.strftime('%Y-%m-%d %I:%M %p %Z')
-                except ValueError:
-                    sms_data['formatted_datetime'] = db_datetime_utc + " (Unparseable UTC string)"
-                    logging.warning(f"Could not parse string datetime for SMS {sms_data.get('id')}: {db_datetime_utc}")
-            else:
-                sms_data['formatted_datetime'] = 'N/A'
-                logging.warning(f"Unexpected type or missing scheduled_datetime for SMS {sms_data.get('id')}: {db_data_utc}")
-
-            sms_data['group_filter'] = sms_data.get('group_filter_name', 'all')
-            scheduled_sms_campaigns.append(sms_data)
     except Exception as e:
         logging.error(f"Unexpected error fetching scheduled SMS: {e}", exc_info=True)
         flash("An unexpected error occurred while loading SMS campaigns.", "error")
-        scheduled_sms_campaigns = []
-    return render_template("view_scheduled_sms.html", scheduled_sms_campaigns=scheduled_sms_campaigns)
+        scheduled_sms_raw = []
+    # Rows are formatted as the template loops over them instead of in a separate pass first.
+    # Empty list (not an empty generator) so the template's "no campaigns" branch still works.
+    # Not streamed: base.html pops flashes mid-render, after a streamed response's session cookie has gone out.
+    scheduled_sms = _iter_scheduled_sms(scheduled_sms_raw) if scheduled_sms_raw else []
+    return render_template("view_scheduled_sms.html", scheduled_sms=scheduled_sms)
 
 @sms_bp.route("/remove_scheduled_sms/<int:sms_id>")
 @login_required
@@ -193,7 +249,7 @@ def execute_sms(sms_id):
             return redirect(url_for("sms.view_scheduled_sms"))
 
         logging.info(f"SMS info retrieved for campaign {sms_id}: {sms_info}")
-        is_completed_or_cancelled = sms_info.get('status') in ['completed', 'cancelled', 'failed', 'completed_with_errors']
+        is_completed_or_cancelled = sms_info.get('status') in _TERMINAL_CAMPAIGN_STATUSES
         members = Member.get_members_for_sms(sms_info.get('group_filter'), is_completed_sms=is_completed_or_cancelled)
         logging.info(f"Members found for campaign {sms_id} (is_completed_or_cancelled={is_completed_or_cancelled}): {len(members)}")
 
@@ -208,7 +264,7 @@ def execute_sms(sms_id):
         if 'scheduled_datetime' in sms_info and isinstance(sms_info['scheduled_datetime'], datetime):
             if sms_info['scheduled_datetime'].tzinfo is None:
                 sms_info['scheduled_datetime'] = sms_info['scheduled_datetime'].replace(tzinfo=UTC_TIMEZONE)
-            sms_info['formatted_scheduled_datetime'] = sms_info['scheduled_datetime'].astimezone(USER_LOCAL_TIMEZONE).strftime('%Y-%m-%d %I:%M %p %Z')
+            sms_info['formatted_scheduled_datetime'] = _format_scheduled_local(sms_info['scheduled_datetime'])
         else:
             sms_info['formatted_scheduled_datetime'] = 'N/A'
 
@@ -218,41 +274,35 @@ def execute_sms(sms_id):
             SMS.update_status(sms_id, 'completed', 'No eligible members found') # Update DB if not already completed
 
         total_members = len(members)
-        sent_count = 0
-        delivered_count = 0
-        failed_count = 0
-        opted_out_count = 0
-        
-        campaign_sms_data = active_sms.get(str(sms_id), {})
+
+        # Column snapshot under the lock, then merge outside it so callbacks and pollers aren't held up
+        sms_lookup = _snapshot_sms_campaign(str(sms_id))
         for member in members:
-            phone = member['phone_number']
-            status_data = campaign_sms_data.get(phone, {})
-            member['sms_status'] = status_data.get('status', 'pending')
-            member['sms_details'] = status_data.get('details', '')
-            
-            # Format timestamp for display only here
-            timestamp_utc = status_data.get('timestamp')
-            if isinstance(timestamp_utc, datetime):
-                member['sms_timestamp'] = timestamp_utc.astimezone(USER_LOCAL_TIMEZONE).strftime('%I:%M:%S %p')
+            entry = sms_lookup(member['phone_number'])
+            if entry is None:
+                member['sms_status'], member['sms_details'], member['sms_timestamp'] = 'pending', '', '-'
             else:
-                member['sms_timestamp'] = '-'
-
-            current_member_status = member['sms_status']
-            if current_member_status and current_member_status not in ['pending', 'waiting', 'unknown', 'queued']:
-                sent_count +=1 # Treat anything beyond pending/waiting as 'sent' for progress
-                if current_member_status == 'sent': sent_count +=1
-                elif current_member_status == 'delivered': delivered_count +=1
-                elif current_member_status == 'failed': failed_count +=1
-                elif current_member_status == 'opted_out': opted_out_count +=1
-        
+                status, details, epoch_seconds = entry
+                member['sms_status'] = status
+                member['sms_details'] = details
+                member['sms_timestamp'] = _format_clock_local(epoch_seconds) # Format timestamp for display only here
+
+        # One counting pass; every other status (pending, sending, waiting, ...) is still outstanding
+        status_counts = Counter(member['sms_status'] for member in members)
+        sent_count = status_counts['sent']
+        delivered_count = status_counts['delivered']
+        failed_count = status_counts['failed']
+        opted_out_count = status_counts['opted_out']
+        done_count = sent_count + delivered_count + failed_count + opted_out_count
+
         sms_stats = {
             'total': total_members,
             'sent': sent_count,
             'delivered': delivered_count,
             'failed': failed_count,
             'opted_out': opted_out_count,
-            'pending': total_members - (sent_count + delivered_count + failed_count + opted_out_count), # More accurate pending
-            'progress_percent': round((sent_count + delivered_count + failed_count + opted_out_count / total_members) * 100) if total_members > 0 else 0
+            'pending': total_members - done_count,
+            'progress_percent': round(done_count * 100 / total_members) if total_members > 0 else 0
         }
 
     except Exception as e:
@@ -277,26 +327,8 @@ def batch_sms_status():
     phone_numbers = data.get("phone_numbers", [])
     campaign_id_str = str(data.get("campaign_id", "default"))
     if not phone_numbers:
-        return jsonify({"success": False, "message": "No phone numbers provided"}), 400
-    
-    results = {}
-    with active_sms_lock:
-        campaign_sms = active_sms.get(campaign_id_str, {})
-        for phone in phone_numbers:
-            clean_phone = phone.strip()
-            status_data = campaign_sms.get(clean_phone, {}).copy()
-            # If timestamp is a datetime object, convert it to string for JSON response
-            if 'timestamp' in status_data and isinstance(status_data['timestamp'], datetime):
-                status_data['timestamp'] = status_data['timestamp'].astimezone(USER_LOCAL_TIMEZONE).strftime('%I:%M:%S %p')
-            else:
-                status_data['timestamp'] = '-' # Default if not set or not a datetime object
-            
-            if 'status' not in status_data:
-                status_data['status'] = 'unknown'
-                status_data['details'] = None
+        return _json_response({"success": False, "message": "No phone numbers provided"}, 400)
 
-            results[clean_phone] = status_data
-    
     with sms_session_lock:
         session_progress = current_sms_session.copy()
         if session_progress['campaign_id'] == campaign_id_str:
@@ -304,7 +336,31 @@ def batch_sms_status():
         else:
             session_progress = {'status': 'inactive', 'current_progress': 'N/A'} # Clear if not current campaign
 
-    return jsonify({"success": True, "results": results, "session_progress": session_progress})
+    # The page re-polls with the same body, so campaign version + session progress + body checksum
+    # identify the response; an unchanged poll is answered with a 304 before any per-phone work.
+    state = get_sms_campaign_state(campaign_id_str)
+    campaign_version = state.version if state is not None else 0 # single int read, no lock needed
+    etag = f"{campaign_version}-{session_progress['status']}-{session_progress['current_progress']}-{zlib.crc32(request.get_data()):x}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    results = {}
+    # Copy the columns under the lock; all the per-phone formatting happens after it is released
+    sms_lookup = _snapshot_sms_campaign(campaign_id_str)
+    for phone in phone_numbers:
+        clean_phone = phone.strip()
+        entry = sms_lookup(clean_phone)
+        if entry is None:
+            results[clean_phone] = {'status': 'unknown', 'details': None, 'timestamp': '-'}
+        else:
+            status, details, epoch_seconds = entry
+            results[clean_phone] = {'status': status, 'details': details, 'timestamp': _format_clock_local(epoch_seconds)}
+
+    response = _json_response({"success": True, "results": results, "session_progress": session_progress})
+    response.set_etag(etag, weak=True)
+    return response
 
 @sms_bp.route("/api/sms_status/<phone_number>", methods=["GET"])
 @login_required
@@ -314,33 +370,36 @@ def get_sms_status(phone_number):
     reset_status = request.args.get('reset', '0') == '1'
     logging.info(f"API SMS Status Check: Campaign {campaign_id_str}, Phone {clean_phone}, Reset: {reset_status}")
     status_data_to_return = {}
-    with active_sms_lock:
-        if campaign_id_str not in active_sms:
-            active_sms[campaign_id_str] = {}
-        if reset_status:
-            prev_status = active_sms[campaign_id_str].get(clean_phone, {}).get('status', 'unknown')
+    if reset_status:
+        state = get_sms_campaign_state(campaign_id_str, create=True)
+        with state.lock:
+            prev_status = state.get_status(clean_phone, 'unknown')
             logging.info(f"Resetting status for Campaign {campaign_id_str}, Phone {clean_phone} - Previous status was: {prev_status}")
-            new_status_info = {
+            reset_at = time.time()
+            status_data_to_return = {
                 'status': 'waiting',
                 'details': 'Status manually reset by user',
-                'timestamp': datetime.now(UTC_TIMEZONE) # Store as UTC datetime object
+                'timestamp': datetime.fromtimestamp(reset_at, UTC_TIMEZONE)
             }
-            active_sms[campaign_id_str][clean_phone] = new_status_info
-            status_data_to_return = new_status_info.copy()
+            state.set(clean_phone, status_data_to_return['status'], status_data_to_return['details'], reset_at)
+    else:
+        state = get_sms_campaign_state(campaign_id_str)
+        if state is not None:
+            with state.lock:
+                status_data_to_return = state.get(clean_phone)
         else:
-            status_data_to_return = active_sms[campaign_id_str].get(
-                clean_phone,
-                {'status': 'unknown', 'details': None, 'timestamp': datetime.now(UTC_TIMEZONE)} # Default to UTC datetime
-            ).copy()
+            status_data_to_return = None
+        if status_data_to_return is None:
+            status_data_to_return = {'status': 'unknown', 'details': None, 'timestamp': datetime.now(UTC_TIMEZONE)} # Default to UTC datetime
     
     # Format timestamp for JSON response
     if 'timestamp' in status_data_to_return and isinstance(status_data_to_return['timestamp'], datetime):
-        status_data_to_return['timestamp'] = status_data_to_return['timestamp'].astimezone(USER_LOCAL_TIMEZONE).strftime('%I:%M:%S %p')
+        status_data_to_return['timestamp'] = to_user_local(status_data_to_return['timestamp']).strftime('%I:%M:%S %p')
     else:
         status_data_to_return['timestamp'] = '-' # Fallback if not a datetime object
 
     status_data_to_return['phone_number'] = clean_phone
-    return jsonify(status_data_to_return)
+    return _json_response(status_data_to_return)
 
 @sms_bp.route("/api/sms_status_callback", methods=["POST"])
 def sms_status_callback():
@@ -373,20 +432,12 @@ def sms_status_callback():
             details += f", Error Code: {error_code}"
 
         # Map Twilio statuses to our internal statuses
-        internal_status = 'unknown'
-        if message_status in ['queued', 'sending']:
-            internal_status = 'sending'
-        elif message_status == 'sent':
-            internal_status = 'sent'
-        elif message_status == 'delivered':
-            internal_status = 'delivered'
-        elif message_status in ['undelivered', 'failed']:
-            internal_status = 'failed'
-        
+        internal_status = _TWILIO_STATUS_MAP.get(message_status, 'unknown')
+
         update_sms_status(campaign_id, to_number, internal_status, details)
         
         # If the status is 'failed' and an error code indicates opt-out (e.g., Twilio 21610 for 'Stopped due to unsubscribed keyword')
-        if internal_status == 'failed' and error_code == '21610' and member_id:
+        if internal_status == 'failed' and error_code in _OPT_OUT_ERROR_CODES and member_id:
             try:
                 logging.info(f"Member {member_id} with phone {to_number} opted out via Twilio webhook (Error Code {error_code}). Updating DB.")
                 Member.update_remove_from_sms_status(member_id, 1) # Mark member as opted out from SMS
@@ -406,32 +457,30 @@ def abort_sms(sms_id):
     campaign_id_str = str(sms_id)
     aborted_in_memory_count = 0
     try:
-        if SMS.update_status(sms_id, 'cancelled', 'Aborted by admin'):
-            logging.info(f"Marked SMS campaign {sms_id} as 'cancelled' in DB by user {session.get('user_email')}.")
+        cancelled, prev_status = SMS.update_status_with_previous(sms_id, 'cancelled', 'Aborted by admin')
+        if cancelled:
+            logging.info(f"Marked SMS campaign {sms_id} as 'cancelled' (was '{prev_status}') in DB by user {session.get('user_email')}.")
+            cancel_sms_campaign(sms_id)
+        elif prev_status is not None:
+            logging.info(f"SMS campaign {sms_id} already in status '{prev_status}' or failed to update.")
         else:
-            sms_info_check = SMS.get_by_id(sms_id)
-            if sms_info_check:
-                 logging.info(f"SMS campaign {sms_id} already in status '{sms_info_check.get('status', 'N/A')}' or failed to update.")
-            else:
-                 logging.warning(f"SMS campaign {sms_id} not found in DB during abort operation.")
+            logging.warning(f"SMS campaign {sms_id} not found in DB during abort operation.")
         
-        with active_sms_lock:
-            if campaign_id_str in active_sms:
-                for phone_number, status_data in list(active_sms[campaign_id_str].items()):
-                    # Only update if the SMS is still in a pending/sending state
-                    if status_data.get('status') in ['pending', 'sending', 'queued', 'unknown']:
-                        active_sms[campaign_id_str][phone_number] = {
-                            'status': 'aborted',
-                            'details': 'Aborted by admin',
-                            'timestamp': datetime.now(UTC_TIMEZONE) 
-                        }
-                        aborted_in_memory_count += 1
-                        logging.info(f"Marked SMS to {phone_number} for campaign {campaign_id_str} as 'aborted' in memory.")
+        aborted_phones = []
+        state = get_sms_campaign_state(campaign_id_str)
+        if state is not None:
+            with state.lock:
+                # Only SMS still in a pending/sending state are touched
+                aborted_phones = state.abort_outstanding('Aborted by admin', time.time())
+        aborted_in_memory_count = len(aborted_phones)
+        if aborted_phones:
+            logging.info(f"Marked {aborted_in_memory_count} SMS for campaign {campaign_id_str} as 'aborted' in memory.")
+            logging.debug(f"Aborted SMS recipients for campaign {campaign_id_str}: {aborted_phones}")
         
         flash_msg = f"Abort requested for SMS campaign {sms_id}. {aborted_in_memory_count} message(s) marked 'aborted' in system."
         flash(flash_msg, "info")
-        return jsonify({"success": True, "message": flash_msg, "aborted_count": aborted_in_memory_count})
+        return _json_response({"success": True, "message": flash_msg, "aborted_count": aborted_in_memory_count})
     except Exception as e:
         logging.error(f"Error aborting SMS for campaign {sms_id}: {e}", exc_info=True)
         flash(f"An unexpected error occurred while aborting SMS: {str(e)}", "error")
-        return jsonify({"success": False, "message": f"Unexpected error: {str(e)}"}), 500
\ No newline at end of file
+        return _json_response({"success": False, "message": f"Unexpected error: {str(e)}"}, 500)
\ No newline at end of file
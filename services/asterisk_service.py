@@ -1,14 +1,20 @@
 # services/asterisk_service.py - ENHANCED DEBUG VERSION
+import itertools
 import logging
+import os
 import socket
+import selectors
 import threading
 import time
 import uuid
 import subprocess
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from config import AMI_HOST, AMI_PORT, AMI_USERNAME, AMI_SECRET
+import config # type: ignore
 
 # Corrected Imports to resolve circular dependency
-from app_state import active_calls, active_calls_lock, USER_LOCAL_TIMEZONE, UTC_TIMEZONE
+from app_state import CallEntry, campaign_calls_lock, index_call_ids, index_phone, track_call_status, campaign_status_sets, get_campaign_calls, bump_active_calls_generation, USER_LOCAL_TIMEZONE, UTC_TIMEZONE
 from datetime import datetime, timedelta, timezone
 
 # Global AMI client instance
@@ -16,29 +22,128 @@ ami_client_instance = None
 ami_lock = threading.Lock()
 
 # Global handler registry to persist across reconnections
-_registered_handlers = []
+_registered_handlers = {} # handler -> None; a dict so it dedups in O(1) but keeps registration order
+# A handler may set a `.ami_events` collection of event names; the listener then drops other events
+# before parsing them. Handlers without it receive every event.
 _handler_registry_lock = threading.Lock()
 
 # ENHANCED DEBUG: AMI Connection tracking
-ami_debug_log = []
+# Off unless AMI_DEBUG (or DEBUG_MODE) is set in config.py; errors/failures are still logged as warnings.
+AMI_DEBUG_ENABLED = bool(getattr(config, 'AMI_DEBUG', getattr(config, 'DEBUG_MODE', False)))
+_AMI_ALWAYS_LOGGED_SUFFIXES = ('_ERROR', '_FAILED', '_TIMEOUT', '_NOT_FOUND', '_NO_CONNECTION')
+AMI_DEBUG_LOG_SIZE = 100
+ami_debug_log = deque(maxlen=AMI_DEBUG_LOG_SIZE) # ring buffer: oldest entry drops off in O(1)
 ami_debug_lock = threading.Lock()
 
-def log_ami_debug(action, details=""):
-    """Enhanced debug logging for AMI operations"""
+def log_ami_debug(action, details="", *args):
+    """
+    Enhanced debug logging for AMI operations. With args, details is a %-format string that is
+    only rendered when the entry is actually kept, so hot paths pay nothing while debug is off.
+    """
+    if not AMI_DEBUG_ENABLED:
+        if action.endswith(_AMI_ALWAYS_LOGGED_SUFFIXES):
+            if args:
+                logging.warning("AMI: %s | " + details, action, *args)
+            else:
+                logging.warning("AMI: %s | %s", action, details)
+        return
+    if args:
+        details = details % args
+    # Raw epoch float; the datetime is only built when someone reads the history
+    entry = {'ts': time.time(), 'action': action, 'details': details}
     with ami_debug_lock:
-        timestamp = datetime.now(UTC_TIMEZONE)
-        ami_debug_log.append({
-            'timestamp': timestamp,
-            'action': action,
-            'details': details
-        })
-        
-        # Keep only last 100 entries
-        if len(ami_debug_log) > 100:
-            ami_debug_log[:] = ami_debug_log[-100:]
-    
+        ami_debug_log.append(entry)
+
     logging.info(f"🔌 AMI_DEBUG: {action} | {details}")
 
+def ami_debug_entry_time(entry):
+    """UTC datetime for an ami_debug_log entry."""
+    return datetime.fromtimestamp(entry['ts'], UTC_TIMEZONE)
+
+_AMI_LOGOFF_BYTES = b"Action: Logoff\r\n\r\n"
+# Older Asterisk answers a Command action with "Response: Follows" and the raw CLI text, which can
+# contain blank lines, so that reply ends at this marker rather than at the first blank line
+_AMI_FOLLOWS_PREFIX = b"Response: Follows"
+_AMI_END_COMMAND = b"--END COMMAND--\r\n\r\n"
+_CLI_RESPONSE_HEADERS = frozenset({'Response', 'Privilege', 'ActionID', 'Message'})
+# Per-event debug id: only has to tell events apart in our own logs, so a counter beats uuid4()
+_local_id_ctr = itertools.count(1)
+
+def _parse_ami_event(event_bytes):
+    """Parses one raw AMI message (without its terminating blank line) into a {key: value} dict of str."""
+    event = {}
+    for line in event_bytes.split(b"\r\n"):
+        key, sep, value = line.partition(b": ")
+        if sep:
+            event[key.decode('utf-8', errors='ignore')] = value.decode('utf-8', errors='ignore')
+    return event
+
+def _parse_cli_output(message_bytes):
+    """Pulls the CLI text out of a Command reply: "Output:" lines (Asterisk 14+) or the raw Follows body."""
+    text = message_bytes.decode('utf-8', errors='ignore')
+    if text.startswith('Response: Follows'):
+        lines = text.split('\n')
+        body_start = 0
+        while body_start < len(lines) and lines[body_start].partition(':')[0] in _CLI_RESPONSE_HEADERS:
+            body_start += 1
+        return '\n'.join(line.rstrip('\r') for line in lines[body_start:]).strip()
+    return '\n'.join(line[8:] for line in text.split('\r\n') if line.startswith('Output: ')).strip()
+
+# One selector thread reads every AMI client's socket. A (re)connect registers the new socket and a
+# disconnect unregisters it, so reconnects don't spawn (or wait on) listener threads.
+_ami_selector = selectors.DefaultSelector()
+_ami_selector_lock = threading.Lock()
+_ami_thread = None
+# Self-pipe so (un)registering can wake the thread out of select() right away
+_ami_wake_r, _ami_wake_w = socket.socketpair()
+_ami_wake_r.setblocking(False)
+_ami_wake_w.setblocking(False)
+_ami_selector.register(_ami_wake_r, selectors.EVENT_READ, None)
+
+def _wake_ami_thread():
+    try:
+        _ami_wake_w.send(b"x")
+    except OSError:
+        pass # already has a pending wakeup, either way the thread will look
+
+def _ami_selector_loop():
+    log_ami_debug("EVENT_LISTENER_START", "Shared AMI thread")
+    while True:
+        try:
+            ready = _ami_selector.select()
+        except Exception as e:
+            log_ami_debug("EVENT_LISTENER_SELECT_ERROR", "Error: %s", e)
+            time.sleep(1)
+            continue
+        for key, _ in ready:
+            if key.data is None:
+                try:
+                    while _ami_wake_r.recv(64):
+                        pass
+                except (BlockingIOError, InterruptedError):
+                    pass
+            else:
+                key.data._handle_readable(key.fileobj)
+
+def _register_ami_socket(sock, client):
+    """Adds a connected client's socket to the shared selector (starting its thread if needed)."""
+    global _ami_thread
+    with _ami_selector_lock:
+        _ami_selector.register(sock, selectors.EVENT_READ, client)
+        if _ami_thread is None or not _ami_thread.is_alive():
+            _ami_thread = threading.Thread(target=_ami_selector_loop, name="ami-listener", daemon=True)
+            _ami_thread.start()
+    _wake_ami_thread()
+    return _ami_thread
+
+def _unregister_ami_socket(sock):
+    with _ami_selector_lock:
+        try:
+            _ami_selector.unregister(sock)
+        except (KeyError, ValueError):
+            return # never registered (e.g. failed login) or already removed
+    _wake_ami_thread()
+
 class SocketAMIClient:
     _instance = None
     _lock = threading.Lock()
@@ -70,13 +175,31 @@ class SocketAMIClient:
             self.secret = secret
             self.socket = None
             self.connected = False
-            self.event_handlers = []
-            self.listener_thread = None
-            self.last_activity = time.time()
+            self.event_handlers = () # immutable; replaced wholesale so the listener can iterate it without copying
+            self._handler_set = set() # membership checks for event_handlers
+            self._interesting_events = frozenset() # Event names (bytes) any handler wants; None = all
+            # Listener's receive scratch space, reused for every recv_into instead of a new bytes per read
+            self._rx_buf = bytearray(16384)
+            self._rx_mv = memoryview(self._rx_buf)
+            self._event_buf = bytearray() # received bytes not yet split into complete messages
+            self.listener_thread = None # the shared AMI thread once connected (kept for the debug endpoints)
+            # CLI commands sent over AMI that are waiting for their reply: ActionID -> Future
+            self._pending_cli = {}
+            # Event-list actions (CoreShowChannels etc.) still streaming in: ActionID -> (events so far, Future)
+            self._pending_lists = {}
+            self._cli_ids = itertools.count(1)
+            self._last_activity_mono = time.monotonic() # heartbeat clock; immune to wall-clock/NTP steps
             self.connection_id = str(uuid.uuid4())[:8]
+            # Credentials don't change for the life of the instance, so the login frame is encoded once
+            self._login_bytes = f"Action: Login\r\nUsername: {self.username}\r\nSecret: {self.secret}\r\nEvents: on\r\n\r\n".encode('utf-8')
             self._initialized_once = True
             log_ami_debug("INSTANCE_INITIALIZED", f"ID: {self.connection_id}, Host: {self.host}:{self.port}, User: {self.username}")
 
+    @property
+    def last_activity(self):
+        """Epoch time of the last AMI traffic, for the debug endpoints (tracked internally on the monotonic clock)."""
+        return time.time() - (time.monotonic() - self._last_activity_mono)
+
     def connect(self, max_retries=3, initial_delay=1):
         log_ami_debug("CONNECT_START", f"ID: {self.connection_id}, Max retries: {max_retries}")
         
@@ -104,6 +227,8 @@ class SocketAMIClient:
 
                 log_ami_debug("CONNECTING_SOCKET", f"ID: {self.connection_id}")
                 self.socket.connect((self.host, self.port))
+                # AMI is request/response with small frames; Nagle would just hold them back
+                self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 log_ami_debug("SOCKET_CONNECTED", f"ID: {self.connection_id}")
 
                 log_ami_debug("RECEIVING_GREETING", f"ID: {self.connection_id}")
@@ -115,35 +240,38 @@ class SocketAMIClient:
                     log_ami_debug("UNEXPECTED_GREETING", f"ID: {self.connection_id}, Got: '{greeting.strip()}'")
                     raise ConnectionError("Unexpected AMI greeting")
 
-                login_cmd = f"Action: Login\r\nUsername: {self.username}\r\nSecret: {self.secret}\r\nEvents: on\r\n\r\n"
                 log_ami_debug("SENDING_LOGIN", f"ID: {self.connection_id}, User: {self.username}")
-                self.socket.send(login_cmd.encode('utf-8'))
+                self.socket.sendall(self._login_bytes)
 
-                resp_bytes = b""
-                resp_buffer = ""
+                resp_bytes = bytearray()
+                recv_buf = bytearray(8192)
+                recv_view = memoryview(recv_buf)
                 log_ami_debug("WAITING_LOGIN_RESPONSE", f"ID: {self.connection_id}")
-                
-                while b"\r\n\r\n" not in resp_bytes:
-                    chunk = self.socket.recv(4096)
-                    if not chunk:
+
+                while True:
+                    received = self.socket.recv_into(recv_buf)
+                    if not received:
                         log_ami_debug("LOGIN_NO_RESPONSE", f"ID: {self.connection_id}")
                         raise ConnectionError("AMI connection closed during login response")
-                    resp_bytes += chunk
-                    resp_buffer += chunk.decode('utf-8', errors='ignore')
-                
+                    # Only the new bytes (plus 3 of overlap) need checking for the terminator
+                    search_from = max(len(resp_bytes) - 3, 0)
+                    resp_bytes += recv_view[:received]
+                    if resp_bytes.find(b"\r\n\r\n", search_from) >= 0:
+                        break
+                resp_buffer = resp_bytes.decode('utf-8', errors='ignore') # decoded once, after the full response is in
+
                 log_ami_debug("LOGIN_RESPONSE_RECEIVED", f"ID: {self.connection_id}, Response: '{resp_buffer.strip()}'")
 
                 if "Response: Success" in resp_buffer and "Authentication accepted" in resp_buffer:
                     log_ami_debug("LOGIN_SUCCESS", f"ID: {self.connection_id}")
                     self.connected = True
-                    self.last_activity = time.time()
+                    self._last_activity_mono = time.monotonic()
                     self.socket.settimeout(None)
                     
-                    # Start listener thread
-                    if self.listener_thread is None or not self.listener_thread.is_alive():
-                        self.listener_thread = threading.Thread(target=self._event_listener, daemon=True)
-                        self.listener_thread.start()
-                        log_ami_debug("LISTENER_STARTED", f"ID: {self.connection_id}")
+                    # Hand the socket to the shared AMI thread; no thread per connection
+                    self._event_buf = bytearray()
+                    self.listener_thread = _register_ami_socket(self.socket, self)
+                    log_ami_debug("LISTENER_STARTED", f"ID: {self.connection_id}")
                     return True
                 else:
                     log_ami_debug("LOGIN_FAILED", f"ID: {self.connection_id}, Response: '{resp_buffer.strip()}'")
@@ -179,13 +307,14 @@ class SocketAMIClient:
 
     def add_event_handler(self, handler):
         log_ami_debug("ADD_EVENT_HANDLER", f"ID: {self.connection_id}, Handler: {handler.__name__}, Total handlers: {len(self.event_handlers) + 1}")
-        if handler not in self.event_handlers:
-            self.event_handlers.append(handler)
-        
         # Add to global registry for persistence across reconnections
         with _handler_registry_lock:
+            if handler not in self._handler_set:
+                self._handler_set.add(handler)
+                self.event_handlers = self.event_handlers + (handler,)
+                self._rebuild_event_filter()
             if handler not in _registered_handlers:
-                _registered_handlers.append(handler)
+                _registered_handlers[handler] = None
                 log_ami_debug("HANDLER_REGISTERED_GLOBALLY", f"Handler: {handler.__name__}, Total global: {len(_registered_handlers)}")
         
         return handler
@@ -193,91 +322,171 @@ class SocketAMIClient:
     def _restore_handlers(self):
         """Restore all globally registered handlers to this instance"""
         with _handler_registry_lock:
-            for handler in _registered_handlers:
-                if handler not in self.event_handlers:
-                    self.event_handlers.append(handler)
+            # Instance handlers are always a subset of the registry, so equal sizes means nothing to restore
+            if len(self._handler_set) == len(_registered_handlers):
+                return
+            missing = tuple(handler for handler in _registered_handlers if handler not in self._handler_set)
+            if missing:
+                self._handler_set.update(missing)
+                self.event_handlers = self.event_handlers + missing
+                self._rebuild_event_filter()
+                for handler in missing:
                     log_ami_debug("HANDLER_RESTORED", f"ID: {self.connection_id}, Handler: {handler.__name__}, Total: {len(self.event_handlers)}")
 
-    def _event_listener(self):
-        buffer = ""
-        log_ami_debug("EVENT_LISTENER_START", f"ID: {self.connection_id}")
-        self.socket.settimeout(1.0)
-
-        while self.connected:
-            try:
-                data = self.socket.recv(4096).decode('utf-8', errors='ignore')
-                if not data:
-                    log_ami_debug("EVENT_LISTENER_NO_DATA", f"ID: {self.connection_id}")
-                    break
-                buffer += data
-
-                while "\r\n\r\n" in buffer:
-                    event_text, buffer = buffer.split("\r\n\r\n", 1)
-                    event = {}
-                    for line in event_text.split("\r\n"):
-                        if line and ": " in line:
-                            key, value = line.split(": ", 1)
-                            event[key] = value
-                    
-                    if "Event" in event:
-                        event['_local_id'] = str(uuid.uuid4())[:8]
-                        self.last_activity = time.time()
-
-                        # Log event processing
-                        event_type = event.get('Event', 'UNKNOWN')
-                        log_ami_debug("EVENT_RECEIVED", f"ID: {self.connection_id}, Type: {event_type}, Local ID: {event['_local_id']}")
-
-                        # Log important events with more detail
-                        if event_type in ['Newstate', 'Hangup', 'OriginateResponse', 'DTMFEnd']:
-                            log_ami_debug("IMPORTANT_EVENT", f"ID: {self.connection_id}, Event: {event_type}, Details: {event}")
-
-                        handlers = self.event_handlers.copy()
-                        log_ami_debug("PROCESSING_HANDLERS", f"ID: {self.connection_id}, Event: {event_type}, Handlers: {len(handlers)}")
-                        
-                        for handler in handlers:
-                            try:
-                                handler(event)
-                            except Exception as e:
-                                log_ami_debug("HANDLER_ERROR", f"ID: {self.connection_id}, Handler: {handler.__name__}, Error: {e}")
-
-            except socket.timeout:
-                # Expected timeout, check connection status
-                if not self.connected:
-                    log_ami_debug("EVENT_LISTENER_DISCONNECTED", f"ID: {self.connection_id}")
-                    break
-                continue
-            except (ConnectionResetError, BrokenPipeError, OSError) as e:
-                log_ami_debug("EVENT_LISTENER_CONNECTION_ERROR", f"ID: {self.connection_id}, Error: {e}")
-                self.connected = False
-                break
-            except Exception as e:
-                log_ami_debug("EVENT_LISTENER_UNEXPECTED_ERROR", f"ID: {self.connection_id}, Error: {e}")
+    def _rebuild_event_filter(self):
+        """Recomputes _interesting_events from the handlers' ami_events. Caller holds _handler_registry_lock."""
+        wanted = set()
+        for handler in self.event_handlers:
+            events = getattr(handler, 'ami_events', None)
+            if events is None:
+                self._interesting_events = None
+                return
+            wanted.update(event_name.encode('utf-8') for event_name in events)
+        self._interesting_events = frozenset(wanted)
+
+    def _handle_readable(self, sock):
+        """
+        Called on the shared AMI thread when this client's socket is readable: one recv, then
+        every complete message in the buffer is parsed and dispatched.
+        """
+        try:
+            received = sock.recv_into(self._rx_mv)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            if not self.connected:
+                # disconnect() closed the socket under us; that's a normal stop
+                log_ami_debug("EVENT_LISTENER_DISCONNECTED", "ID: %s", self.connection_id)
+            else:
+                log_ami_debug("EVENT_LISTENER_CONNECTION_ERROR", "ID: %s, Error: %s", self.connection_id, e)
                 self.connected = False
+            self._listener_stopped(sock)
+            return
+        if not received:
+            log_ami_debug("EVENT_LISTENER_NO_DATA", "ID: %s", self.connection_id)
+            self.connected = False
+            self._listener_stopped(sock)
+            return
+
+        try:
+            self._dispatch_received(received)
+        except Exception as e:
+            log_ami_debug("EVENT_LISTENER_UNEXPECTED_ERROR", "ID: %s, Error: %s", self.connection_id, e)
+            self.connected = False
+            self._listener_stopped(sock)
+
+    def _dispatch_received(self, received):
+        buffer = self._event_buf # raw bytes; only complete events are sliced off and decoded
+        buffer += self._rx_mv[:received]
+        self._last_activity_mono = time.monotonic() # once per read, not per event
+
+        # Scan for the blank-line terminator from where the last search stopped, so a long
+        # event arriving over several reads isn't rescanned from the start each time
+        search_from = max(len(buffer) - received - 3, 0)
+        while True:
+            end = buffer.find(b"\r\n\r\n", search_from)
+            if end < 0:
                 break
-        
-        log_ami_debug("EVENT_LISTENER_TERMINATED", f"ID: {self.connection_id}")
+            unwanted = False
+            if buffer.startswith(_AMI_FOLLOWS_PREFIX):
+                end = buffer.find(_AMI_END_COMMAND)
+                if end < 0:
+                    break # rest of the CLI output hasn't arrived yet
+                message = bytes(buffer[:end])
+                del buffer[:end + len(_AMI_END_COMMAND)]
+            else:
+                # Peek at the Event: line and drop events no handler asked for before parsing them
+                # (while an event list is streaming in they're parsed first, in case they belong to it)
+                interesting = self._interesting_events
+                if interesting is not None and buffer.startswith(b"Event: "):
+                    name_end = buffer.find(b"\r\n", 7, end)
+                    unwanted = bytes(buffer[7:name_end if name_end >= 0 else end]) not in interesting
+                    if unwanted and not self._pending_lists:
+                        del buffer[:end + 4]
+                        search_from = 0
+                        continue
+                message = bytes(buffer[:end])
+                del buffer[:end + 4]
+            event = _parse_ami_event(message)
+            search_from = 0
+
+            if "Event" not in event:
+                # A reply, not an event: hand it to run_cli if it's one we're waiting on
+                if self._pending_cli:
+                    future = self._pending_cli.pop(event.get('ActionID'), None)
+                    if future is not None:
+                        future.set_result((event, message))
+                # An event list that was refused never sends its Complete event
+                if self._pending_lists and event.get('Response') == 'Error':
+                    pending = self._pending_lists.pop(event.get('ActionID'), None)
+                    if pending is not None:
+                        pending[1].set_result(None)
+                continue
+
+            if self._pending_lists:
+                pending = self._pending_lists.get(event.get('ActionID'))
+                if pending is not None:
+                    if event['Event'].endswith('Complete'):
+                        self._pending_lists.pop(event['ActionID'], None)
+                        pending[1].set_result(pending[0])
+                    else:
+                        pending[0].append(event)
+                    continue
+            if unwanted:
+                continue
+
+            event['_local_id'] = format(next(_local_id_ctr) & 0xFFFFFFFF, '08x')
+
+            # Log event processing
+            event_type = event.get('Event', 'UNKNOWN')
+            log_ami_debug("EVENT_RECEIVED", "ID: %s, Type: %s, Local ID: %s", self.connection_id, event_type, event['_local_id'])
+
+            # Log important events with more detail
+            if AMI_DEBUG_ENABLED and event_type in ('Newstate', 'Hangup', 'OriginateResponse', 'DTMFEnd'):
+                log_ami_debug("IMPORTANT_EVENT", "ID: %s, Event: %s, Details: %s", self.connection_id, event_type, event)
+
+            handlers = self.event_handlers # tuple snapshot; add_event_handler rebinds rather than mutates
+            log_ami_debug("PROCESSING_HANDLERS", "ID: %s, Event: %s, Handlers: %s", self.connection_id, event_type, len(handlers))
+
+            for handler in handlers:
+                try:
+                    handler(event)
+                except Exception as e:
+                    log_ami_debug("HANDLER_ERROR", "ID: %s, Handler: %s, Error: %s", self.connection_id, handler.__name__, e)
+
+    def _listener_stopped(self, sock):
+        _unregister_ami_socket(sock)
+        log_ami_debug("EVENT_LISTENER_TERMINATED", "ID: %s", self.connection_id)
         self.disconnect()
 
+    def _fail_pending_cli(self):
+        # Nobody is going to answer these now; let run_cli fall back instead of waiting out its timeout
+        for action_id in list(self._pending_cli):
+            future = self._pending_cli.pop(action_id, None)
+            if future is not None:
+                future.set_result(None)
+        for action_id in list(self._pending_lists):
+            pending = self._pending_lists.pop(action_id, None)
+            if pending is not None:
+                pending[1].set_result(None)
+
     def disconnect(self):
         if self.connected:
             try:
                 log_ami_debug("DISCONNECT_START", f"ID: {self.connection_id}")
                 self.connected = False
-                if self.socket:
+                # Take ownership of the socket first so a concurrent read error leaves it alone
+                sock, self.socket = self.socket, None
+                if sock:
+                    # Out of the shared selector first; nothing to join, the AMI thread keeps serving others
+                    _unregister_ami_socket(sock)
                     try:
-                        self.socket.sendall("Action: Logoff\r\n\r\n".encode('utf-8'))
+                        sock.sendall(_AMI_LOGOFF_BYTES)
                         time.sleep(0.1)
                     except Exception as send_err:
                         log_ami_debug("LOGOFF_SEND_ERROR", f"ID: {self.connection_id}, Error: {send_err}")
                     finally:
-                        self.socket.close()
-                    self.socket = None
-                
-                if self.listener_thread and self.listener_thread.is_alive():
-                    log_ami_debug("WAITING_LISTENER_TERMINATE", f"ID: {self.connection_id}")
-                    self.listener_thread.join(timeout=2.0)
-                    if self.listener_thread.is_alive():
-                        log_ami_debug("LISTENER_TERMINATE_TIMEOUT", f"ID: {self.connection_id}")
+                        sock.close()
                 
                 log_ami_debug("DISCONNECT_COMPLETE", f"ID: {self.connection_id}")
             except Exception as e:
@@ -290,51 +499,72 @@ class SocketAMIClient:
                     self.socket = None
         elif self.socket:
             try:
+                _unregister_ami_socket(self.socket)
                 self.socket.close()
                 log_ami_debug("SOCKET_CLEANUP", f"ID: {self.connection_id}")
             except Exception as e:
                 log_ami_debug("SOCKET_CLEANUP_ERROR", f"ID: {self.connection_id}, Error: {e}")
             finally:
                 self.socket = None
+        self._fail_pending_cli()
+
+    @staticmethod
+    def _frame_action(action, params):
+        """Encodes one AMI action (one join + one encode)."""
+        action_lines = [f"Action: {action}\r\n"]
+        action_lines.extend(f"{key}: {value}\r\n" for key, value in params.items())
+        action_lines.append("\r\n")
+        return "".join(action_lines).encode('utf-8')
 
     def send_action(self, action, **params):
+        # Frame the action once up front, not per attempt
+        return self._send_frames(self._frame_action(action, params), action, params)
+
+    def send_actions(self, actions):
+        """
+        Sends several (action, params_dict) pairs in a single sendall, e.g. a burst of Originates.
+        All-or-nothing like send_action: returns True once every frame was handed to the socket.
+        """
+        actions = list(actions)
+        if not actions:
+            return True
+        frames = b"".join(self._frame_action(action, params) for action, params in actions)
+        label = f"{actions[0][0]} x{len(actions)}"
+        return self._send_frames(frames, label, {})
+
+    def _send_frames(self, action_bytes, action, params):
         max_retries = 3
         initial_delay = 0.1
 
         for attempt in range(max_retries):
             try:
-                log_ami_debug("SEND_ACTION_START", f"ID: {self.connection_id}, Action: {action}, Attempt: {attempt + 1}/{max_retries}")
+                log_ami_debug("SEND_ACTION_START", "ID: %s, Action: %s, Attempt: %s/%s", self.connection_id, action, attempt + 1, max_retries)
                 
                 if not self.ensure_connected():
-                    log_ami_debug("SEND_ACTION_NO_CONNECTION", f"ID: {self.connection_id}, Action: {action}, Attempt: {attempt + 1}")
+                    log_ami_debug("SEND_ACTION_NO_CONNECTION", "ID: %s, Action: %s, Attempt: %s", self.connection_id, action, attempt + 1)
                     if attempt == max_retries - 1:
                         return False
                     time.sleep(initial_delay * (2 ** attempt))
                     continue
 
-                self.last_activity = time.time()
-                action_str = f"Action: {action}\r\n"
-                for key, value in params.items():
-                    action_str += f"{key}: {value}\r\n"
-                action_str += "\r\n"
-                
-                log_ami_debug("SENDING_ACTION", f"ID: {self.connection_id}, Action: {action}, Params: {params}")
-                self.socket.sendall(action_str.encode('utf-8'))
-                log_ami_debug("ACTION_SENT_SUCCESS", f"ID: {self.connection_id}, Action: {action}")
+                self._last_activity_mono = time.monotonic()
+                log_ami_debug("SENDING_ACTION", "ID: %s, Action: %s, Params: %s", self.connection_id, action, params)
+                self.socket.sendall(action_bytes)
+                log_ami_debug("ACTION_SENT_SUCCESS", "ID: %s, Action: %s", self.connection_id, action)
                 return True
 
             except (OSError, BrokenPipeError, socket.error) as e:
-                log_ami_debug("SEND_ACTION_SOCKET_ERROR", f"ID: {self.connection_id}, Action: {action}, Attempt: {attempt + 1}, Error: {e}")
+                log_ami_debug("SEND_ACTION_SOCKET_ERROR", "ID: %s, Action: %s, Attempt: %s, Error: %s", self.connection_id, action, attempt + 1, e)
                 self.connected = False
                 self.disconnect()
                 if attempt == max_retries - 1:
-                    log_ami_debug("SEND_ACTION_FAILED_ALL_ATTEMPTS", f"ID: {self.connection_id}, Action: {action}")
+                    log_ami_debug("SEND_ACTION_FAILED_ALL_ATTEMPTS", "ID: %s, Action: %s", self.connection_id, action)
                     return False
                 time.sleep(initial_delay * (2 ** attempt))
                 continue
 
             except Exception as e:
-                log_ami_debug("SEND_ACTION_UNEXPECTED_ERROR", f"ID: {self.connection_id}, Action: {action}, Attempt: {attempt + 1}, Error: {e}")
+                log_ami_debug("SEND_ACTION_UNEXPECTED_ERROR", "ID: %s, Action: %s, Attempt: %s, Error: %s", self.connection_id, action, attempt + 1, e)
                 if attempt == max_retries - 1:
                     return False
                 time.sleep(initial_delay * (2 ** attempt))
@@ -342,9 +572,60 @@ class SocketAMIClient:
 
         return False
 
+    def run_cli(self, cmd, timeout=10):
+        """
+        Runs an Asterisk CLI command over the AMI socket (Action: Command) instead of spawning
+        `asterisk -rx`. Returns (success, output) like run_asterisk_command, or None when AMI
+        can't take it (not connected, no reply, no 'command' permission) so the caller can fall back.
+        """
+        if not self.connected or threading.current_thread() is _ami_thread:
+            return None # the listener can't wait on a reply it would have to read itself
+        action_id = f"cli-{self.connection_id}-{next(self._cli_ids)}"
+        future = Future()
+        self._pending_cli[action_id] = future
+        try:
+            if not self.send_action('Command', ActionID=action_id, Command=cmd):
+                return None
+            reply = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            log_ami_debug("CLI_COMMAND_TIMEOUT", "ID: %s, Command: %s", self.connection_id, cmd)
+            return None
+        finally:
+            self._pending_cli.pop(action_id, None)
+
+        if reply is None:
+            return None
+        response, message = reply
+        if response.get('Response') in ('Success', 'Follows'):
+            return True, _parse_cli_output(message)
+        error = response.get('Message', '')
+        if 'permission denied' in error.lower():
+            return None
+        return False, error or _parse_cli_output(message)
+
+    def run_event_list(self, action, timeout=10, **params):
+        """
+        Sends an action that answers with an event list (e.g. CoreShowChannels) and returns the
+        list's events as dicts, or None when AMI can't answer (not connected, refused, no reply).
+        """
+        if not self.connected or threading.current_thread() is _ami_thread:
+            return None # same as run_cli: the listener would have to read the reply itself
+        action_id = f"list-{self.connection_id}-{next(self._cli_ids)}"
+        future = Future()
+        self._pending_lists[action_id] = ([], future)
+        try:
+            if not self.send_action(action, ActionID=action_id, **params):
+                return None
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            log_ami_debug("EVENT_LIST_TIMEOUT", "ID: %s, Action: %s", self.connection_id, action)
+            return None
+        finally:
+            self._pending_lists.pop(action_id, None)
+
     def heartbeat(self):
         if self.connected:
-            if time.time() - self.last_activity > 45:
+            if time.monotonic() - self._last_activity_mono > 45:
                 log_ami_debug("HEARTBEAT_PING", f"ID: {self.connection_id}")
                 if not self.send_action('Ping'):
                     log_ami_debug("HEARTBEAT_FAILED", f"ID: {self.connection_id}")
@@ -375,149 +656,162 @@ def initialize_ami_client(event_handler_function=None):
             log_ami_debug("INITIALIZE_FAILED", "Could not establish connection")
             return False
 
+# Call status ranking and state groups used by update_call_status / is_call_complete (built once, not per event)
+CALL_STATUS_HIERARCHY = {
+    'unknown': 0, 'pending': 1, 'waiting': 2, 'dialing': 10, 'ringing': 20,
+    'answered': 50, 'dtmf_received': 60, 'completed': 70, 'opted_out': 80,
+    'noanswer': 90, 'busy': 90, 'rejected': 90, 'aborted': 90
+}
+FINAL_CALL_STATUSES = frozenset({'completed', 'noanswer', 'busy', 'rejected', 'aborted', 'opted_out'})
+_TRANSITIONAL_CALL_STATUSES = frozenset({'dialing', 'ringing'})
+_PRE_DIAL_CALL_STATUSES = frozenset({'pending', 'waiting', 'unknown'})
+_DEFINITIVE_OVERRIDE_STATUSES = frozenset({'completed', 'opted_out', 'aborted'})
+_UNREACHED_CALL_STATUSES = frozenset({'noanswer', 'busy', 'rejected'})
+
 def update_call_status(campaign_id, phone_number, status, details=None, action_id=None, uniqueid=None):
     """Enhanced debug version of update_call_status"""
-    log_ami_debug("UPDATE_CALL_STATUS", f"C:{campaign_id} P:{phone_number} Status:{status} Details:{details} ActionID:{action_id} UniqueID:{uniqueid}")
+    log_ami_debug("UPDATE_CALL_STATUS", "C:%s P:%s Status:%s Details:%s ActionID:%s UniqueID:%s", campaign_id, phone_number, status, details, action_id, uniqueid)
     
-    with active_calls_lock:
-        campaign_id_str = str(campaign_id)
-        if campaign_id_str not in active_calls:
-            active_calls[campaign_id_str] = {}
-            log_ami_debug("CREATED_CAMPAIGN_DICT", f"C:{campaign_id_str}")
-        
-        timestamp_utc = datetime.now(UTC_TIMEZONE)
-        current_data = active_calls[campaign_id_str].get(phone_number, {})
-        current_status = current_data.get('status', '')
-        
-        log_ami_debug("CURRENT_CALL_DATA", f"C:{campaign_id_str} P:{phone_number} Current:{current_status} Data:{current_data}")
+    campaign_id_str = str(campaign_id)
+    # Only this campaign's lock: updates for other campaigns proceed in parallel
+    with campaign_calls_lock(campaign_id_str):
+        # Fetched under the lock so a concurrent cleanup can't drop the dict we write into
+        calls = get_campaign_calls(campaign_id_str, create=True)
+        current = calls.get(phone_number)
+        current_status = current.status if current is not None else ''
         
-        is_already_finalized = current_data.get('finalized_in_memory', False)
+        log_ami_debug("CURRENT_CALL_DATA", "C:%s P:%s Current:%s Data:%s", campaign_id_str, phone_number, current_status, current)
         
-        status_hierarchy = {
-            'unknown': 0, 'pending': 1, 'waiting': 2, 'dialing': 10, 'ringing': 20, 
-            'answered': 50, 'dtmf_received': 60, 'completed': 70, 'opted_out': 80,
-            'noanswer': 90, 'busy': 90, 'rejected': 90, 'aborted': 90
-        }
-        current_significance = status_hierarchy.get(current_status, 0)
-        new_significance = status_hierarchy.get(status, 0)
-
-        log_ami_debug("STATUS_SIGNIFICANCE", f"C:{campaign_id_str} P:{phone_number} Current:{current_status}({current_significance}) New:{status}({new_significance}) Finalized:{is_already_finalized}")
-
-        # Handle waiting status (manual reset)
-        if status == 'waiting':
-            log_ami_debug("STATUS_RESET_WAITING", f"C:{campaign_id_str} P:{phone_number}")
-            active_calls[campaign_id_str][phone_number] = {
-                'status': status,
-                'details': details or 'Status manually reset',
-                'timestamp': timestamp_utc,
-                'action_id': action_id if action_id is not None else current_data.get('action_id'),
-                'uniqueid': uniqueid if uniqueid is not None else current_data.get('uniqueid'),
-                'finalized_in_memory': False
-            }
-            return
+        is_already_finalized = current is not None and current.finalized
         
-        # Initial status setting
-        if not current_status:
-            log_ami_debug("STATUS_INITIAL_SET", f"C:{campaign_id_str} P:{phone_number} -> {status}")
-            active_calls[campaign_id_str][phone_number] = {
-                'status': status,
-                'details': details,
-                'timestamp': timestamp_utc,
-                'action_id': action_id,
-                'uniqueid': uniqueid,
-                'finalized_in_memory': False
-            }
-            if status in ['completed', 'noanswer', 'busy', 'rejected', 'aborted', 'opted_out']:
-                active_calls[campaign_id_str][phone_number]['finalized_in_memory'] = True
-                log_ami_debug("STATUS_FINALIZED_INITIAL", f"C:{campaign_id_str} P:{phone_number} Status:{status}")
-            return
+        current_significance = CALL_STATUS_HIERARCHY.get(current_status, 0)
+        new_significance = CALL_STATUS_HIERARCHY.get(status, 0)
 
-        # Determine if update should be allowed
-        allow_update = False
-        update_reason = ""
-        
-        if new_significance > current_significance:
-            allow_update = True
-            update_reason = "Higher significance"
-        elif status == current_status:
-            allow_update = True
-            update_reason = "Same status, updating details"
-        elif current_status in ['dialing', 'ringing'] and status not in ['pending', 'waiting', 'unknown']:
-            allow_update = True
-            update_reason = "From transitional to non-transitional"
-        elif is_already_finalized and status in ['completed', 'opted_out', 'aborted'] and new_significance < current_significance:
-            allow_update = True
-            update_reason = "Definitive final state override"
-        elif is_already_finalized and status in ['noanswer', 'busy', 'rejected'] and current_status in ['dialing', 'ringing']:
-            allow_update = True
-            update_reason = "AMI final status override stuck status"
-
-        log_ami_debug("UPDATE_DECISION", f"C:{campaign_id_str} P:{phone_number} Allow:{allow_update} Reason:{update_reason}")
-
-        if is_already_finalized and not allow_update:
-            log_ami_debug("UPDATE_SKIPPED_FINALIZED", f"C:{campaign_id_str} P:{phone_number} Current:{current_status} New:{status}")
-            return
+        log_ami_debug("STATUS_SIGNIFICANCE", "C:%s P:%s Current:%s(%s) New:%s(%s) Finalized:%s", campaign_id_str, phone_number, current_status, current_significance, status, new_significance, is_already_finalized)
 
-        if allow_update:
-            # Update the call data
-            active_calls[campaign_id_str][phone_number].update({
-                'status': status,
-                'details': details,
-                'timestamp': timestamp_utc,
-                'action_id': action_id if action_id is not None else current_data.get('action_id'),
-                'uniqueid': uniqueid if uniqueid is not None else current_data.get('uniqueid')
-            })
-            
-            # Mark as finalized if it's a final state
-            if status in ['completed', 'noanswer', 'busy', 'rejected', 'aborted', 'opted_out']:
-                active_calls[campaign_id_str][phone_number]['finalized_in_memory'] = True
-                log_ami_debug("STATUS_FINALIZED_UPDATE", f"C:{campaign_id_str} P:{phone_number} Status:{status}")
-            else:
-                active_calls[campaign_id_str][phone_number]['finalized_in_memory'] = False
+        is_final = status in FINAL_CALL_STATUSES
 
-            log_ami_debug("STATUS_UPDATED", f"C:{campaign_id_str} P:{phone_number} {current_status} -> {status} {details or ''}")
+        if status == 'waiting':
+            # Manual reset always applies
+            log_ami_debug("STATUS_RESET_WAITING", "C:%s P:%s", campaign_id_str, phone_number)
+            details = details or 'Status manually reset'
+        elif not current_status:
+            log_ami_debug("STATUS_INITIAL_SET", "C:%s P:%s -> %s", campaign_id_str, phone_number, status)
         else:
-            log_ami_debug("UPDATE_SKIPPED_CONDITIONS", f"C:{campaign_id_str} P:{phone_number} Current:{current_status}({current_significance}) New:{status}({new_significance})")
+            # Each category is tested once; the or-chain stops at the first rule that allows the update
+            current_transitional = current_status in _TRANSITIONAL_CALL_STATUSES
+            allow_update = (
+                new_significance > current_significance # higher significance
+                or status == current_status # same status, updating details
+                or (current_transitional and status not in _PRE_DIAL_CALL_STATUSES) # transitional -> non-transitional
+                or (is_already_finalized and (
+                    # definitive final state override
+                    (status in _DEFINITIVE_OVERRIDE_STATUSES and new_significance < current_significance)
+                    # AMI final status overrides a stuck status
+                    or (status in _UNREACHED_CALL_STATUSES and current_transitional)
+                ))
+            )
+            log_ami_debug("UPDATE_DECISION", "C:%s P:%s Allow:%s", campaign_id_str, phone_number, allow_update)
+
+            if not allow_update:
+                if is_already_finalized:
+                    log_ami_debug("UPDATE_SKIPPED_FINALIZED", "C:%s P:%s Current:%s New:%s", campaign_id_str, phone_number, current_status, status)
+                else:
+                    log_ami_debug("UPDATE_SKIPPED_CONDITIONS", "C:%s P:%s Current:%s(%s) New:%s(%s)", campaign_id_str, phone_number, current_status, current_significance, status, new_significance)
+                return
+
+        if current is None:
+            current = calls[phone_number] = CallEntry(status, details, time.time(), finalized=is_final)
+            index_call_ids(campaign_id_str, phone_number, current, action_id, uniqueid)
+            index_phone(campaign_id_str, phone_number)
+            track_call_status(campaign_id_str, phone_number, None, status)
+        else:
+            # Existing entry (the common case): overwrite fields in place, no new object.
+            # Ids we weren't given carry over.
+            track_call_status(campaign_id_str, phone_number, current.status, status)
+            current.status = status
+            current.details = details
+            current.ts = time.time()
+            current.finalized = is_final
+            if action_id is not None or uniqueid is not None:
+                index_call_ids(campaign_id_str, phone_number, current, action_id, uniqueid)
+        bump_active_calls_generation()
+
+        if is_final:
+            log_ami_debug("STATUS_FINALIZED", "C:%s P:%s Status:%s", campaign_id_str, phone_number, status)
+        log_ami_debug("STATUS_UPDATED", "C:%s P:%s %s -> %s %s", campaign_id_str, phone_number, current_status, status, details or '')
 
 def is_call_complete(phone, campaign_id):
     """Enhanced debug version of is_call_complete"""
-    with active_calls_lock:
-        campaign_id_str = str(campaign_id)
-        if campaign_id_str not in active_calls or phone not in active_calls[campaign_id_str]:
-            log_ami_debug("CALL_COMPLETE_NOT_IN_MEMORY", f"C:{campaign_id_str} P:{phone}")
+    campaign_id_str = str(campaign_id)
+    calls = get_campaign_calls(campaign_id_str)
+    if calls is None:
+        log_ami_debug("CALL_COMPLETE_NOT_IN_MEMORY", "C:%s P:%s", campaign_id_str, phone)
+        return True
+    with campaign_calls_lock(campaign_id_str):
+        call_data = calls.get(phone)
+        if call_data is None:
+            log_ami_debug("CALL_COMPLETE_NOT_IN_MEMORY", "C:%s P:%s", campaign_id_str, phone)
             return True
+
+        status = call_data.status
+        finalized = call_data.finalized
+        is_complete = status in FINAL_CALL_STATUSES or finalized
         
-        status = active_calls[campaign_id_str][phone].get('status', '')
-        finalized = active_calls[campaign_id_str][phone].get('finalized_in_memory', False)
-        is_complete = status in ['completed', 'noanswer', 'busy', 'rejected', 'aborted', 'opted_out'] or finalized
-        
-        log_ami_debug("CALL_COMPLETE_CHECK", f"C:{campaign_id_str} P:{phone} Status:{status} Finalized:{finalized} Complete:{is_complete}")
+        log_ami_debug("CALL_COMPLETE_CHECK", "C:%s P:%s Status:%s Finalized:%s Complete:%s", campaign_id_str, phone, status, finalized, is_complete)
         return is_complete
 
+def count_incomplete_calls(campaign_id, phones):
+    """
+    How many of phones (a set) have a call that isn't complete in the is_call_complete sense, counted
+    from the campaign's status sets rather than by checking each phone.
+    """
+    campaign_id_str = str(campaign_id)
+    with campaign_calls_lock(campaign_id_str):
+        count = sum(len(status_phones & phones) for status, status_phones in campaign_status_sets(campaign_id_str).items()
+                    if status not in FINAL_CALL_STATUSES)
+    log_ami_debug("INCOMPLETE_CALL_COUNT", "C:%s Count:%s", campaign_id_str, count)
+    return count
+
+_ASTERISK_PATH = None # resolved on the first run_asterisk_command call
+
 def run_asterisk_command(cmd):
     """Enhanced debug version of run_asterisk_command"""
     log_ami_debug("ASTERISK_CMD_START", f"Command: {cmd}")
+
+    # Prefer the open AMI connection; spawning the CLI binary is the fallback for when AMI is down
+    client = ami_client_instance
+    if client is not None:
+        result = client.run_cli(cmd)
+        if result is not None:
+            log_ami_debug("ASTERISK_CMD_VIA_AMI", "Command: %s, Success: %s", cmd, result[0])
+            return result
     
     try:
-        import os
-        if os.path.exists('/usr/sbin/asterisk'): 
-            asterisk_path = '/usr/sbin/asterisk'
-        elif os.path.exists('/usr/bin/asterisk'): 
-            asterisk_path = '/usr/bin/asterisk'
-        else: 
-            asterisk_path = 'asterisk'
+        global _ASTERISK_PATH
+        if _ASTERISK_PATH is None:
+            # Looked up once; the binary doesn't move while we're running
+            if os.path.exists('/usr/sbin/asterisk'): 
+                _ASTERISK_PATH = '/usr/sbin/asterisk'
+            elif os.path.exists('/usr/bin/asterisk'): 
+                _ASTERISK_PATH = '/usr/bin/asterisk'
+            else: 
+                _ASTERISK_PATH = 'asterisk'
         
-        full_cmd = [asterisk_path, '-rx', cmd]
+        full_cmd = [_ASTERISK_PATH, '-rx', cmd]
         log_ami_debug("ASTERISK_CMD_EXEC", f"Full command: {' '.join(full_cmd)}")
         
-        result = subprocess.run(full_cmd, capture_output=True, text=True, timeout=10, check=False)
+        # Raw bytes: decode stdout once as UTF-8 and only touch stderr when the command failed
+        result = subprocess.run(full_cmd, capture_output=True, timeout=10, check=False)
+        output = result.stdout.decode('utf-8', 'replace').strip()
 
         if result.returncode == 0:
-            log_ami_debug("ASTERISK_CMD_SUCCESS", f"Command: {cmd}, Output length: {len(result.stdout)} chars")
-            return True, result.stdout.strip()
+            log_ami_debug("ASTERISK_CMD_SUCCESS", "Command: %s, Output length: %s chars", cmd, len(output))
+            return True, output
         else:
-            log_ami_debug("ASTERISK_CMD_FAILED", f"Command: {cmd}, Return code: {result.returncode}, STDERR: {result.stderr.strip()}")
-            return False, result.stderr.strip() or result.stdout.strip()
+            error_output = result.stderr.decode('utf-8', 'replace').strip()
+            log_ami_debug("ASTERISK_CMD_FAILED", "Command: %s, Return code: %s, STDERR: %s", cmd, result.returncode, error_output)
+            return False, error_output or output
             
     except FileNotFoundError:
         log_ami_debug("ASTERISK_CMD_NOT_FOUND", f"Command: {cmd}")
@@ -527,4 +821,46 @@ def run_asterisk_command(cmd):
         return False, "Timeout executing Asterisk command."
     except Exception as e:
         log_ami_debug("ASTERISK_CMD_ERROR", f"Command: {cmd}, Error: {e}")
-        return False, str(e)
\ No newline at end of file
+        return False, str(e)
+
+# 'core show channels concise' fields we use; the Uniqueid is always the last field on every version
+_CONCISE_CHANNEL, _CONCISE_EXTEN, _CONCISE_STATE, _CONCISE_CALLERID = 0, 2, 4, 7
+_CONCISE_MIN_FIELDS = 13
+
+def get_channels_snapshot():
+    """
+    All live channels: {uniqueid: {'channel', 'exten', 'state', 'callerid'}}. Taken from an AMI
+    CoreShowChannels event list (already key/value, nothing to split), or from one
+    'core show channels concise' when AMI can't answer. None if both failed.
+    """
+    client = ami_client_instance
+    events = client.run_event_list('CoreShowChannels') if client is not None else None
+    if events is not None:
+        snapshot = {
+            event.get('Uniqueid', ''): {
+                'channel': event.get('Channel', ''),
+                'exten': event.get('Exten', ''),
+                'state': event.get('ChannelStateDesc', ''),
+                'callerid': event.get('CallerIDNum', ''),
+            }
+            for event in events
+        }
+        log_ami_debug("CHANNELS_SNAPSHOT", "Channels: %s (AMI)", len(snapshot))
+        return snapshot
+
+    success, output = run_asterisk_command('core show channels concise')
+    if not success:
+        return None
+    snapshot = {}
+    for line in output.splitlines():
+        fields = line.split('!')
+        if len(fields) < _CONCISE_MIN_FIELDS:
+            continue
+        snapshot[fields[-1]] = {
+            'channel': fields[_CONCISE_CHANNEL],
+            'exten': fields[_CONCISE_EXTEN],
+            'state': fields[_CONCISE_STATE],
+            'callerid': fields[_CONCISE_CALLERID],
+        }
+    log_ami_debug("CHANNELS_SNAPSHOT", "Channels: %s", len(snapshot))
+    return snapshot
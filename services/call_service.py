@@ -1,9 +1,11 @@
 # services/call_service.py - ENHANCED DEBUG VERSION WITH SOLUTION 1
 import os
+import re
 import logging
 import threading
 import time
-import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 # Models
@@ -12,7 +14,7 @@ from models.announcement import Announcement
 from models.member import Member
 
 # Corrected Imports to resolve circular dependency
-from app_state import active_calls, active_calls_lock, USER_LOCAL_TIMEZONE, UTC_TIMEZONE
+from app_state import CallEntry, active_calls, active_calls_lock, active_campaign_ids, campaign_calls_lock, get_campaign_calls, index_call_ids, unindex_call, index_phone, unindex_phone, lookup_campaigns_by_phone, track_call_status, push_stuck_watch, pop_stuck_watch_due, drop_campaign_status_sets, lookup_call_by_action_id, lookup_call_by_uniqueid, bump_active_calls_generation, on_campaign_added, USER_LOCAL_TIMEZONE, UTC_TIMEZONE
 
 # Asterisk service components
 import services.asterisk_service as asterisk_service
@@ -20,23 +22,66 @@ import services.asterisk_service as asterisk_service
 # DB utilities
 from utils.db import get_db_cursor
 
+# Originate pacing
+from utils.rate_limit import TokenBucket
+
 # ENHANCED DEBUG: Add a call tracking dictionary for debugging
-call_debug_tracker = {}
+call_debug_tracker = {} # "campaign_phone" -> deque of the call's most recent debug entries
 call_debug_lock = threading.Lock()
+CALL_DEBUG_HISTORY_SIZE = 50 # per call, to prevent memory bloat
+# Per-call history capture is off by default (every AMI event goes through here); turn it on from
+# /api/debug/capture while investigating a call. The INFO log line is written either way.
+_DEBUG_CAPTURE_ENABLED = False
+
+# Campaign status as seen by the AMI event handler, which would otherwise query the DB once or twice per
+# event. Status writes made through this module drop the entry right away; others age out after the TTL.
+_campaign_status_cache = {} # campaign_id (str) -> (status or None if not found, monotonic fetch time)
+_campaign_status_lock = threading.Lock()
+_CAMPAIGN_STATUS_TTL = 2.0
+
+def _get_campaign_status(campaign_id):
+    """Campaign status (None if the campaign doesn't exist), from the cache when it's fresh enough."""
+    key = str(campaign_id)
+    now = time.monotonic()
+    cached = _campaign_status_cache.get(key)
+    if cached is not None and now - cached[1] < _CAMPAIGN_STATUS_TTL:
+        return cached[0]
+    call_info = Call.get_by_id(int(key))
+    status = call_info.get('status') if call_info else None
+    with _campaign_status_lock:
+        _campaign_status_cache[key] = (status, now)
+    return status
+
+def _update_campaign_status(campaign_id, status, details=None):
+    """Call.update_status plus dropping the cached status for that campaign"""
+    result = Call.update_status(campaign_id, status, details)
+    with _campaign_status_lock:
+        _campaign_status_cache.pop(str(campaign_id), None)
+    return result
 
 # SOLUTION 1: Pre-correlation Storage
-pending_correlations = {}
+# Oldest registration first, so expired entries are always at the head and can be trimmed there
+pending_correlations = OrderedDict()
 pending_correlations_lock = threading.Lock()
+PENDING_CORRELATION_TTL = 120 # seconds
+PENDING_CORRELATION_MAX = 10000
 
 def register_pending_call(phone_number, campaign_id, action_id):
     """Register a call before originating to enable early correlation"""
+    now = time.monotonic()
     with pending_correlations_lock:
+        pending_correlations.pop(phone_number, None) # re-registering moves the phone to the tail
         pending_correlations[phone_number] = {
             'campaign_id': campaign_id,
             'action_id': action_id,
-            'timestamp': datetime.now(UTC_TIMEZONE)
+            'ts': now
         }
-        debug_log_call_state(campaign_id, phone_number, "PENDING_REGISTERED", f"ActionID: {action_id}")
+        # Trim from the head: anything expired, and the oldest beyond the cap
+        while pending_correlations and (
+                len(pending_correlations) > PENDING_CORRELATION_MAX
+                or now - next(iter(pending_correlations.values()))['ts'] > PENDING_CORRELATION_TTL):
+            pending_correlations.popitem(last=False)
+    debug_log_call_state(campaign_id, phone_number, "PENDING_REGISTERED", f"ActionID: {action_id}")
 
 def get_pending_campaign(phone_number):
     """Get campaign ID for a pending call by phone number"""
@@ -44,7 +89,7 @@ def get_pending_campaign(phone_number):
         pending = pending_correlations.get(phone_number)
         if pending:
             # Clean up old entries (older than 2 minutes)
-            if (datetime.now(UTC_TIMEZONE) - pending['timestamp']).total_seconds() > 120:
+            if time.monotonic() - pending['ts'] > PENDING_CORRELATION_TTL:
                 del pending_correlations[phone_number]
                 return None
             return pending['campaign_id']
@@ -58,29 +103,49 @@ def clear_pending_call(phone_number):
 
 def debug_log_call_state(campaign_id, phone_number, action, details=""):
     """Enhanced debug logging for call state tracking"""
-    with call_debug_lock:
+    if _DEBUG_CAPTURE_ENABLED:
         key = f"{campaign_id}_{phone_number}"
-        if key not in call_debug_tracker:
-            call_debug_tracker[key] = []
-        
-        timestamp = datetime.now(UTC_TIMEZONE)
-        call_debug_tracker[key].append({
-            'timestamp': timestamp,
+        entry = {
+            'ts': time.time(), # wall clock as a float; turned into a datetime only when the history is read
             'action': action,
             'details': details
-        })
-        
-        # Keep only last 50 entries per call to prevent memory bloat
-        if len(call_debug_tracker[key]) > 50:
-            call_debug_tracker[key] = call_debug_tracker[key][-50:]
-    
-    logging.info(f"🔍 CALL_DEBUG C:{campaign_id} P:{phone_number} | {action} | {details}")
+        }
+        with call_debug_lock:
+            history = call_debug_tracker.get(key)
+            if history is None:
+                history = call_debug_tracker[key] = deque(maxlen=CALL_DEBUG_HISTORY_SIZE)
+            history.append(entry) # the deque drops the oldest entry itself once full
+
+    if logging.getLogger().isEnabledFor(logging.INFO):
+        logging.info(f"🔍 CALL_DEBUG C:{campaign_id} P:{phone_number} | {action} | {details}")
+
+def set_debug_capture(enabled):
+    """Turns per-call debug history capture on or off; history already captured is kept"""
+    global _DEBUG_CAPTURE_ENABLED
+    _DEBUG_CAPTURE_ENABLED = bool(enabled)
+    logging.info(f"Call debug capture {'enabled' if _DEBUG_CAPTURE_ENABLED else 'disabled'}")
+
+def is_debug_capture_enabled():
+    return _DEBUG_CAPTURE_ENABLED
 
 def get_call_debug_history(campaign_id, phone_number):
     """Get debug history for a specific call"""
     with call_debug_lock:
         key = f"{campaign_id}_{phone_number}"
-        return call_debug_tracker.get(key, []).copy()
+        return list(call_debug_tracker.get(key, ()))
+
+def call_debug_entry_time(entry):
+    """UTC datetime for a call debug history entry"""
+    return datetime.fromtimestamp(entry['ts'], UTC_TIMEZONE)
+
+# Built once at import rather than per lookup
+_CAMPAIGN_FOR_PHONE_QUERY = """
+    SELECT sc.id FROM scheduled_calls sc JOIN members m ON m.phone_number = %s 
+    LEFT JOIN member_groups mg ON m.id = mg.member_id
+    WHERE sc.status IN ('in_progress', 'ready') 
+    AND (sc.group_filter IS NULL OR sc.group_filter = mg.group_id)
+    ORDER BY FIELD(sc.status, 'in_progress', 'ready'), sc.scheduled_datetime DESC LIMIT 1
+"""
 
 # Helper function to find actual campaign ID for events
 def find_actual_campaign_id(phone_number):
@@ -93,30 +158,28 @@ def find_actual_campaign_id(phone_number):
         return pending_campaign
     
     try:
-        with active_calls_lock:
-            for campaign_id, campaign_calls in active_calls.items():
-                if campaign_id != 'default' and phone_number in campaign_calls:
-                    status = campaign_calls[phone_number].get('status')
-                    if status in ['dialing', 'ringing', 'answered']:
-                        debug_log_call_state(campaign_id, phone_number, "FOUND_IN_MEMORY", f"Status: {status}")
-                        return campaign_id
-            
-            # Fallback to database lookup
-            with get_db_cursor(dictionary=True) as (cursor, connection):
-                query = """
-                    SELECT sc.id FROM scheduled_calls sc JOIN members m ON m.phone_number = %s 
-                    LEFT JOIN member_groups mg ON m.id = mg.member_id
-                    WHERE sc.status IN ('in_progress', 'ready') 
-                    AND (sc.group_filter IS NULL OR sc.group_filter = mg.group_id)
-                    ORDER BY CASE WHEN sc.status = 'in_progress' THEN 1 WHEN sc.status = 'ready' THEN 2 ELSE 3 END, 
-                    sc.scheduled_datetime DESC LIMIT 1
-                """
-                cursor.execute(query, (phone_number,))
-                result = cursor.fetchone()
-                if result:
-                    campaign_id = str(result['id'])
-                    debug_log_call_state(campaign_id, phone_number, "FOUND_IN_DB", f"Status: in_progress/ready")
-                    return campaign_id
+        # Only the campaigns that actually have an entry for this phone
+        for campaign_id in lookup_campaigns_by_phone(phone_number):
+            if campaign_id == 'default':
+                continue
+            campaign_calls = get_campaign_calls(campaign_id)
+            if campaign_calls is None:
+                continue
+            with campaign_calls_lock(campaign_id):
+                call_data = campaign_calls.get(phone_number)
+                status = call_data.status if call_data else None
+            if status in ['dialing', 'ringing', 'answered']:
+                debug_log_call_state(campaign_id, phone_number, "FOUND_IN_MEMORY", f"Status: {status}")
+                return campaign_id
+
+        # Fallback to database lookup (no call locks held across the query)
+        with get_db_cursor(dictionary=True, readonly=True) as (cursor, connection):
+            cursor.execute(_CAMPAIGN_FOR_PHONE_QUERY, (phone_number,))
+            result = cursor.fetchone()
+            if result:
+                campaign_id = str(result['id'])
+                debug_log_call_state(campaign_id, phone_number, "FOUND_IN_DB", f"Status: in_progress/ready")
+                return campaign_id
 
     except Exception as e:
         debug_log_call_state("ERROR", phone_number, "LOOKUP_FAILED", str(e))
@@ -125,20 +188,43 @@ def find_actual_campaign_id(phone_number):
     return 'default'
 
 # Global dictionary to store DTMF state for each active call's phone number
-_dtmf_state_buffer = {}
+_dtmf_state_buffer = {} # phone -> {'buffer': digits, 'timestamp': monotonic seconds of the last digit}
 _dtmf_state_lock = threading.Lock()
 DTMF_TIMEOUT_SECONDS = 2.0
+_DTMF_STATE_SWEEP_SIZE = 256 # past this many phones, expired buffers are purged when a new one starts
+
+def _sweep_stale_dtmf_state(now):
+    """Drops buffers whose last digit is older than DTMF_TIMEOUT_SECONDS. Caller holds _dtmf_state_lock."""
+    stale = [phone for phone, state in _dtmf_state_buffer.items() if now - state['timestamp'] > DTMF_TIMEOUT_SECONDS]
+    for phone in stale:
+        del _dtmf_state_buffer[phone]
 
 # Helper functions for forced correlation
 
-def find_call_by_action_id(action_id):
-    """Find campaign and phone by ActionID - more aggressive search"""
-    with active_calls_lock:
-        for campaign_id, calls in active_calls.items():
-            for phone_number, call_data in calls.items():
-                if call_data.get('action_id') == action_id:
-                    return campaign_id, phone_number
-    return None, None
+def _check_indexed_call(campaign_id, phone_number, matches):
+    """Confirms an index hit against the live entry (under its campaign lock); returns (campaign_id, phone) or (None, None)."""
+    if campaign_id is None:
+        return None, None
+    calls = get_campaign_calls(campaign_id)
+    if calls is None:
+        return None, None
+    with campaign_calls_lock(campaign_id):
+        call_data = calls.get(phone_number)
+        if call_data is None or not matches(call_data):
+            return None, None
+    return campaign_id, phone_number
+
+def find_call_by_action_id(action_id, statuses=None):
+    """Find campaign and phone by ActionID (optionally only while the call is in one of statuses)"""
+    campaign_id, phone_number = lookup_call_by_action_id(action_id)
+    return _check_indexed_call(campaign_id, phone_number,
+                               lambda call_data: call_data.action_id == action_id and (statuses is None or call_data.status in statuses))
+
+def find_call_by_uniqueid(uniqueid, statuses):
+    """Find campaign and phone by Asterisk Uniqueid while the call is in one of statuses"""
+    campaign_id, phone_number = lookup_call_by_uniqueid(uniqueid)
+    return _check_indexed_call(campaign_id, phone_number,
+                               lambda call_data: call_data.uniqueid == uniqueid and call_data.status in statuses)
 
 def process_originate_response(event, campaign_id, phone_number):
     """Process OriginateResponse event directly"""
@@ -151,10 +237,13 @@ def process_originate_response(event, campaign_id, phone_number):
                        f"Response: {response}, Channel: {channel}")
     
     if response == 'Success' and originate_uniqueid:
-        with active_calls_lock:
-            if campaign_id in active_calls and phone_number in active_calls[campaign_id]:
-                active_calls[campaign_id][phone_number]['uniqueid'] = originate_uniqueid
-                debug_log_call_state(campaign_id, phone_number, "FORCED_UNIQUEID_STORED", f"UniqueID: {originate_uniqueid}")
+        calls = get_campaign_calls(campaign_id)
+        if calls is not None:
+            with campaign_calls_lock(campaign_id):
+                if phone_number in calls:
+                    index_call_ids(campaign_id, phone_number, calls[phone_number], uniqueid=originate_uniqueid)
+                    bump_active_calls_generation()
+                    debug_log_call_state(campaign_id, phone_number, "FORCED_UNIQUEID_STORED", f"UniqueID: {originate_uniqueid}")
         
         clear_pending_call(phone_number)
         asterisk_service.update_call_status(campaign_id, phone_number, 'answered', 
@@ -166,9 +255,189 @@ def process_originate_response(event, campaign_id, phone_number):
                                           f"Originate failed: {reason}", 
                                           uniqueid=originate_uniqueid, action_id=event.get('ActionID'))
 
+def _handle_newstate(event, campaign_id, phone_number, call_snapshot):
+    """Ringing/Up channel state changes"""
+    event_uniqueid = event.get('Uniqueid')
+    event_actionid = event.get('ActionID')
+    state = event.get('ChannelStateDesc')
+    debug_log_call_state(campaign_id, phone_number, "NEWSTATE_EVENT", f"State: {state}")
+    
+    if state == 'Ringing': 
+        asterisk_service.update_call_status(campaign_id, phone_number, 'ringing', "Phone is ringing", 
+                                          uniqueid=event_uniqueid, action_id=event_actionid)
+    elif state == 'Up': 
+        asterisk_service.update_call_status(campaign_id, phone_number, 'answered', "Call answered", 
+                                          uniqueid=event_uniqueid, action_id=event_actionid)
+
+def _handle_originate_response(event, campaign_id, phone_number, call_snapshot):
+    """Stores the Uniqueid on success, rejects the call on failure"""
+    event_actionid = event.get('ActionID')
+    response = event.get('Response')
+    channel = event.get('Channel')
+    reason = event.get('Reason')
+    originate_uniqueid = event.get('Uniqueid')
+    
+    debug_log_call_state(campaign_id, phone_number, "ORIGINATE_RESPONSE", 
+                       f"Response: {response}, Channel: {channel}, Reason: {reason}, UniqueID: {originate_uniqueid}")
+    
+    if response == 'Success' and originate_uniqueid:
+        # Store the Uniqueid when OriginateResponse is successful (the status is read in the same lock round trip)
+        calls = get_campaign_calls(campaign_id)
+        with campaign_calls_lock(campaign_id):
+            entry = calls.get(phone_number) if calls is not None else None
+            stored = entry is not None
+            current_status = entry.status if stored else None
+            if stored:
+                index_call_ids(campaign_id, phone_number, entry, uniqueid=originate_uniqueid)
+                bump_active_calls_generation()
+        if stored:
+            debug_log_call_state(campaign_id, phone_number, "UNIQUEID_STORED", f"UniqueID: {originate_uniqueid}")
+        else:
+            debug_log_call_state(campaign_id, phone_number, "UNIQUEID_STORE_FAILED", "Call not in active_calls")
+        
+        # SOLUTION 1: Clear pending correlation after successful OriginateResponse
+        clear_pending_call(phone_number)
+        
+        if current_status == 'dialing' or current_status == 'pending':
+            asterisk_service.update_call_status(campaign_id, phone_number, 'dialing', 
+                                              f"Originate successful, channel: {channel}", 
+                                              uniqueid=originate_uniqueid, action_id=event_actionid)
+    elif response == 'Failure':
+        # SOLUTION 1: Clear pending correlation on failure too
+        clear_pending_call(phone_number)
+        asterisk_service.update_call_status(campaign_id, phone_number, 'rejected', 
+                                          f"Originate failed: {reason}", 
+                                          uniqueid=originate_uniqueid, action_id=event_actionid)
+
+def _handle_hangup(event, campaign_id, phone_number, call_snapshot):
+    """Maps the hangup cause (or an earlier opt-out/abort) to a final status"""
+    event_uniqueid = event.get('Uniqueid')
+    event_actionid = event.get('ActionID')
+    cause = event.get('Cause-txt', 'Unknown')
+    debug_log_call_state(campaign_id, phone_number, "HANGUP_EVENT", f"Cause: {cause}")
+    
+    # Current status as of the snapshot taken after correlation
+    current_status_in_memory = call_snapshot.get('status')
+    
+    final_status = None
+    details = None
+    
+    if current_status_in_memory == 'opted_out':
+        final_status = 'opted_out'
+        details = "Member opted out (0# pressed)"
+    elif current_status_in_memory == 'aborted':
+        final_status = 'aborted'
+        details = "Call aborted by admin"
+    elif 'user busy' in cause.lower():
+        final_status = 'busy'
+        details = f"Line busy: {cause}"
+    elif 'no answer' in cause.lower() or 'timeout' in cause.lower():
+        final_status = 'noanswer'
+        details = f"No answer/timeout: {cause}"
+    elif 'rejected' in cause.lower() or 'congestion' in cause.lower() or 'unallocated' in cause.lower():
+        final_status = 'rejected'
+        details = f"Call rejected/failed: {cause}"
+    else:
+        final_status = 'completed'
+        details = f"Call completed: {cause}"
+    
+    debug_log_call_state(campaign_id, phone_number, "HANGUP_STATUS_DECISION", 
+                       f"Final: {final_status}, Current: {current_status_in_memory}")
+    
+    if final_status:
+        asterisk_service.update_call_status(campaign_id, phone_number, final_status, details, 
+                                          uniqueid=event_uniqueid, action_id=event_actionid)
+
+def _handle_dtmf(event, campaign_id, phone_number, call_snapshot):
+    """Buffers digits per phone and processes the 0# opt-out sequence"""
+    event_uniqueid = event.get('Uniqueid')
+    event_actionid = event.get('ActionID')
+    digit = event.get('Digit')
+    dtmf_timestamp = time.monotonic()
+    
+    debug_log_call_state(campaign_id, phone_number, "DTMF_EVENT", f"Digit: {digit}")
+    asterisk_service.update_call_status(campaign_id, phone_number, 'dtmf_received', f"Pressed {digit}", 
+                                      uniqueid=event_uniqueid, action_id=event_actionid)
+
+    # Only the buffer bookkeeping happens under the lock; the opt-out DB work runs after it's released
+    with _dtmf_state_lock:
+        current_dtmf_state = _dtmf_state_buffer.get(phone_number)
+        
+        if current_dtmf_state is None or dtmf_timestamp - current_dtmf_state['timestamp'] > DTMF_TIMEOUT_SECONDS:
+            current_dtmf_state = {'buffer': digit, 'timestamp': dtmf_timestamp}
+            debug_log_call_state(campaign_id, phone_number, "DTMF_BUFFER_RESET", f"Buffer: {digit}")
+            if len(_dtmf_state_buffer) >= _DTMF_STATE_SWEEP_SIZE:
+                _sweep_stale_dtmf_state(dtmf_timestamp)
+        else:
+            current_dtmf_state['buffer'] += digit
+            current_dtmf_state['timestamp'] = dtmf_timestamp
+            debug_log_call_state(campaign_id, phone_number, "DTMF_BUFFER_APPEND", f"Buffer: {current_dtmf_state['buffer']}")
+
+        # Check for opt-out sequence (0#); the entry is dropped right away so it can't fire twice
+        opt_out_triggered = current_dtmf_state['buffer'] == '0#'
+        if opt_out_triggered:
+            _dtmf_state_buffer.pop(phone_number, None)
+        else:
+            _dtmf_state_buffer[phone_number] = current_dtmf_state
+
+    if opt_out_triggered:
+        debug_log_call_state(campaign_id, phone_number, "OPTOUT_DETECTED", "Sequence: 0#")
+        try:
+            member_id = None
+            from utils.db import get_db_cursor
+            with get_db_cursor(dictionary=False, readonly=True) as (cursor, connection):
+                cursor.execute("SELECT id FROM members WHERE phone_number = %s", (phone_number,))
+                member_result = cursor.fetchone()
+                if member_result:
+                    member_id = member_result[0]
+
+            if member_id:
+                from models.member import Member
+                Member.update_remove_from_call_status(member_id, 1)
+                asterisk_service.update_call_status(campaign_id, phone_number, 'opted_out', 
+                                                  "Member pressed 0# to opt out", 
+                                                  uniqueid=event_uniqueid, action_id=event_actionid)
+                debug_log_call_state(campaign_id, phone_number, "OPTOUT_PROCESSED", f"Member ID: {member_id}")
+            else:
+                debug_log_call_state(campaign_id, phone_number, "OPTOUT_FAILED", "Member not found")
+        except Exception as e:
+            debug_log_call_state(campaign_id, phone_number, "OPTOUT_ERROR", str(e))
+
+_EVENT_HANDLERS = {
+    'Newstate': _handle_newstate,
+    'OriginateResponse': _handle_originate_response,
+    'Hangup': _handle_hangup,
+    'DTMFEnd': _handle_dtmf,
+}
+
+# High-volume events that never affect call state; dropped before any correlation work
+_IGNORED_EVENTS = frozenset({'RTCPReceived', 'RTCPSent', 'ExtensionStatus', 'AGIExec', 'VarSet', 'Bridge'})
+
+# Step 4 phone extraction: event fields checked in order, then the Local/ channel name
+_DIGIT_FIELDS = ('CallerIDNum', 'ConnectedLineNum', 'Exten')
+_DIGITS_ONLY = re.compile(r'\d+\Z')
+_LOCAL_RE = re.compile(r'Local/(\d+)@')
+
+def _extract_cid(variables):
+    """CAMPAIGN_ID value from a comma-separated Variable/ChanVariable string, or None"""
+    if not variables:
+        return None
+    # Only a match at the start of a comma-separated segment counts (not e.g. OLD_CAMPAIGN_ID=);
+    # found with str.find so no list of segments is built
+    start = variables.find('CAMPAIGN_ID=')
+    while start > 0 and variables[start - 1] != ',':
+        start = variables.find('CAMPAIGN_ID=', start + 1)
+    if start == -1:
+        return None
+    start += len('CAMPAIGN_ID=')
+    end = variables.find(',', start)
+    return (variables[start:end] if end != -1 else variables[start:]).strip()
+
 # Replace the correlation logic in direct_event_handler_with_optout() function
 
 def direct_event_handler_with_optout(event):
+    if event.get('Event') in _IGNORED_EVENTS:
+        return
     event_type = event.get('Event', 'UNKNOWN')
     event_uniqueid = event.get('Uniqueid')
     event_actionid = event.get('ActionID')
@@ -195,103 +464,74 @@ def direct_event_handler_with_optout(event):
 
     # Step 1: For OriginateResponse events, ALWAYS use ActionID first (most reliable)
     if event_type == 'OriginateResponse' and event_actionid:
-        with active_calls_lock:
-            for cid, calls in active_calls.items():
-                for pnum, call_data in calls.items():
-                    if call_data.get('action_id') == event_actionid:
-                        campaign_id = cid
-                        phone_number = pnum
-                        debug_log_call_state(campaign_id, phone_number, "CORR_BY_ACTIONID_ORIGINATE", f"Event: {event_type}")
-                        break
-                if campaign_id: break
+        campaign_id, phone_number = find_call_by_action_id(event_actionid)
+        if campaign_id:
+            debug_log_call_state(campaign_id, phone_number, "CORR_BY_ACTIONID_ORIGINATE", f"Event: {event_type}")
 
     # Step 2: For other events, try UniqueID correlation (but only for active campaigns)
     elif event_uniqueid and not campaign_id:
-        with active_calls_lock:
-            for cid, calls in active_calls.items():
-                # Skip campaigns that are not currently active
-                try:
-                    call_info = Call.get_by_id(int(cid))
-                    if not call_info or call_info.get('status') not in ['in_progress', 'ready']:
-                        continue
-                except:
-                    continue
-                    
-                for pnum, call_data in calls.items():
-                    if (call_data.get('uniqueid') == event_uniqueid and 
-                        call_data.get('status') in ['dialing', 'ringing', 'answered']):
-                        campaign_id = cid
-                        phone_number = pnum
-                        debug_log_call_state(campaign_id, phone_number, "CORR_BY_UNIQUEID_ACTIVE", f"Event: {event_type}")
-                        break
-                if campaign_id: break
+        cid, pnum = find_call_by_uniqueid(event_uniqueid, ('dialing', 'ringing', 'answered'))
+        if cid:
+            # Only the matched campaign is checked against the DB (no call lock held)
+            try:
+                if _get_campaign_status(cid) in ['in_progress', 'ready']:
+                    campaign_id, phone_number = cid, pnum
+            except:
+                pass
+        if campaign_id:
+            debug_log_call_state(campaign_id, phone_number, "CORR_BY_UNIQUEID_ACTIVE", f"Event: {event_type}")
 
     # Step 3: Try ActionID correlation for non-OriginateResponse events
     if not campaign_id and event_actionid:
-        with active_calls_lock:
-            for cid, calls in active_calls.items():
-                for pnum, call_data in calls.items():
-                    if (call_data.get('action_id') == event_actionid and 
-                        call_data.get('status') in ['dialing', 'ringing', 'pending']):
-                        campaign_id = cid
-                        phone_number = pnum
-                        debug_log_call_state(campaign_id, phone_number, "CORR_BY_ACTIONID", f"Event: {event_type}")
-                        break
-                if campaign_id: break
+        campaign_id, phone_number = find_call_by_action_id(event_actionid, ('dialing', 'ringing', 'pending'))
+        if campaign_id:
+            debug_log_call_state(campaign_id, phone_number, "CORR_BY_ACTIONID", f"Event: {event_type}")
     
     # Step 4: Extract phone number from event if not found
     if not phone_number:
-        if 'CallerIDNum' in event and event['CallerIDNum'].isdigit(): 
-            phone_number = event['CallerIDNum']
-            debug_log_call_state(campaign_id or "UNKNOWN", phone_number, "PHONE_FROM_CALLERIDNUM", f"Event: {event_type}")
-        elif 'ConnectedLineNum' in event and event['ConnectedLineNum'].isdigit(): 
-            phone_number = event['ConnectedLineNum']
-            debug_log_call_state(campaign_id or "UNKNOWN", phone_number, "PHONE_FROM_CONNECTEDLINENUM", f"Event: {event_type}")
-        elif 'Exten' in event and event['Exten'].isdigit(): 
-            phone_number = event['Exten']
-            debug_log_call_state(campaign_id or "UNKNOWN", phone_number, "PHONE_FROM_EXTEN", f"Event: {event_type}")
-        elif 'Channel' in event and 'Local/' in event['Channel']: 
-            phone_number = event['Channel'].split('Local/', 1)[1].split('@', 1)[0]
-            debug_log_call_state(campaign_id or "UNKNOWN", phone_number, "PHONE_FROM_CHANNEL", f"Event: {event_type}")
+        for field in _DIGIT_FIELDS:
+            value = event.get(field)
+            if value and _DIGITS_ONLY.match(value):
+                phone_number = value
+                debug_log_call_state(campaign_id or "UNKNOWN", phone_number, f"PHONE_FROM_{field.upper()}", f"Event: {event_type}")
+                break
+        else:
+            local_match = _LOCAL_RE.search(event.get('Channel', ''))
+            if local_match:
+                phone_number = local_match.group(1)
+                debug_log_call_state(campaign_id or "UNKNOWN", phone_number, "PHONE_FROM_CHANNEL", f"Event: {event_type}")
 
     # Step 5: Extract campaign from event variables (fallback)
     if not campaign_id:
-        for key in event:
-            if key == 'CAMPAIGN_ID': 
-                campaign_id = event[key]
-                debug_log_call_state(campaign_id, phone_number or "UNKNOWN", "CORR_BY_VAR_DIRECT", f"Event: {event_type}")
-                break
-            elif key in ['Variable', 'ChanVariable']:
-                variables = event[key].split(',')
-                for var in variables:
-                    if var.startswith('CAMPAIGN_ID='): 
-                        campaign_id = var.split('=', 1)[1].strip()
-                        debug_log_call_state(campaign_id, phone_number or "UNKNOWN", "CORR_BY_VAR_PARSED", f"Event: {event_type}")
-                        break
-                if campaign_id: break
-            elif key == 'UserField' and not campaign_id and event[key].isdigit(): 
-                campaign_id = event[key]
+        campaign_id = event.get('CAMPAIGN_ID')
+        if campaign_id:
+            debug_log_call_state(campaign_id, phone_number or "UNKNOWN", "CORR_BY_VAR_DIRECT", f"Event: {event_type}")
+        else:
+            campaign_id = _extract_cid(event.get('Variable')) or _extract_cid(event.get('ChanVariable'))
+            if campaign_id:
+                debug_log_call_state(campaign_id, phone_number or "UNKNOWN", "CORR_BY_VAR_PARSED", f"Event: {event_type}")
+            elif event.get('UserField', '').isdigit():
+                campaign_id = event['UserField']
                 debug_log_call_state(campaign_id, phone_number or "UNKNOWN", "CORR_BY_USERFIELD", f"Event: {event_type}")
 
     # If still no phone_number or campaign_id, skip processing
     if not phone_number or not campaign_id:
-        if event_type not in ['RTCPReceived', 'RTCPSent', 'ExtensionStatus', 'AGIExec', 'VarSet', 'Bridge']:
-            logging.debug(f"🚫 SKIPPING_EVENT: {event_type} | Missing phone/campaign | Phone: {phone_number or 'N/A'} | Campaign: {campaign_id or 'N/A'}")
+        logging.debug(f"🚫 SKIPPING_EVENT: {event_type} | Missing phone/campaign | Phone: {phone_number or 'N/A'} | Campaign: {campaign_id or 'N/A'}")
         return
 
     # Final validation - make sure this is an active campaign
     if campaign_id != 'default':
         try:
-            call_info = Call.get_by_id(int(campaign_id))
-            if not call_info or call_info.get('status') not in ['in_progress', 'ready', 'pending']:
-                debug_log_call_state(campaign_id, phone_number, "INACTIVE_CAMPAIGN_SKIP", f"Status: {call_info.get('status') if call_info else 'NOT_FOUND'}")
+            campaign_status = _get_campaign_status(campaign_id)
+            if campaign_status not in ['in_progress', 'ready', 'pending']:
+                debug_log_call_state(campaign_id, phone_number, "INACTIVE_CAMPAIGN_SKIP", f"Status: {campaign_status or 'NOT_FOUND'}")
                 return
         except Exception as e:
             debug_log_call_state(campaign_id, phone_number, "CAMPAIGN_CHECK_ERROR", str(e))
             return
 
-    # Final fallback for campaign_id
-    if campaign_id == 'default' or not campaign_id.isdigit():
+    # Final fallback for campaign_id (any other non-numeric id already bailed out in the status check above)
+    if campaign_id == 'default':
         original_campaign_id = campaign_id
         campaign_id_from_fn = find_actual_campaign_id(phone_number)
         if campaign_id_from_fn != 'default':
@@ -301,143 +541,36 @@ def direct_event_handler_with_optout(event):
             debug_log_call_state(campaign_id, phone_number, "UNMANAGED_CALL", f"Event: {event_type}")
             return
 
-    # Log current active_calls state for this campaign/phone
-    with active_calls_lock:
-        current_state = active_calls.get(campaign_id, {}).get(phone_number, {})
-        debug_log_call_state(campaign_id, phone_number, "CURRENT_STATE", 
-                           f"Status: {current_state.get('status', 'N/A')}, "
-                           f"UniqueID: {current_state.get('uniqueid', 'N/A')}, "
-                           f"ActionID: {current_state.get('action_id', 'N/A')}")
-
-    # Process event based on type
-    if event_type == 'Newstate':
-        state = event.get('ChannelStateDesc')
-        debug_log_call_state(campaign_id, phone_number, "NEWSTATE_EVENT", f"State: {state}")
-        
-        if state == 'Ringing': 
-            asterisk_service.update_call_status(campaign_id, phone_number, 'ringing', "Phone is ringing", 
-                                              uniqueid=event_uniqueid, action_id=event_actionid)
-        elif state == 'Up': 
-            asterisk_service.update_call_status(campaign_id, phone_number, 'answered', "Call answered", 
-                                              uniqueid=event_uniqueid, action_id=event_actionid)
-    
-    elif event_type == 'OriginateResponse':
-        response = event.get('Response')
-        channel = event.get('Channel')
-        reason = event.get('Reason')
-        originate_uniqueid = event.get('Uniqueid')
-        
-        debug_log_call_state(campaign_id, phone_number, "ORIGINATE_RESPONSE", 
-                           f"Response: {response}, Channel: {channel}, Reason: {reason}, UniqueID: {originate_uniqueid}")
-        
-        if response == 'Success' and originate_uniqueid:
-            # Store the Uniqueid when OriginateResponse is successful
-            with active_calls_lock:
-                if campaign_id in active_calls and phone_number in active_calls[campaign_id]:
-                    active_calls[campaign_id][phone_number]['uniqueid'] = originate_uniqueid
-                    debug_log_call_state(campaign_id, phone_number, "UNIQUEID_STORED", f"UniqueID: {originate_uniqueid}")
-                else:
-                    debug_log_call_state(campaign_id, phone_number, "UNIQUEID_STORE_FAILED", "Call not in active_calls")
-            
-            # SOLUTION 1: Clear pending correlation after successful OriginateResponse
-            clear_pending_call(phone_number)
-            
-            current_status = active_calls.get(campaign_id, {}).get(phone_number, {}).get('status')
-            if current_status == 'dialing' or current_status == 'pending':
-                asterisk_service.update_call_status(campaign_id, phone_number, 'dialing', 
-                                                  f"Originate successful, channel: {channel}", 
-                                                  uniqueid=originate_uniqueid, action_id=event_actionid)
-        elif response == 'Failure':
-            # SOLUTION 1: Clear pending correlation on failure too
-            clear_pending_call(phone_number)
-            asterisk_service.update_call_status(campaign_id, phone_number, 'rejected', 
-                                              f"Originate failed: {reason}", 
-                                              uniqueid=originate_uniqueid, action_id=event_actionid)
-
-    elif event_type == 'Hangup':
-        cause = event.get('Cause-txt', 'Unknown')
-        debug_log_call_state(campaign_id, phone_number, "HANGUP_EVENT", f"Cause: {cause}")
-        
-        # Check current status from active_calls
-        current_status_in_memory = active_calls.get(campaign_id, {}).get(phone_number, {}).get('status')
-        
-        final_status = None
-        details = None
-        
-        if current_status_in_memory == 'opted_out':
-            final_status = 'opted_out'
-            details = "Member opted out (0# pressed)"
-        elif current_status_in_memory == 'aborted':
-            final_status = 'aborted'
-            details = "Call aborted by admin"
-        elif 'user busy' in cause.lower():
-            final_status = 'busy'
-            details = f"Line busy: {cause}"
-        elif 'no answer' in cause.lower() or 'timeout' in cause.lower():
-            final_status = 'noanswer'
-            details = f"No answer/timeout: {cause}"
-        elif 'rejected' in cause.lower() or 'congestion' in cause.lower() or 'unallocated' in cause.lower():
-            final_status = 'rejected'
-            details = f"Call rejected/failed: {cause}"
-        else:
-            final_status = 'completed'
-            details = f"Call completed: {cause}"
-        
-        debug_log_call_state(campaign_id, phone_number, "HANGUP_STATUS_DECISION", 
-                           f"Final: {final_status}, Current: {current_status_in_memory}")
-        
-        if final_status:
-            asterisk_service.update_call_status(campaign_id, phone_number, final_status, details, 
-                                              uniqueid=event_uniqueid, action_id=event_actionid)
-
-    elif event_type == 'DTMFEnd':
-        digit = event.get('Digit')
-        dtmf_timestamp = datetime.now(UTC_TIMEZONE)
-        
-        debug_log_call_state(campaign_id, phone_number, "DTMF_EVENT", f"Digit: {digit}")
-        asterisk_service.update_call_status(campaign_id, phone_number, 'dtmf_received', f"Pressed {digit}", 
-                                          uniqueid=event_uniqueid, action_id=event_actionid)
-
-        with _dtmf_state_lock:
-            current_dtmf_state = _dtmf_state_buffer.get(phone_number, {'buffer': '', 'timestamp': None})
-            
-            if not current_dtmf_state['timestamp'] or (dtmf_timestamp - current_dtmf_state['timestamp']).total_seconds() > DTMF_TIMEOUT_SECONDS:
-                current_dtmf_state['buffer'] = digit
-                current_dtmf_state['timestamp'] = dtmf_timestamp
-                debug_log_call_state(campaign_id, phone_number, "DTMF_BUFFER_RESET", f"Buffer: {digit}")
-            else:
-                current_dtmf_state['buffer'] += digit
-                current_dtmf_state['timestamp'] = dtmf_timestamp
-                debug_log_call_state(campaign_id, phone_number, "DTMF_BUFFER_APPEND", f"Buffer: {current_dtmf_state['buffer']}")
-
-            _dtmf_state_buffer[phone_number] = current_dtmf_state
-
-            # Check for opt-out sequence (0#)
-            if current_dtmf_state['buffer'] == '0#':
-                debug_log_call_state(campaign_id, phone_number, "OPTOUT_DETECTED", "Sequence: 0#")
-                try:
-                    member_id = None
-                    from utils.db import get_db_cursor
-                    with get_db_cursor(dictionary=False) as (cursor, connection):
-                        cursor.execute("SELECT id FROM members WHERE phone_number = %s", (phone_number,))
-                        member_result = cursor.fetchone()
-                        if member_result:
-                            member_id = member_result[0]
-
-                    if member_id:
-                        from models.member import Member
-                        Member.update_remove_from_call_status(member_id, 1)
-                        asterisk_service.update_call_status(campaign_id, phone_number, 'opted_out', 
-                                                          "Member pressed 0# to opt out", 
-                                                          uniqueid=event_uniqueid, action_id=event_actionid)
-                        debug_log_call_state(campaign_id, phone_number, "OPTOUT_PROCESSED", f"Member ID: {member_id}")
-                        
-                        current_dtmf_state['buffer'] = ''
-                        _dtmf_state_buffer[phone_number] = current_dtmf_state
-                    else:
-                        debug_log_call_state(campaign_id, phone_number, "OPTOUT_FAILED", "Member not found")
-                except Exception as e:
-                    debug_log_call_state(campaign_id, phone_number, "OPTOUT_ERROR", str(e))
+    # Snapshot the call's current state with one lock round trip; the handlers read from this
+    # and only re-take the lock for the writes they actually make
+    calls = get_campaign_calls(campaign_id)
+    with campaign_calls_lock(campaign_id):
+        entry = calls.get(phone_number) if calls is not None else None
+        call_snapshot = {'status': entry.status, 'uniqueid': entry.uniqueid, 'action_id': entry.action_id} if entry is not None else {}
+    debug_log_call_state(campaign_id, phone_number, "CURRENT_STATE", 
+                       f"Status: {call_snapshot.get('status', 'N/A')}, "
+                       f"UniqueID: {call_snapshot.get('uniqueid', 'N/A')}, "
+                       f"ActionID: {call_snapshot.get('action_id', 'N/A')}")
+
+    handler = _EVENT_HANDLERS.get(event_type)
+    if handler:
+        handler(event, campaign_id, phone_number, call_snapshot)
+
+# The only event types direct_event_handler_with_optout acts on; the AMI listener drops the rest unparsed
+direct_event_handler_with_optout.ami_events = frozenset(_EVENT_HANDLERS)
+
+# Originate pacing: one call every DIAL_INTERVAL_SECONDS per campaign
+DIAL_INTERVAL_SECONDS = 5.0
+
+_campaign_rate_limiters = {} # campaign_id -> TokenBucket, only while auto_execute_call is dialing
+_campaign_rate_limiters_lock = threading.Lock()
+
+def stop_campaign_dialing(campaign_id):
+    """Wakes a campaign's dial loop out of its rate-limit wait so it stops without placing another call"""
+    with _campaign_rate_limiters_lock:
+        rate_limiter = _campaign_rate_limiters.pop(str(campaign_id), None)
+    if rate_limiter:
+        rate_limiter.cancel()
 
 # Rest of the functions remain the same but with added debug logging...
 # [Continue with existing functions but add debug_log_call_state calls at key points]
@@ -452,13 +585,13 @@ def auto_execute_call(call_id, announcement_id, group_filter, caller_id_name):
         announcement_file = Announcement.get_filename_by_id(announcement_id)
         if not announcement_file:
             debug_log_call_state(campaign_id, "ALL", "ANNOUNCEMENT_NOT_FOUND", f"ID: {announcement_id}")
-            Call.update_status(campaign_id, 'cancelled', 'Announcement not found')
+            _update_campaign_status(campaign_id, 'cancelled', 'Announcement not found')
             return
 
         members = Member.get_members_for_call(group_filter)
         debug_log_call_state(campaign_id, "ALL", "MEMBERS_FOUND", f"Count: {len(members)}")
 
-        if not Call.update_status(campaign_id, 'in_progress', 'Execution started'):
+        if not _update_campaign_status(campaign_id, 'in_progress', 'Execution started'):
             debug_log_call_state(campaign_id, "ALL", "STATUS_UPDATE_FAILED", "Could not set in_progress")
             current_call_info = Call.get_by_id(campaign_id)
             if current_call_info and current_call_info['status'] not in ['pending', 'ready']:
@@ -467,15 +600,28 @@ def auto_execute_call(call_id, announcement_id, group_filter, caller_id_name):
 
         if not members:
             debug_log_call_state(campaign_id, "ALL", "NO_MEMBERS", "Campaign completed - no eligible members")
-            Call.update_status(campaign_id, 'completed', 'No eligible members')
+            _update_campaign_status(campaign_id, 'completed', 'No eligible members')
             return
 
         debug_log_call_state(campaign_id, "ALL", "STARTING_CALLS", f"To {len(members)} members")
+
+        with _campaign_rate_limiters_lock:
+            rate_limiter = _campaign_rate_limiters.setdefault(campaign_id, TokenBucket(1.0 / DIAL_INTERVAL_SECONDS))
+
+        # Same for every member of the campaign, so build these once
+        upload_dir = '/var/www/html/infocall/uploads'
+        sound_path = f"{upload_dir}/{os.path.splitext(announcement_file)[0]}"
+        base_vars = f"FORCE_CALLER_ID={caller_id_name}"
+        caller_id_template = f'"{caller_id_name}" <%s>'
         
         for member in members:
             try:
                 phone_number = member['phone_number']
                 member_id = member['id']
+
+                if not rate_limiter.acquire():
+                    debug_log_call_state(campaign_id, phone_number, "DIALING_STOPPED", "Rate limiter cancelled")
+                    break
                 
                 debug_log_call_state(campaign_id, phone_number, "MEMBER_CALL_START", f"Member ID: {member_id}")
                 
@@ -497,38 +643,30 @@ def auto_execute_call(call_id, announcement_id, group_filter, caller_id_name):
                         break
 
                 # Generate ActionID
-                action_id = str(uuid.uuid4())
+                action_id = os.urandom(16).hex() # opaque to Asterisk; no UUID object or hyphens needed
                 debug_log_call_state(campaign_id, phone_number, "ACTION_ID_GENERATED", action_id)
                 
                 # SOLUTION 1: Register pending call before originate
                 register_pending_call(phone_number, campaign_id, action_id)
                 
                 # Store in active_calls immediately
-                with active_calls_lock:
-                    if campaign_id not in active_calls:
-                        active_calls[campaign_id] = {}
-                    active_calls[campaign_id][phone_number] = {
-                        'status': 'dialing',
-                        'details': 'Auto-initiated',
-                        'timestamp': datetime.now(UTC_TIMEZONE),
-                        'action_id': action_id,
-                        'uniqueid': None,
-                        'finalized_in_memory': False
-                    }
+                with campaign_calls_lock(campaign_id):
+                    calls = get_campaign_calls(campaign_id, create=True)
+                    previous = calls.get(phone_number)
+                    if previous is not None:
+                        unindex_call(previous)
+                    entry = calls[phone_number] = CallEntry('dialing', 'Auto-initiated', time.time())
+                    index_call_ids(campaign_id, phone_number, entry, action_id=action_id)
+                    index_phone(campaign_id, phone_number)
+                    track_call_status(campaign_id, phone_number, previous.status if previous is not None else None, 'dialing')
+                    bump_active_calls_generation()
 
                 debug_log_call_state(campaign_id, phone_number, "STORED_IN_ACTIVE_CALLS", f"ActionID: {action_id}")
 
-                upload_dir = '/var/www/html/infocall/uploads'
-                sound_path = f"{upload_dir}/{os.path.splitext(announcement_file)[0]}"
-                variables = [
-                    f"CAMPAIGN_ID={campaign_id}", 
-                    f"DIAL_NUMBER={phone_number}", 
-                    f"MEMBER_ID={member_id}", 
-                    f"FORCE_CALLER_ID={caller_id_name}"
-                ]
+                variables = f"CAMPAIGN_ID={campaign_id},DIAL_NUMBER={phone_number},MEMBER_ID={member_id},{base_vars}"
 
                 debug_log_call_state(campaign_id, phone_number, "ORIGINATE_PARAMS", 
-                                   f"Sound: {sound_path}, Variables: {','.join(variables)}")
+                                   f"Sound: {sound_path}, Variables: {variables}")
 
                 if asterisk_service.ami_client_instance:
                     action_success = asterisk_service.ami_client_instance.send_action(
@@ -536,11 +674,11 @@ def auto_execute_call(call_id, announcement_id, group_filter, caller_id_name):
                         Channel=f'Local/{phone_number}@from-internal',
                         Application='Playback', 
                         Data=sound_path,
-                        CallerID=f'"{caller_id_name}" <{phone_number}>',
+                        CallerID=caller_id_template % phone_number,
                         Async='true', 
                         Timeout='45000',
                         UserField=campaign_id, 
-                        Variable=','.join(variables),
+                        Variable=variables,
                         ActionID=action_id
                     )
                     
@@ -553,91 +691,152 @@ def auto_execute_call(call_id, announcement_id, group_filter, caller_id_name):
                     debug_log_call_state(campaign_id, phone_number, "AMI_CLIENT_NONE", "Cannot originate")
                     asterisk_service.update_call_status(campaign_id, phone_number, 'rejected', 'AMI client unavailable', action_id=action_id)
 
-                time.sleep(5.0)  # Rate limiting
-                
             except Exception as call_err:
                 debug_log_call_state(campaign_id, member.get('phone_number', 'UNKNOWN'), "CALL_ERROR", str(call_err))
                 if member.get('phone_number'):
                     asterisk_service.update_call_status(campaign_id, member['phone_number'], 'rejected', f'Error: {call_err}')
 
+        with _campaign_rate_limiters_lock:
+            _campaign_rate_limiters.pop(campaign_id, None)
+
         # Start monitors
         if members:
             debug_log_call_state(campaign_id, "ALL", "STARTING_MONITORS", f"For {len(members)} members")
-            threading.Thread(target=monitor_auto_call_completion, args=(campaign_id, [m['phone_number'] for m in members]), daemon=True).start()
+            _monitor_pool.submit(monitor_auto_call_completion, campaign_id, [m['phone_number'] for m in members])
             threading.Thread(target=auto_dial_watchdog, args=(campaign_id, 600), daemon=True).start()
 
     except Exception as e:
         debug_log_call_state(campaign_id, "ALL", "CRITICAL_ERROR", str(e))
-        Call.update_status(campaign_id, 'cancelled', f'Execution setup error: {e}')
+        _update_campaign_status(campaign_id, 'cancelled', f'Execution setup error: {e}')
+        with _campaign_rate_limiters_lock:
+            _campaign_rate_limiters.pop(campaign_id, None)
 
 # Background task for auto-dial watchdog (keep existing)
 def auto_dial_watchdog(call_id, timeout=300):
+    campaign_id = str(call_id)
     time.sleep(timeout)
     try:
         call_info = Call.get_by_id(call_id)
         if call_info and call_info['status'] == 'in_progress':
-            debug_log_call_state(str(call_id), "ALL", "WATCHDOG_TIMEOUT", f"After {timeout}s")
-            Call.update_status(call_id, 'completed', 'Watchdog timeout')
+            debug_log_call_state(campaign_id, "ALL", "WATCHDOG_TIMEOUT", f"After {timeout}s")
+            _update_campaign_status(campaign_id, 'completed', 'Watchdog timeout')
     except Exception as e: 
-        debug_log_call_state(str(call_id), "ALL", "WATCHDOG_ERROR", str(e))
+        debug_log_call_state(campaign_id, "ALL", "WATCHDOG_ERROR", str(e))
 
 # Keep existing detect_stuck_calls, scheduled_call_checker, and monitor_auto_call_completion functions
 # but add debug_log_call_state calls at key points...
 
+_LIVE_CHANNEL_STATES = frozenset({'Up', 'Ringing'})
+STUCK_CALL_THRESHOLD_SECONDS = 60
+
 def detect_stuck_calls():
     cleanup_stale_active_calls() 
-    with active_calls_lock:
-        now_utc = datetime.now(UTC_TIMEZONE)
-        campaign_ids_to_check = [cid for cid in active_calls.keys() if cid != 'default']
-        active_db_campaigns = set()
+    now = time.time()
+    # Only calls that went ringing/dialing more than STUCK_CALL_THRESHOLD_SECONDS ago come off the watch heap
+    due = [item for item in pop_stuck_watch_due(now - STUCK_CALL_THRESHOLD_SECONDS) if item[1] != 'default']
+    if not due:
+        return
 
-        if campaign_ids_to_check:
-            try:
-                active_db_campaigns = Call.get_active_campaign_ids(campaign_ids_to_check)
-            except Exception as e:
-                logging.error(f"General error checking campaigns: {e}")
-                return
+    try:
+        active_db_campaigns = Call.get_active_campaign_ids(list({campaign_id for _, campaign_id, _ in due}))
+    except Exception as e:
+        logging.error(f"General error checking campaigns: {e}")
+        for item in due: # retry them next pass
+            push_stuck_watch(*item)
+        return
 
-        for campaign_id, calls in list(active_calls.items()):
-            if campaign_id == 'default' or campaign_id not in active_db_campaigns: 
+    # Re-check each popped call under its campaign's lock; the Asterisk checks and status
+    # updates below run with no call lock held (update_call_status takes it itself)
+    stuck_calls = []
+    seen = set()
+    for _, campaign_id, phone_number in due:
+        if campaign_id not in active_db_campaigns or (campaign_id, phone_number) in seen:
+            continue
+        seen.add((campaign_id, phone_number))
+        with campaign_calls_lock(campaign_id):
+            calls = get_campaign_calls(campaign_id)
+            status_data = calls.get(phone_number) if calls is not None else None
+            if status_data is None:
+                continue
+            status = status_data.status
+            if status not in ['ringing', 'dialing']: 
                 continue
-            for phone_number, status_data in list(calls.items()):
-                status = status_data.get('status', '')
-                timestamp_utc = status_data.get('timestamp')
 
-                if status not in ['ringing', 'dialing'] or not isinstance(timestamp_utc, datetime): 
-                    continue
-                
-                time_diff = (now_utc - timestamp_utc).total_seconds()
-
-                if time_diff > 60:  # Stuck threshold
-                    debug_log_call_state(campaign_id, phone_number, "STUCK_CALL_DETECTED", f"In {status} for {time_diff:.1f}s")
-
-                    success, output = asterisk_service.run_asterisk_command('core show channels')
-                    channel_exists = False
-                    if success:
-                        for line in output.splitlines():
-                            channel_uniqueid = status_data.get('uniqueid')
-                            if phone_number in line and ('Up' in line or 'Ringing' in line):
-                                if channel_uniqueid and channel_uniqueid in line:
-                                    channel_exists = True
-                                    break
-                                elif not channel_uniqueid:
-                                    channel_exists = True
-                                    break
-                    
-                    debug_log_call_state(campaign_id, phone_number, "CHANNEL_CHECK", f"Exists: {channel_exists}")
+            time_diff = now - status_data.ts
+            if time_diff > STUCK_CALL_THRESHOLD_SECONDS:
+                stuck_calls.append((campaign_id, phone_number, status, time_diff, status_data.uniqueid, status_data.action_id))
+            else:
+                # Updated since it was pushed; watch it from its latest change
+                push_stuck_watch(status_data.ts, campaign_id, phone_number)
 
-                    if not channel_exists:
-                        asterisk_service.update_call_status(campaign_id, phone_number, 'noanswer', 
-                                                          'Call timed out (channel gone or uniqueid mismatch)', 
-                                                          uniqueid=status_data.get('uniqueid'), 
-                                                          action_id=status_data.get('action_id'))
-                        debug_log_call_state(campaign_id, phone_number, "STUCK_CALL_RESET", "Marked as noanswer")
+    if not stuck_calls:
+        return
+
+    # One channel listing for the whole pass, reduced to the live Uniqueids and the numbers on live channels;
+    # each stuck call is then a single set lookup (by Uniqueid, or by number if none was recorded yet)
+    channels = asterisk_service.get_channels_snapshot() or {}
+    snap_uids = set()
+    snap_phones = set()
+    for uid, ch in channels.items():
+        if ch['state'] not in _LIVE_CHANNEL_STATES:
+            continue
+        snap_uids.add(uid)
+        snap_phones.add(ch['exten'])
+        snap_phones.add(ch['callerid'])
+        local_match = _LOCAL_RE.search(ch['channel'])
+        if local_match:
+            snap_phones.add(local_match.group(1))
+
+    for campaign_id, phone_number, status, time_diff, channel_uniqueid, action_id in stuck_calls:
+        debug_log_call_state(campaign_id, phone_number, "STUCK_CALL_DETECTED", f"In {status} for {time_diff:.1f}s")
+
+        channel_exists = channel_uniqueid in snap_uids if channel_uniqueid else phone_number in snap_phones
+
+        debug_log_call_state(campaign_id, phone_number, "CHANNEL_CHECK", f"Exists: {channel_exists}")
+
+        if channel_exists:
+            push_stuck_watch(now - time_diff, campaign_id, phone_number) # still up; check it again next pass
+        else:
+            asterisk_service.update_call_status(campaign_id, phone_number, 'noanswer', 
+                                              'Call timed out (channel gone or uniqueid mismatch)', 
+                                              uniqueid=channel_uniqueid, 
+                                              action_id=action_id)
+            debug_log_call_state(campaign_id, phone_number, "STUCK_CALL_RESET", "Marked as noanswer")
+
+# Campaign executions and their completion monitors run on fixed pools instead of a fresh thread each;
+# monitors get their own pool since they live for the whole campaign and must not hold up new executions
+_auto_exec_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='AutoCallExec')
+_monitor_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix='AutoCallMonitor')
+
+# The checker sleeps until the next pending call is due (at most SCHEDULER_MAX_SLEEP_SECONDS, or 60s while
+# calls are up so stuck-call detection keeps its pace); scheduling a call wakes it right away
+_call_scheduler_wakeup = threading.Event()
+SCHEDULER_MAX_SLEEP_SECONDS = 300
+STUCK_CALL_CHECK_SECONDS = 60
+
+def wake_call_scheduler():
+    """Call after inserting or changing a pending scheduled call"""
+    _call_scheduler_wakeup.set()
+
+# A campaign starting (from the checker, the execute page or an originate route) wakes the checker,
+# so a long idle sleep is cut short and stuck-call detection runs every STUCK_CALL_CHECK_SECONDS from then on
+on_campaign_added(wake_call_scheduler)
+
+def _call_scheduler_sleep_seconds():
+    timeout = SCHEDULER_MAX_SLEEP_SECONDS
+    if active_calls:
+        timeout = STUCK_CALL_CHECK_SECONDS
+    next_due = Call.get_next_scheduled_time()
+    if next_due is not None:
+        if next_due.tzinfo is None:
+            next_due = next_due.replace(tzinfo=UTC_TIMEZONE)
+        timeout = min(timeout, (next_due - datetime.now(UTC_TIMEZONE)).total_seconds())
+    return max(1, timeout)
 
 def scheduled_call_checker():
     logging.info("Starting scheduled call checker thread...")
     while True:
+        _call_scheduler_wakeup.clear()
         logging.debug("Scheduled call checker running check...")
         ready_calls = []
         try:
@@ -654,20 +853,15 @@ def scheduled_call_checker():
                     debug_log_call_state(call_id_str, "ALL", "SCHEDULER_FOUND", "Marking as ready")
                     
                     try:
-                        if Call.update_status(call_id_str, 'ready', 'Ready for execution'):
+                        if _update_campaign_status(call_id_str, 'ready', 'Ready for execution'):
                             debug_log_call_state(call_id_str, "ALL", "MARKED_READY", "Starting execution thread")
-                            thread = threading.Thread(
-                                target=auto_execute_call,
-                                args=(
-                                    call_id_str,
-                                    call['announcement_id'],
-                                    call['group_filter'],
-                                    call['caller_id_name']
-                                ),
-                                daemon=True
+                            _auto_exec_pool.submit(
+                                auto_execute_call,
+                                call_id_str,
+                                call['announcement_id'],
+                                call['group_filter'],
+                                call['caller_id_name']
                             )
-                            thread.name = f"AutoCallExec-{call_id_str}"
-                            thread.start()
                         else:
                             debug_log_call_state(call_id_str, "ALL", "MARK_READY_FAILED", "Not pending or update failed")
                     except Exception as exec_err:
@@ -684,70 +878,107 @@ def scheduled_call_checker():
         except Exception as e_main:
             logging.error(f"Unexpected error in call checker loop: {e_main}", exc_info=True)
 
-        time.sleep(60)
+        sleep_seconds = _call_scheduler_sleep_seconds()
+        logging.debug(f"Scheduled call checker sleeping up to {sleep_seconds:.0f}s")
+        _call_scheduler_wakeup.wait(sleep_seconds)
         
 def cleanup_stale_active_calls():
     """Clean up stale entries in active_calls dictionary"""
-    with active_calls_lock:
-        campaigns_to_remove = []
-        
-        for campaign_id, calls in list(active_calls.items()):
-            if campaign_id == 'default':
+    campaigns_to_remove = []
+    campaign_ids = [cid for cid in active_campaign_ids() if cid != 'default']
+    if not campaign_ids:
+        return
+
+    # Every campaign's DB status in one query, with no call lock held
+    db_statuses = Call.get_statuses_by_ids([int(cid) for cid in campaign_ids if cid.isdigit()])
+    if db_statuses is None:
+        logging.warning("Skipping active_calls cleanup: could not fetch campaign statuses")
+        return
+
+    now = time.time()
+    for campaign_id in campaign_ids:
+        try:
+            # Check if campaign is still active in database
+            db_status = db_statuses.get(campaign_id)
+            if db_status is None or db_status in ['completed', 'cancelled', 'failed']:
+                debug_log_call_state(campaign_id, "ALL", "CLEANUP_STALE_CAMPAIGN", f"DB Status: {db_status or 'NOT_FOUND'}")
+                campaigns_to_remove.append(campaign_id)
                 continue
-                
-            try:
-                # Check if campaign is still active in database
-                call_info = Call.get_by_id(int(campaign_id))
-                if not call_info or call_info.get('status') in ['completed', 'cancelled', 'failed']:
-                    debug_log_call_state(campaign_id, "ALL", "CLEANUP_STALE_CAMPAIGN", f"DB Status: {call_info.get('status') if call_info else 'NOT_FOUND'}")
-                    campaigns_to_remove.append(campaign_id)
+
+            # Clean up individual calls that are finalized and old
+            with campaign_calls_lock(campaign_id):
+                calls = get_campaign_calls(campaign_id)
+                if calls is None:
                     continue
-                    
-                # Clean up individual calls that are finalized and old
-                now_utc = datetime.now(UTC_TIMEZONE)
                 phones_to_remove = []
-                
                 for phone_number, call_data in calls.items():
-                    if call_data.get('finalized_in_memory', False):
-                        timestamp = call_data.get('timestamp')
-                        if isinstance(timestamp, datetime):
-                            # Remove finalized calls older than 5 minutes
-                            if (now_utc - timestamp).total_seconds() > 300:
-                                phones_to_remove.append(phone_number)
-                                debug_log_call_state(campaign_id, phone_number, "CLEANUP_OLD_FINALIZED", f"Age: {(now_utc - timestamp).total_seconds()}s")
-                
+                    if call_data.finalized:
+                        age = now - call_data.ts
+                        # Remove finalized calls older than 5 minutes
+                        if age > 300:
+                            phones_to_remove.append(phone_number)
+                            debug_log_call_state(campaign_id, phone_number, "CLEANUP_OLD_FINALIZED", f"Age: {age}s")
+
                 # Remove old finalized calls
                 for phone in phones_to_remove:
-                    del active_calls[campaign_id][phone]
-                    
-                # If campaign has no active calls, remove it
-                if not active_calls[campaign_id]:
-                    campaigns_to_remove.append(campaign_id)
+                    removed_entry = calls.pop(phone)
+                    unindex_call(removed_entry)
+                    unindex_phone(campaign_id, phone)
+                    track_call_status(campaign_id, phone, removed_entry.status, None)
+                if phones_to_remove:
+                    bump_active_calls_generation()
+
+                # If campaign has no active calls, remove it (still under its lock, so nothing can be added in between)
+                if not calls:
+                    with active_calls_lock:
+                        if active_calls.get(campaign_id) is calls:
+                            del active_calls[campaign_id]
+                    drop_campaign_status_sets(campaign_id)
+                    bump_active_calls_generation()
                     debug_log_call_state(campaign_id, "ALL", "CLEANUP_EMPTY_CAMPAIGN", "No active calls remaining")
-                    
-            except Exception as e:
-                debug_log_call_state(campaign_id, "ALL", "CLEANUP_ERROR", str(e))
-                campaigns_to_remove.append(campaign_id)
-        
-        # Remove stale campaigns
-        for campaign_id in campaigns_to_remove:
-            if campaign_id in active_calls:
-                del active_calls[campaign_id]
-                logging.info(f"🧹 CLEANUP: Removed stale campaign {campaign_id} from active_calls")
+                    logging.info(f"🧹 CLEANUP: Removed stale campaign {campaign_id} from active_calls")
+
+        except Exception as e:
+            debug_log_call_state(campaign_id, "ALL", "CLEANUP_ERROR", str(e))
+            campaigns_to_remove.append(campaign_id)
+
+    # Remove stale campaigns
+    for campaign_id in campaigns_to_remove:
+        with active_calls_lock:
+            removed = active_calls.pop(campaign_id, None)
+        if removed is not None:
+            with campaign_calls_lock(campaign_id):
+                # An update may have recreated the campaign since the pop; keep the phone/status indexes of its new entries
+                recreated = active_calls.get(campaign_id)
+                for phone, call_data in removed.items():
+                    unindex_call(call_data)
+                    if recreated is None or phone not in recreated:
+                        unindex_phone(campaign_id, phone)
+                        if recreated is not None:
+                            track_call_status(campaign_id, phone, call_data.status, None)
+                if recreated is None:
+                    drop_campaign_status_sets(campaign_id)
+            bump_active_calls_generation()
+            logging.info(f"🧹 CLEANUP: Removed stale campaign {campaign_id} from active_calls")
 
 
         
 
 def monitor_auto_call_completion(call_id, phone_numbers):
     campaign_id = str(call_id)
+    db_id = int(campaign_id) # converted once for the Call.get_by_id polls below
     try:
         debug_log_call_state(campaign_id, "ALL", "MONITOR_START", f"For {len(phone_numbers)} numbers")
         max_wait_time, start_time, check_interval = 3600, time.time(), 15
         consecutive_completed_checks, required_completed_checks = 0, 2
+        # Adaptive polling: the interval grows while the active count stays the same, back to 15s on any change
+        interval, max_interval, backoff = check_interval, 120, 1.5
+        last_active_count = None
+        phone_set = set(phone_numbers)
         time.sleep(check_interval)
 
         while time.time() - start_time < max_wait_time:
-            call_info = Call.get_by_id(campaign_id)
+            call_info = Call.get_by_id(db_id)
             if call_info and call_info['status'] == 'cancelled':
                 debug_log_call_state(campaign_id, "ALL", "MONITOR_CANCELLED", "Campaign cancelled, stopping")
                 return
@@ -755,9 +986,14 @@ def monitor_auto_call_completion(call_id, phone_numbers):
                 debug_log_call_state(campaign_id, "ALL", "MONITOR_ALREADY_COMPLETE", "Stopping monitor")
                 return
 
-            active_call_count = sum(1 for phone in phone_numbers if not asterisk_service.is_call_complete(phone, campaign_id))
+            active_call_count = asterisk_service.count_incomplete_calls(campaign_id, phone_set)
+            if active_call_count == last_active_count:
+                interval = min(interval * backoff, max_interval)
+            else:
+                interval = check_interval
+            last_active_count = active_call_count
             
-            debug_log_call_state(campaign_id, "ALL", "MONITOR_CHECK", f"Active calls: {active_call_count}")
+            debug_log_call_state(campaign_id, "ALL", "MONITOR_CHECK", f"Active calls: {active_call_count}, next check in {interval:.0f}s")
 
             if active_call_count == 0:
                 consecutive_completed_checks += 1
@@ -765,9 +1001,9 @@ def monitor_auto_call_completion(call_id, phone_numbers):
                 
                 if consecutive_completed_checks >= required_completed_checks:
                     debug_log_call_state(campaign_id, "ALL", "MONITOR_MARKING_COMPLETE", "All calls processed")
-                    final_call_info = Call.get_by_id(campaign_id)
+                    final_call_info = Call.get_by_id(db_id)
                     if final_call_info and final_call_info['status'] not in ['completed', 'cancelled']:
-                        Call.update_status(campaign_id, 'completed', 'All calls processed')
+                        _update_campaign_status(campaign_id, 'completed', 'All calls processed')
                         debug_log_call_state(campaign_id, "ALL", "MONITOR_COMPLETED", "DB status updated")
                     else:
                         debug_log_call_state(campaign_id, "ALL", "MONITOR_ALREADY_FINAL", f"Status: {final_call_info.get('status', 'N/A') if final_call_info else 'N/A'}")
@@ -775,19 +1011,19 @@ def monitor_auto_call_completion(call_id, phone_numbers):
             else:
                 consecutive_completed_checks = 0
 
-            time.sleep(check_interval)
+            time.sleep(interval)
 
         debug_log_call_state(campaign_id, "ALL", "MONITOR_TIMEOUT", f"After {max_wait_time}s")
-        final_call_info_timeout = Call.get_by_id(campaign_id)
+        final_call_info_timeout = Call.get_by_id(db_id)
         if final_call_info_timeout and final_call_info_timeout['status'] not in ['completed', 'cancelled']:
-            Call.update_status(campaign_id, 'failed', 'Monitor timeout or error')
+            _update_campaign_status(campaign_id, 'failed', 'Monitor timeout or error')
             debug_log_call_state(campaign_id, "ALL", "MONITOR_TIMEOUT_FAILED", "Marked as failed")
 
     except Exception as e:
         debug_log_call_state(campaign_id, "ALL", "MONITOR_ERROR", str(e))
         try:
-            call_info_on_error = Call.get_by_id(campaign_id)
+            call_info_on_error = Call.get_by_id(db_id)
             if call_info_on_error and call_info_on_error['status'] == 'in_progress':
-                Call.update_status(campaign_id, 'failed', f'Monitor error: {e}')
+                _update_campaign_status(campaign_id, 'failed', f'Monitor error: {e}')
         except Exception as db_err:
             debug_log_call_state(campaign_id, "ALL", "MONITOR_DB_ERROR", str(db_err))
\ No newline at end of file
@@ -3,6 +3,9 @@ import os
 import logging
 import threading
 import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 from datetime import datetime, timedelta, timezone
 
 # Models
@@ -11,9 +14,10 @@ from models.member import Member
 from models.app_setting import AppSetting
 
 # Corrected Imports to resolve circular dependency
-from app_state import active_sms, active_sms_lock, USER_LOCAL_TIMEZONE, UTC_TIMEZONE # type: ignore
+from app_state import get_sms_campaign_state, SMS_STATUS_CODES, USER_LOCAL_TIMEZONE, UTC_TIMEZONE # type: ignore
 from config import MAX_SMS_PER_MINUTE # type: ignore
 from services.twilio_service import send_twilio_sms
+from utils.rate_limit import TokenBucket
 
 # Global variable for current SMS session details (if any)
 current_sms_session = {
@@ -25,61 +29,136 @@ current_sms_session = {
 }
 sms_session_lock = threading.Lock()
 
-def update_sms_status(campaign_id, phone_number, status, details=None):
-    with active_sms_lock:
-        if campaign_id not in active_sms: active_sms[campaign_id] = {}
-        # Always store timestamp as timezone-aware UTC datetime object
-        timestamp_utc = datetime.now(UTC_TIMEZONE)
-        
-        current_data = active_sms[campaign_id].get(phone_number, {})
-        current_status = current_data.get('status', '')
-
-        status_hierarchy = {
-            'unknown': 0, 'pending': 1, 'sending': 10, 'sent': 50,
-            'delivered': 60, 'failed': 40, 'queued': 5, 'receiving': 70,
-            'received': 80, 'opted_out': 90
-        }
-        current_significance = status_hierarchy.get(current_status, 0)
-        new_significance = status_hierarchy.get(status, 0)
-
-        if status == 'waiting': # Used for manual reset in API
-            logging.info(f"Resetting SMS status for {phone_number} C:{campaign_id} from {current_status} to waiting")
-            active_sms[campaign_id][phone_number] = {'status': status, 'details': details or 'Status reset', 'timestamp': timestamp_utc}
-            return
+# Status changes (mostly Twilio callbacks) are queued and applied by one writer thread in batches,
+# so request threads never wait on a campaign lock just to record a status.
+_sms_status_queue = queue.SimpleQueue()
+SMS_STATUS_DRAIN_BATCH = 200
 
-        if not current_status:
-            logging.info(f"Initial SMS status for {phone_number} C:{campaign_id}: -> {status} {details or ''}")
-            active_sms[campaign_id][phone_number] = {'status': status, 'details': details, 'timestamp': timestamp_utc}
-            return
+# Built once; these are checked for every status change
+SMS_STATUS_HIERARCHY = {
+    'unknown': 0, 'pending': 1, 'sending': 10, 'sent': 50,
+    'delivered': 60, 'failed': 40, 'queued': 5, 'receiving': 70,
+    'received': 80, 'opted_out': 90
+}
+_INITIAL_SEND_STATUSES = frozenset({'sending', 'queued'})
+_FINAL_SEND_STATUSES = frozenset({'sent', 'delivered', 'opted_out'}) # 'failed' may not override these
+_MEMBER_DONE_STATUSES = frozenset({'sent', 'delivered', 'failed', 'opted_out'})
+_CAMPAIGN_STARTABLE_STATUSES = frozenset({'pending', 'ready'})
+_CAMPAIGN_FINISHED_STATUSES = frozenset({'completed', 'cancelled', 'failed'})
 
-        allow_update = False
-        if new_significance > current_significance:
-            allow_update = True
-        elif new_significance == current_significance and status in ['sending', 'queued']:
-            # Allow updates to same significance if it's about initial states being set
-            allow_update = True
-        elif status == 'failed' and current_status not in ['sent', 'delivered', 'opted_out']:
-            # Allow failed to override most non-final states
-            allow_update = True
-        else:
-            logging.info(f"SMS status update {phone_number} C:{campaign_id}: {current_status} -> {status} (Not updating to less significant or non-transitional status)")
+def update_sms_status(campaign_id, phone_number, status, details=None):
+    # Time of the report as epoch seconds, the form the campaign state stores it in
+    _sms_status_queue.put((campaign_id, phone_number, status, details, time.time()))
+
+def _apply_sms_status(state, campaign_id, phone_number, status, details, reported_at):
+    """Applies one queued status change to the campaign's state. Caller must hold state.lock."""
+    current_status = state.get_status(phone_number)
+
+    current_significance = SMS_STATUS_HIERARCHY.get(current_status, 0)
+    new_significance = SMS_STATUS_HIERARCHY.get(status, 0)
+
+    if status == 'waiting': # Used for manual reset in API
+        logging.info(f"Resetting SMS status for {phone_number} C:{campaign_id} from {current_status} to waiting")
+        state.set(phone_number, status, details or 'Status reset', reported_at)
+        return
+
+    if not current_status:
+        logging.info(f"Initial SMS status for {phone_number} C:{campaign_id}: -> {status} {details or ''}")
+        state.set(phone_number, status, details, reported_at)
+        return
+
+    allow_update = False
+    if new_significance > current_significance:
+        allow_update = True
+    elif new_significance == current_significance and status in _INITIAL_SEND_STATUSES:
+        # Allow updates to same significance if it's about initial states being set
+        allow_update = True
+    elif status == 'failed' and current_status not in _FINAL_SEND_STATUSES:
+        # Allow failed to override most non-final states
+        allow_update = True
+    else:
+        logging.info(f"SMS status update {phone_number} C:{campaign_id}: {current_status} -> {status} (Not updating to less significant or non-transitional status)")
+
+    if allow_update:
+        state.set(phone_number, status, details, reported_at)
+        logging.info(f"Updated SMS status {phone_number} C:{campaign_id}: {current_status} -> {status} {details or ''}")
+
+def _sms_status_writer():
+    """Blocks for the next status change, then applies everything already queued, one lock hold per campaign."""
+    while True:
+        batch = [_sms_status_queue.get()]
+        try:
+            while len(batch) < SMS_STATUS_DRAIN_BATCH:
+                batch.append(_sms_status_queue.get_nowait())
+        except queue.Empty:
+            pass
+        by_campaign = {}
+        for change in batch: # keeps arrival order within each campaign
+            by_campaign.setdefault(change[0], []).append(change)
+        for campaign_id, changes in by_campaign.items():
+            state = get_sms_campaign_state(campaign_id, create=True)
+            with state.lock:
+                for change in changes:
+                    try:
+                        _apply_sms_status(state, *change)
+                    except Exception as e:
+                        logging.error(f"Error applying queued SMS status {change[:3]}: {e}", exc_info=True)
 
-        if allow_update:
-            active_sms[campaign_id][phone_number] = {'status': status, 'details': details, 'timestamp': timestamp_utc}
-            logging.info(f"Updated SMS status {phone_number} C:{campaign_id}: {current_status} -> {status} {details or ''}")
+threading.Thread(target=_sms_status_writer, name="SMSStatusWriter", daemon=True).start()
 
 
 def is_sms_complete(phone, campaign_id):
-    with active_sms_lock:
-        if campaign_id not in active_sms or phone not in active_sms[campaign_id]:
+    state = get_sms_campaign_state(campaign_id)
+    if state is None:
+        return True
+    with state.lock:
+        if phone not in state:
             return True
-        status = active_sms[campaign_id][phone].get('status', '')
-        return status in ['sent', 'delivered', 'failed', 'opted_out']
+        return state.get_status(phone) in _MEMBER_DONE_STATUSES
+
+_MEMBER_DONE_CODES = frozenset(SMS_STATUS_CODES[name] for name in _MEMBER_DONE_STATUSES)
+
+def count_incomplete_sms(campaign_id, phone_numbers):
+    """How many of phone_numbers are not complete in the is_sms_complete sense, under one hold of the campaign lock."""
+    state = get_sms_campaign_state(campaign_id)
+    if state is None:
+        return 0
+    count = 0
+    with state.lock:
+        phone_index, status = state.phone_index, state.status
+        for phone in phone_numbers:
+            idx = phone_index.get(phone)
+            if idx is not None and status[idx] not in _MEMBER_DONE_CODES:
+                count += 1
+    return count
+
+# Campaign executions and their completion monitors run on fixed pools instead of a fresh thread each
+_auto_exec_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='AutoSMSExec')
+_monitor_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix='AutoSMSMonitor')
+
+# The checker sleeps until the next pending SMS campaign is due (at most SCHEDULER_MAX_SLEEP_SECONDS);
+# scheduling a campaign wakes it right away
+_sms_scheduler_wakeup = threading.Event()
+SCHEDULER_MAX_SLEEP_SECONDS = 300
+
+def wake_sms_scheduler():
+    """Call after inserting or changing a pending scheduled SMS campaign"""
+    _sms_scheduler_wakeup.set()
+
+def _sms_scheduler_sleep_seconds():
+    timeout = SCHEDULER_MAX_SLEEP_SECONDS
+    next_due = SMS.get_next_scheduled_time()
+    if next_due is not None:
+        if next_due.tzinfo is None:
+            next_due = next_due.replace(tzinfo=UTC_TIMEZONE)
+        timeout = min(timeout, (next_due - datetime.now(UTC_TIMEZONE)).total_seconds())
+    return max(1, timeout)
 
 # Background task for auto-sending scheduled SMS
 def scheduled_sms_checker():
     logging.info("Starting scheduled SMS checker thread...")
     while True:
+        _sms_scheduler_wakeup.clear()
         logging.debug("Scheduled SMS checker running check...")
         ready_sms = []
         try:
@@ -97,19 +176,14 @@ def scheduled_sms_checker():
                     try:
                         if SMS.update_status(sms_id_str, 'ready', 'Ready for execution'):
                             logging.info(f"SMS campaign {sms_id_str} successfully marked 'ready' in DB.")
-                            thread = threading.Thread(
-                                target=auto_execute_sms,
-                                args=(
-                                    sms_id_str,
-                                    sms_campaign['message_content'],
-                                    sms_campaign['group_filter'],
-                                    sms_campaign['source_phone_number'],
-                                    sms_campaign['webhook_url'] # Pass webhook URL
-                                ),
-                                daemon=True
+                            _auto_exec_pool.submit(
+                                auto_execute_sms,
+                                sms_id_str,
+                                sms_campaign['message_content'],
+                                sms_campaign['group_filter'],
+                                sms_campaign['source_phone_number'],
+                                sms_campaign['webhook_url'] # Pass webhook URL
                             )
-                            thread.name = f"AutoSMSExec-{sms_id_str}"
-                            thread.start()
                         else:
                             logging.warning(f"SMS campaign {sms_id_str} was not 'pending' or failed to update when trying to mark 'ready'. Skipping.")
                     except Exception as exec_err:
@@ -120,12 +194,45 @@ def scheduled_sms_checker():
         except Exception as e_main:
             logging.error(f"Unexpected error in SMS checker loop: {e_main}", exc_info=True)
 
-        time.sleep(60) # Check every 60 seconds
+        sleep_seconds = _sms_scheduler_sleep_seconds()
+        logging.debug(f"Scheduled SMS checker sleeping up to {sleep_seconds:.0f}s")
+        _sms_scheduler_wakeup.wait(sleep_seconds)
+
+def build_status_callback_template(webhook_url, campaign_id):
+    """
+    Builds a campaign's status callback URL once, leaving a '{member_id}' placeholder;
+    per recipient it's just callback_template.format_map({'member_id': ...}).
+    sms_status_callback reads campaign_id/member_id back from these query parameters.
+    """
+    if not webhook_url:
+        return None
+    base = webhook_url.replace('{', '{{').replace('}', '}}') # keep any literal braces out of format_map
+    separator = '&' if '?' in webhook_url else '?'
+    return f"{base}{separator}campaign_id={quote(str(campaign_id), safe='')}&member_id={{member_id}}"
+
+# Set by the abort API so a sending campaign stops without reading its DB status before every message;
+# the DB status is still re-checked every SMS_STATUS_RECHECK_EVERY messages as a safety net. The same
+# event is handed on to the campaign's completion monitor, so an abort also stops that without a DB poll
+_sms_cancel_events = {} # campaign_id -> threading.Event, while auto_execute_sms or its monitor is running
+_sms_cancel_events_lock = threading.Lock()
+SMS_STATUS_RECHECK_EVERY = 25
+SMS_SEND_WORKERS = 8
+
+def cancel_sms_campaign(campaign_id):
+    """Signals a running auto_execute_sms for campaign_id to stop sending"""
+    with _sms_cancel_events_lock:
+        cancel_event = _sms_cancel_events.get(str(campaign_id))
+    if cancel_event:
+        cancel_event.set()
 
 def auto_execute_sms(sms_id, message_content, group_filter, source_phone_number, webhook_url):
     campaign_id = str(sms_id)
     logging.info(f"Auto-executing SMS campaign ID {campaign_id}")
     members = []
+    monitor_started = False
+    cancel_event = threading.Event()
+    with _sms_cancel_events_lock:
+        _sms_cancel_events[campaign_id] = cancel_event
     
     with sms_session_lock:
         current_sms_session['campaign_id'] = campaign_id
@@ -148,11 +255,11 @@ def auto_execute_sms(sms_id, message_content, group_filter, source_phone_number,
             current_sms_session['total_members'] = len(members)
 
         # Update campaign status
-        if not SMS.update_status(campaign_id, 'in_progress', 'Execution started'):
+        started, prev_status = SMS.update_status_with_previous(campaign_id, 'in_progress', 'Execution started')
+        if not started:
             logging.warning(f"Failed to update SMS {campaign_id} status to in_progress at start of auto_execute_sms, or already in a final state.")
-            sms_campaign_info = SMS.get_by_id(campaign_id)
-            if sms_campaign_info and sms_campaign_info['status'] not in ['pending', 'ready']:
-                logging.info(f"SMS {campaign_id} is already in status '{sms_campaign_info['status']}', aborting auto-execution.")
+            if prev_status is not None and prev_status not in _CAMPAIGN_STARTABLE_STATUSES:
+                logging.info(f"SMS {campaign_id} is already in status '{prev_status}', aborting auto-execution.")
                 with sms_session_lock:
                     current_sms_session['status'] = 'cancelled' # Or existing status
                 return
@@ -171,32 +278,31 @@ def auto_execute_sms(sms_id, message_content, group_filter, source_phone_number,
                 current_sms_session['status'] = 'failed'
             return
 
-        for member in members:
-            try:
-                sms_campaign_info = SMS.get_by_id(campaign_id)
-                current_campaign_status = sms_campaign_info.get('status') if sms_campaign_info else 'unknown'
-                logging.debug(f"Campaign {campaign_id} current status before sending SMS to member {member.get('phone_number')}: {current_campaign_status}")
+        callback_url_template = build_status_callback_template(webhook_url, campaign_id)
 
-                if current_campaign_status == 'cancelled':
-                    logging.info(f"SMS campaign {campaign_id} cancelled, stopping further SMS."); break
-                if current_campaign_status != 'in_progress':
-                    logging.warning(f"SMS campaign {campaign_id} is not 'in_progress' (status: {current_campaign_status}), stopping further SMS."); break
+        # Sends run on a small pool so Twilio's HTTP round trips overlap; the token bucket alone sets the pace
+        # (MAX_SMS_PER_MINUTE from config.py) and an abort wakes it straight away. It holds up to a minute's
+        # worth of tokens, so a campaign can burst through that many before settling to the steady rate
+        if MAX_SMS_PER_MINUTE > 0:
+            rate_limiter = TokenBucket(MAX_SMS_PER_MINUTE / 60.0, burst=MAX_SMS_PER_MINUTE, cancel_event=cancel_event)
+        else:
+            rate_limiter = TokenBucket(1.0, cancel_event=cancel_event) # Default if no limit is set or invalid
+        in_flight = threading.BoundedSemaphore(SMS_SEND_WORKERS * 2) # don't queue up sends faster than Twilio answers
 
+        def _send_one(member):
+            try:
                 phone_number = member['phone_number']
                 member_id = member['id']
 
                 logging.info(f"Sending SMS to {phone_number} C:{campaign_id}")
                 update_sms_status(campaign_id, phone_number, 'sending', 'Initiating SMS send')
 
-                # Pass campaign_id, member_id, and webhook_url to Twilio
-                send_success, twilio_sid = send_twilio_sms(
-                    to_number=phone_number,
-                    from_number=source_phone_number,
-                    message_body=message_content,
-                    campaign_id=campaign_id, # Pass campaign_id as a parameter
-                    member_id=member_id, # Pass member_id as a parameter
-                    webhook_url=webhook_url # Pass the webhook URL
-                )
+                # campaign_id/member_id ride along in the callback URL; credentials were read from settings once above,
+                # the sending number comes from config (twilio_service)
+                status_callback_url = callback_url_template.format_map({'member_id': member_id}) if callback_url_template else None
+                twilio_sid = send_twilio_sms(phone_number, message_content, status_callback_url=status_callback_url,
+                                             account_sid=twilio_account_sid, auth_token=twilio_auth_token)
+                send_success = bool(twilio_sid)
 
                 if send_success:
                     update_sms_status(campaign_id, phone_number, 'sent', f'SMS sent, Twilio SID: {twilio_sid}')
@@ -208,21 +314,39 @@ def auto_execute_sms(sms_id, message_content, group_filter, source_phone_number,
                 with sms_session_lock:
                     current_sms_session['members_sent'] += 1
 
-                # Use MAX_SMS_PER_MINUTE from config.py for rate limiting
-                # Ensure MAX_SMS_PER_MINUTE is not zero to avoid division by zero
-                if MAX_SMS_PER_MINUTE > 0:
-                    time.sleep(60.0 / MAX_SMS_PER_MINUTE) 
-                else:
-                    time.sleep(1.0) # Default if no limit is set or invalid
-
             except Exception as sms_send_err:
                 logging.error(f"Error sending SMS to {member.get('phone_number', 'N/A')}: {sms_send_err}", exc_info=True)
                 if member.get('phone_number'):
                     update_sms_status(campaign_id, member['phone_number'], 'failed', f'Error: {sms_send_err}')
+            finally:
+                in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=SMS_SEND_WORKERS, thread_name_prefix=f"SMSSend-{campaign_id}") as send_pool:
+            for sent_count, member in enumerate(members):
+                if not rate_limiter.acquire():
+                    logging.info(f"SMS campaign {campaign_id} cancelled, stopping further SMS."); break
+
+                if sent_count % SMS_STATUS_RECHECK_EVERY == 0:
+                    try:
+                        sms_campaign_info = SMS.get_by_id(campaign_id)
+                        current_campaign_status = sms_campaign_info.get('status') if sms_campaign_info else 'unknown'
+                        logging.debug(f"Campaign {campaign_id} current status before sending SMS to member {member.get('phone_number')}: {current_campaign_status}")
+
+                        if current_campaign_status == 'cancelled':
+                            logging.info(f"SMS campaign {campaign_id} cancelled, stopping further SMS."); break
+                        if current_campaign_status != 'in_progress':
+                            logging.warning(f"SMS campaign {campaign_id} is not 'in_progress' (status: {current_campaign_status}), stopping further SMS."); break
+                    except Exception as status_err:
+                        logging.error(f"Error checking status of SMS campaign {campaign_id}: {status_err}", exc_info=True)
+
+                in_flight.acquire()
+                send_pool.submit(_send_one, member)
+            # leaving the with-block waits for the sends already submitted
 
         # Start completion monitor only if SMS were attempted
         if members:
-            threading.Thread(target=monitor_auto_sms_completion, args=(campaign_id, [m['phone_number'] for m in members]), daemon=True).start()
+            _monitor_pool.submit(monitor_auto_sms_completion, campaign_id, [m['phone_number'] for m in members], cancel_event)
+            monitor_started = True # the monitor unregisters the cancel event when it's done
 
     except Exception as e:
         logging.error(f"Critical error in auto_execute_sms setup for campaign {campaign_id}: {e}", exc_info=True)
@@ -230,26 +354,37 @@ def auto_execute_sms(sms_id, message_content, group_filter, source_phone_number,
         with sms_session_lock:
             current_sms_session['status'] = 'failed'
     finally:
+        if not monitor_started:
+            with _sms_cancel_events_lock:
+                if _sms_cancel_events.get(campaign_id) is cancel_event:
+                    del _sms_cancel_events[campaign_id]
         with sms_session_lock:
             if current_sms_session['status'] == 'in_progress': # If not already set to completed/cancelled/failed
                 current_sms_session['status'] = 'completed'
 
 
-def monitor_auto_sms_completion(sms_id, phone_numbers):
+def monitor_auto_sms_completion(sms_id, phone_numbers, cancel_event=None):
     campaign_id = str(sms_id)
+    # Waits on the campaign's cancel event rather than sleeping, so an abort ends it at once; the DB
+    # is read only before marking the campaign completed
+    with _sms_cancel_events_lock:
+        cancel_event = _sms_cancel_events.setdefault(campaign_id, cancel_event or threading.Event())
     try:
         logging.info(f"Starting SMS completion monitor C:{campaign_id} for {len(phone_numbers)} numbers.")
         max_wait_time, start_time, check_interval, consecutive_completed_checks, required_completed_checks = 1800, time.time(), 30, 0, 2
-        time.sleep(check_interval)
+        # Adaptive polling: the interval grows while the active count stays the same, back to 30s on any change
+        interval, max_interval, backoff = check_interval, 300, 1.5
+        last_active_count = None
+        if cancel_event.wait(check_interval):
+            logging.info(f"Monitor C:{campaign_id} detected campaign cancelled, stopping monitor."); return
 
         while time.time() - start_time < max_wait_time:
-            sms_info = SMS.get_by_id(campaign_id)
-            if sms_info and sms_info['status'] == 'cancelled':
-                logging.info(f"Monitor C:{campaign_id} detected campaign cancelled, stopping monitor."); return
-            if not sms_info or sms_info['status'] == 'completed' or sms_info['status'] == 'failed':
-                logging.info(f"Monitor C:{campaign_id} detected campaign already completed/failed or not found, stopping monitor."); return
-
-            active_sms_count = sum(1 for phone in phone_numbers if not is_sms_complete(phone, campaign_id))
+            active_sms_count = count_incomplete_sms(campaign_id, phone_numbers)
+            if active_sms_count == last_active_count:
+                interval = min(interval * backoff, max_interval)
+            else:
+                interval = check_interval
+            last_active_count = active_sms_count
 
             if active_sms_count == 0:
                 consecutive_completed_checks += 1
@@ -257,20 +392,21 @@ def monitor_auto_sms_completion(sms_id, phone_numbers):
                 if consecutive_completed_checks >= required_completed_checks:
                     logging.info(f"Monitor C:{campaign_id}: All SMS appear completed. Marking campaign as completed in DB.")
                     final_sms_info = SMS.get_by_id(campaign_id)
-                    if final_sms_info and final_sms_info['status'] not in ['completed', 'cancelled', 'failed']:
+                    if final_sms_info and final_sms_info['status'] not in _CAMPAIGN_FINISHED_STATUSES:
                         SMS.update_status(campaign_id, 'completed', 'All SMS processed')
                     else:
                         logging.info(f"Monitor C:{campaign_id}: Final check (timeout) found campaign already '{final_sms_info.get('status', 'N/A')}' or not found.")
                     return
             else:
                 consecutive_completed_checks = 0
-                logging.info(f"Monitor C:{campaign_id}: {active_sms_count} active SMS remain...")
+                logging.info(f"Monitor C:{campaign_id}: {active_sms_count} active SMS remain, next check in {interval:.0f}s...")
 
-            time.sleep(check_interval)
+            if cancel_event.wait(interval):
+                logging.info(f"Monitor C:{campaign_id} detected campaign cancelled, stopping monitor."); return
 
         logging.warning(f"Monitor C:{campaign_id}: Max wait time ({max_wait_time}s) reached. Marking campaign as completed due to monitor timeout.")
         final_sms_info_timeout = SMS.get_by_id(campaign_id)
-        if final_sms_info_timeout and final_sms_info_timeout['status'] not in ['completed', 'cancelled', 'failed']:
+        if final_sms_info_timeout and final_sms_info_timeout['status'] not in _CAMPAIGN_FINISHED_STATUSES:
             SMS.update_status(campaign_id, 'completed', 'Monitor timeout')
         else:
             logging.info(f"Monitor C:{campaign_id}: Final check (timeout) found campaign already '{final_sms_info_timeout.get('status', 'N/A')}' or not found.")
@@ -281,4 +417,8 @@ def monitor_auto_sms_completion(sms_id, phone_numbers):
             if sms_info_on_error and sms_info_on_error['status'] == 'in_progress':
                 SMS.update_status(campaign_id, 'completed_with_errors', f'Monitor error: {e}')
         except Exception as db_err:
-            logging.error(f"Failed to update campaign {campaign_id} status after monitor error: {db_err}")
\ No newline at end of file
+            logging.error(f"Failed to update campaign {campaign_id} status after monitor error: {db_err}")
+    finally:
+        with _sms_cancel_events_lock:
+            if _sms_cancel_events.get(campaign_id) is cancel_event:
+                del _sms_cancel_events[campaign_id]
\ No newline at end of file
@@ -1,10 +1,19 @@
 # services/twilio_service.py
 import logging
+from functools import lru_cache
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
 from config import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER, TWILIO_MESSAGING_SERVICE_SID
 
-def send_twilio_sms(to_phone_number, message_text, status_callback_url=None):
+@lru_cache(maxsize=4)
+def _client_for(account_sid, auth_token):
+    """
+    One Client per set of credentials, so its HTTP session (and the TLS connection to api.twilio.com) is
+    reused across messages. Bounded, so changing the credentials in settings doesn't pile up old clients.
+    """
+    return Client(account_sid, auth_token)
+
+def send_twilio_sms(to_phone_number, message_text, status_callback_url=None, account_sid=None, auth_token=None):
     """
     Sends an SMS message via Twilio.
 
@@ -12,6 +21,8 @@ def send_twilio_sms(to_phone_number, message_text, status_callback_url=None):
         to_phone_number (str): The recipient's phone number. Will be formatted to E.164.
         message_text (str): The text content of the SMS.
         status_callback_url (str, optional): URL for Twilio to send status updates.
+        account_sid (str, optional): Twilio account SID; defaults to TWILIO_ACCOUNT_SID from config.
+        auth_token (str, optional): Twilio auth token; defaults to TWILIO_AUTH_TOKEN from config.
 
     Returns:
         str: The Twilio Message SID if successful.
@@ -20,7 +31,7 @@ def send_twilio_sms(to_phone_number, message_text, status_callback_url=None):
         TwilioRestException: If Twilio API call fails.
         Exception: For other unexpected errors.
     """
-    client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    client = _client_for(account_sid or TWILIO_ACCOUNT_SID, auth_token or TWILIO_AUTH_TOKEN)
 
     # Format phone number to E.164
     formatted_phone = to_phone_number
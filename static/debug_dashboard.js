@@ -0,0 +1,297 @@
+// Debug dashboard client script, served separately from the page shell so the
+// browser can cache it independently.
+
+// Auto-refresh intervals
+let amiStatusInterval, activeCallsInterval, amiLogInterval;
+let activeCallsStream = null;
+
+// Coalesces calls made within one animation frame into a single call with the
+// latest arguments, so bursts of updates cost at most one render per frame.
+function rafBatch(fn) {
+    let pending = false, lastArgs;
+    return (...args) => {
+        lastArgs = args;
+        if (pending) return;
+        pending = true;
+        requestAnimationFrame(() => {
+            pending = false;
+            fn(...lastArgs);
+        });
+    };
+}
+
+// Initialize page
+document.addEventListener('DOMContentLoaded', function() {
+    refreshAMIStatus();
+    refreshActiveCalls();
+    refreshAMILog();
+    
+    // Set up auto-refresh
+    setupAutoRefresh();
+});
+
+function setupAutoRefresh() {
+    // AMI Status auto-refresh
+    const amiCheckbox = document.getElementById('auto-refresh-ami');
+    amiCheckbox.addEventListener('change', function() {
+        if (this.checked) {
+            amiStatusInterval = setInterval(refreshAMIStatus, 5000);
+        } else {
+            clearInterval(amiStatusInterval);
+        }
+    });
+    if (amiCheckbox.checked) {
+        amiStatusInterval = setInterval(refreshAMIStatus, 5000);
+    }
+
+    // Active Calls live updates
+    const callsCheckbox = document.getElementById('auto-refresh-calls');
+    callsCheckbox.addEventListener('change', function() {
+        if (this.checked) {
+            startActiveCallsUpdates();
+        } else {
+            stopActiveCallsUpdates();
+        }
+    });
+    if (callsCheckbox.checked) {
+        startActiveCallsUpdates();
+    }
+
+    // AMI Log auto-refresh
+    const logCheckbox = document.getElementById('auto-refresh-ami-log');
+    logCheckbox.addEventListener('change', function() {
+        if (this.checked) {
+            amiLogInterval = setInterval(refreshAMILog, 2000);
+        } else {
+            clearInterval(amiLogInterval);
+        }
+    });
+    if (logCheckbox.checked) {
+        amiLogInterval = setInterval(refreshAMILog, 2000);
+    }
+
+    // Call debug history capture (off on the server by default)
+    const captureCheckbox = document.getElementById('debug-capture');
+    fetch('/api/debug/capture')
+        .then(response => response.json())
+        .then(data => { if (data.success) captureCheckbox.checked = data.enabled; })
+        .catch(() => {});
+    captureCheckbox.addEventListener('change', async function() {
+        try {
+            const response = await fetch('/api/debug/capture', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ enabled: this.checked })
+            });
+            const data = await response.json();
+            if (data.success) this.checked = data.enabled;
+        } catch (error) {
+            this.checked = !this.checked;
+        }
+    });
+}
+
+function startActiveCallsUpdates() {
+    // Prefer the server push stream; fall back to polling if it is unavailable
+    if (!window.EventSource) {
+        activeCallsInterval = setInterval(refreshActiveCalls, 3000);
+        return;
+    }
+    activeCallsStream = new EventSource('/api/debug/stream?format=soa');
+    activeCallsStream.addEventListener('active_calls', function(e) {
+        renderActiveCallsBatched(JSON.parse(e.data));
+    });
+    activeCallsStream.onerror = function() {
+        if (activeCallsStream && activeCallsStream.readyState === EventSource.CLOSED) {
+            activeCallsStream = null;
+            activeCallsInterval = setInterval(refreshActiveCalls, 3000);
+        }
+    };
+}
+
+function stopActiveCallsUpdates() {
+    if (activeCallsStream) {
+        activeCallsStream.close();
+        activeCallsStream = null;
+    }
+    clearInterval(activeCallsInterval);
+}
+
+function toggleSection(sectionId) {
+    const content = document.getElementById(sectionId);
+    content.classList.toggle('collapse');
+}
+
+async function refreshAMIStatus() {
+    try {
+        const response = await fetch('/api/debug/ami_status');
+        const data = await response.json();
+        
+        if (data.success) {
+            const status = data.ami_status;
+            const indicator = status.connected ? 
+                '<span class="status-indicator status-connected"></span>Connected' :
+                '<span class="status-indicator status-disconnected"></span>Disconnected';
+            
+            document.getElementById('ami-status-content').innerHTML = `
+                <div><strong>Status:</strong> ${indicator}</div>
+                <div><strong>Connection ID:</strong> ${status.connection_id || 'N/A'}</div>
+                <div><strong>Host:</strong> ${status.host || 'N/A'}:${status.port || 'N/A'}</div>
+                <div><strong>Username:</strong> ${status.username || 'N/A'}</div>
+                <div><strong>Event Handlers:</strong> ${status.event_handlers_count}</div>
+                <div><strong>Listener Thread:</strong> ${status.listener_thread_alive ? 'Alive' : 'Dead'}</div>
+                <div><strong>Last Activity:</strong> ${status.last_activity ? new Date(status.last_activity * 1000).toLocaleString() : 'N/A'}</div>
+                <div class="json-data">${JSON.stringify(status, null, 2)}</div>
+            `;
+        } else {
+            document.getElementById('ami-status-content').innerHTML = `<div class="log-error">Error: ${data.message}</div>`;
+        }
+    } catch (error) {
+        document.getElementById('ami-status-content').innerHTML = `<div class="log-error">Fetch Error: ${error.message}</div>`;
+    }
+}
+
+async function refreshActiveCalls() {
+    try {
+        const response = await fetch('/api/debug/active_calls?format=soa');
+        const data = await response.json();
+        renderActiveCallsBatched(data);
+    } catch (error) {
+        document.getElementById('active-calls-content').innerHTML = `<div class="log-error">Fetch Error: ${error.message}</div>`;
+    }
+}
+
+function renderActiveCalls(data) {
+    if (data.success) {
+        let html = `
+            <div><strong>Total Campaigns:</strong> ${data.total_campaigns}</div>
+            <div><strong>Total Active Calls:</strong> ${data.total_calls}</div>
+            <hr>
+        `;
+        
+        if (data.total_calls === 0) {
+            html += '<div>No active calls</div>';
+        } else {
+            // Columnar payload (?format=soa): rows arrive grouped by campaign, so a
+            // header is emitted whenever the campaign id changes.
+            let currentCampaign = null;
+            for (let i = 0; i < data.phones.length; i++) {
+                if (data.campaign_ids[i] !== currentCampaign) {
+                    currentCampaign = data.campaign_ids[i];
+                    html += `<div><strong>Campaign ${currentCampaign}:</strong></div>`;
+                }
+                const status = data.statuses[i];
+                const timestamp = data.timestamps[i];
+                html += `
+                    <div class="log-entry ${getStatusClass(status)}">
+                        📞 ${data.phones[i]}: ${status} 
+                        <span class="timestamp">${timestamp ? new Date(timestamp).toLocaleTimeString() : 'N/A'}</span>
+                        <br>&nbsp;&nbsp;&nbsp;&nbsp;${data.details[i] || 'No details'}
+                        <br>&nbsp;&nbsp;&nbsp;&nbsp;ActionID: ${data.action_ids[i] || 'N/A'} | UniqueID: ${data.uniqueids[i] || 'N/A'}
+                    </div>
+                `;
+            }
+        }
+        
+        document.getElementById('active-calls-content').innerHTML = html;
+    } else {
+        document.getElementById('active-calls-content').innerHTML = `<div class="log-error">Error: ${data.message}</div>`;
+    }
+}
+
+const renderActiveCallsBatched = rafBatch(renderActiveCalls);
+
+async function refreshAMILog() {
+    try {
+        const response = await fetch('/api/debug/ami_history');
+        const data = await response.json();
+        
+        if (data.success) {
+            let html = '';
+            const recentEntries = data.history.slice(-50).reverse();
+            
+            for (const entry of recentEntries) {
+                const timestamp = new Date(entry.timestamp).toLocaleTimeString();
+                html += `
+                    <div class="log-entry log-ami">
+                        <span class="timestamp">${timestamp}</span> 
+                        <strong>${entry.action}</strong> - ${entry.details}
+                    </div>
+                `;
+            }
+            
+            if (html === '') {
+                html = '<div>No AMI events logged yet</div>';
+            }
+            
+            document.getElementById('ami-log-content').innerHTML = html;
+        } else {
+            document.getElementById('ami-log-content').innerHTML = `<div class="log-error">Error: ${data.message}</div>`;
+        }
+    } catch (error) {
+        document.getElementById('ami-log-content').innerHTML = `<div class="log-error">Fetch Error: ${error.message}</div>`;
+    }
+}
+
+async function loadCallHistory() {
+    const campaignId = document.getElementById('campaign-id-input').value.trim();
+    const phoneNumber = document.getElementById('phone-number-input').value.trim();
+    
+    if (!campaignId || !phoneNumber) {
+        document.getElementById('call-history-content').innerHTML = '<div class="log-error">Please enter both Campaign ID and Phone Number</div>';
+        return;
+    }
+    
+    try {
+        const response = await fetch(`/api/debug/call_history/${campaignId}/${phoneNumber}`);
+        const data = await response.json();
+        
+        if (data.success) {
+            let html = `<div><strong>Campaign:</strong> ${data.campaign_id} | <strong>Phone:</strong> ${data.phone_number}</div><hr>`;
+            
+            if (data.history.length === 0) {
+                html += data.capture_enabled
+                    ? '<div>No debug history found for this call</div>'
+                    : '<div>No debug history found for this call (capture is off - tick Capture and retry the call)</div>';
+            } else {
+                for (const entry of data.history.reverse()) {
+                    const timestamp = new Date(entry.timestamp).toLocaleTimeString();
+                    html += `
+                        <div class="log-entry log-call">
+                            <span class="timestamp">${timestamp}</span> 
+                            <strong>${entry.action}</strong> - ${entry.details}
+                        </div>
+                    `;
+                }
+            }
+            
+            document.getElementById('call-history-content').innerHTML = html;
+        } else {
+            document.getElementById('call-history-content').innerHTML = `<div class="log-error">Error: ${data.message}</div>`;
+        }
+    } catch (error) {
+        document.getElementById('call-history-content').innerHTML = `<div class="log-error">Fetch Error: ${error.message}</div>`;
+    }
+}
+
+async function testAMIConnection() {
+    try {
+        const response = await fetch('/api/debug/test_ami_connection', { method: 'POST' });
+        const data = await response.json();
+        
+        if (data.success) {
+            alert(`AMI Connection Test: SUCCESS\nConnection ID: ${data.connection_id}\nPing Sent: ${data.ping_sent}`);
+        } else {
+            alert(`AMI Connection Test: FAILED\nError: ${data.message}`);
+        }
+    } catch (error) {
+        alert(`AMI Connection Test: ERROR\n${error.message}`);
+    }
+}
+
+function getStatusClass(status) {
+    if (['completed', 'answered'].includes(status)) return 'log-success';
+    if (['failed', 'rejected', 'aborted'].includes(status)) return 'log-error';
+    if (['dialing', 'ringing'].includes(status)) return 'log-ami';
+    return 'log-call';
+}
@@ -1,36 +1,99 @@
 # utils/db.py
 import mysql.connector.pooling
+from mysql.connector import HAVE_CEXT
+from mysql.connector.errors import PoolError
 import logging
+import threading
+import time
+import weakref
 from config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME # Import database configurations
+import config # type: ignore
 
-# Configure logging for this module
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Pool settings are optional in config.py (older installs don't have them)
+DB_POOL_SIZE = int(getattr(config, 'DB_POOL_SIZE', 20))
+DB_POOL_RESET_SESSION = bool(getattr(config, 'DB_POOL_RESET_SESSION', False))
+# An exhausted pool raises PoolError straight away; retry a couple of times with a short backoff,
+# then let it propagate so saturation shows up as an error instead of a pile of waiting requests
+DB_POOL_ACQUIRE_ATTEMPTS = 3
+DB_POOL_RETRY_DELAY = 0.05 # seconds, times the attempt number
+DB_CONNECT_TIMEOUT = 5 # seconds for a new TCP connection to MySQL
+# Pinned mode: each thread keeps one plain connection of its own instead of checking one out of the pool.
+# Only worth it when the threads are long-lived and few (every thread that touches the DB holds a MySQL
+# connection until it exits), so it's off unless config.py turns it on.
+DB_PINNED = bool(getattr(config, 'DB_PINNED', False))
+
+# Module logger only; handlers and levels are set up by the app (app.py / wsgi.py), not on import here
 logger = logging.getLogger(__name__)
 
 # Global variable for the database connection pool, initialized to None
 _db_pool = None # Use a leading underscore to suggest it's internal to the module
+_pool_lock = threading.Lock() # so concurrent first requests build one pool, not several
+_pinned = threading.local() # DB_PINNED: this thread's connection
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+def _pinned_connection():
+    """
+    Returns this thread's own connection (DB_PINNED mode), opening it on first use or if the server dropped it.
+    The connection is closed when the thread object goes away, rather than lingering until MySQL's wait_timeout.
+    """
+    conn = getattr(_pinned, 'connection', None)
+    if conn is not None:
+        if conn.is_connected(): # same liveness ping a pool checkout does
+            return conn
+        _close_quietly(conn)
+    conn = mysql.connector.connect(
+        connection_timeout=DB_CONNECT_TIMEOUT,
+        autocommit=False,
+        use_pure=not HAVE_CEXT,
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME
+    )
+    _pinned.connection = conn
+    weakref.finalize(threading.current_thread(), _close_quietly, conn)
+    logger.debug("Opened pinned database connection for thread %s.", threading.current_thread().name)
+    return conn
+
+def _drop_pinned_connection():
+    """Closes and forgets this thread's pinned connection, so the next block opens a fresh one."""
+    conn = getattr(_pinned, 'connection', None)
+    if conn is not None:
+        _pinned.connection = None
+        _close_quietly(conn)
 
 def initialize_db_pool():
     """
     Initializes the global database connection pool using parameters from config.py.
-    This function should be called once at application startup to ensure the pool
-    is ready for use. Subsequent calls will not re-initialize the pool if it already exists.
+    Called lazily by the first DBConnectionManager, so importing this module never touches
+    the database. Subsequent calls will not re-initialize the pool if it already exists.
     """
     global _db_pool
-    if _db_pool is None:
+    with _pool_lock:
+        if _db_pool is not None:
+            return
         logger.info("Attempting to initialize database connection pool.")
         try:
             _db_pool = mysql.connector.pooling.MySQLConnectionPool(
                 pool_name="infocall_app_pool",
-                pool_size=5,  # Default pool size
+                pool_size=DB_POOL_SIZE, # ~ WSGI threads + background workers that hold connections
+                pool_reset_session=DB_POOL_RESET_SESSION,
+                connection_timeout=DB_CONNECT_TIMEOUT,
+                autocommit=False, # sessions start in the read-write mode most blocks want
+                use_pure=not HAVE_CEXT, # C extension protocol codec when it's installed
                 host=DB_HOST,
                 user=DB_USER,
                 password=DB_PASSWORD,
                 database=DB_NAME
             )
-            logger.info("Database connection pool initialized successfully.")
+            logger.info("Database connection pool initialized successfully (size %s, C extension: %s).", DB_POOL_SIZE, HAVE_CEXT)
         except Exception as err:
-            logger.error(f"Failed to initialize database pool: {err}", exc_info=True)
+            logger.error("Failed to initialize database pool: %s", err, exc_info=True)
             raise
 
 class DBConnectionManager:
@@ -39,63 +102,119 @@ class DBConnectionManager:
     Ensures proper connection handling, including explicit transaction control and
     rollback on exceptions, and resource cleanup.
     """
-    def __init__(self, dictionary_cursor=False):
+    def __init__(self, dictionary_cursor=False, readonly=False):
         self.connection = None
         self.cursor = None
         self.dictionary_cursor = dictionary_cursor
+        self.readonly = readonly
 
     def __enter__(self):
-        # Ensure the pool is initialized before attempting to get a connection
+        if DB_PINNED:
+            return self._enter_pinned()
+
+        # Create the pool on first use (raises if the database can't be reached)
         if _db_pool is None:
-            logger.error("Database pool is not initialized. Please call initialize_db_pool() before using DBConnectionManager.")
-            raise Exception("Database pool is not available.")
+            initialize_db_pool()
 
         try:
-            self.connection = _db_pool.get_connection()
-            # Set autocommit to False for explicit transaction management
-            self.connection.autocommit = False
+            for attempt in range(DB_POOL_ACQUIRE_ATTEMPTS):
+                try:
+                    self.connection = _db_pool.get_connection()
+                    break
+                except PoolError:
+                    if attempt == DB_POOL_ACQUIRE_ATTEMPTS - 1:
+                        raise
+                    logger.warning("Database pool exhausted, retrying (attempt %s/%s)", attempt + 1, DB_POOL_ACQUIRE_ATTEMPTS)
+                    time.sleep(DB_POOL_RETRY_DELAY * (attempt + 1))
+            # Set autocommit to False for explicit transaction management; read-only blocks keep it on,
+            # so their SELECTs don't open a transaction that then has to be ended with another round trip
+            self._set_autocommit(self.readonly)
             self.cursor = self.connection.cursor(dictionary=self.dictionary_cursor)
             logger.debug("Successfully acquired database connection and cursor from pool.")
             return self.cursor, self.connection
         except Exception as err:
-            logger.error(f"Error acquiring database connection from pool: {err}", exc_info=True)
+            logger.error("Error acquiring database connection from pool: %s", err, exc_info=True)
             # Ensure any acquired resources are closed if an error occurs during __enter__
+            # (each step on its own, so a failing cursor close can't keep the connection from going back)
             if self.cursor:
                 try: self.cursor.close()
-                except Exception as close_err: logger.warning(f"Error closing cursor during __enter__ error handling: {close_err}")
+                except Exception as close_err: logger.warning("Error closing cursor during __enter__ error handling: %s", close_err)
+                self.cursor = None
             if self.connection:
+                # A SET autocommit that failed part-way leaves the session's mode unknown; make the next checkout set it
+                raw = getattr(self.connection, '_cnx', self.connection)
+                if getattr(raw, '_infocall_autocommit', None) is not None:
+                    raw._infocall_autocommit = None
                 try: self.connection.close() # Return connection to pool
-                except Exception as close_err: logger.warning(f"Error closing connection during __enter__ error handling: {close_err}")
+                except Exception as close_err: logger.warning("Error closing connection during __enter__ error handling: %s", close_err)
+                self.connection = None
             raise # Re-raise the exception to propagate it
 
+    def _enter_pinned(self):
+        try:
+            self.connection = _pinned_connection()
+            self._set_autocommit(self.readonly)
+            self.cursor = self.connection.cursor(dictionary=self.dictionary_cursor)
+            return self.cursor, self.connection
+        except Exception as err:
+            logger.error("Error acquiring pinned database connection: %s", err, exc_info=True)
+            if self.cursor:
+                try: self.cursor.close()
+                except Exception as close_err: logger.warning("Error closing cursor during __enter__ error handling: %s", close_err)
+                self.cursor = None
+            # The session's state is unknown now; start over with a new connection next time
+            _drop_pinned_connection()
+            self.connection = None
+            raise
+
+    def _set_autocommit(self, wanted):
+        """
+        Sends SET autocommit only when the pooled session isn't already in that mode. The last mode set is
+        remembered on the underlying connection, which outlives each checkout. With pool_reset_session on,
+        a returned session goes back to the server default, so it's always set then.
+        """
+        raw = getattr(self.connection, '_cnx', self.connection) # PooledMySQLConnection wraps the real one
+        if (DB_POOL_RESET_SESSION and not DB_PINNED) or getattr(raw, '_infocall_autocommit', False) != wanted:
+            self.connection.autocommit = wanted
+            raw._infocall_autocommit = wanted
+        # If the driver reconnected the session it's back to the pool's autocommit=False; a read-only block
+        # then runs inside a transaction, which __exit__ ends, so a stale record never leaks a snapshot
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.cursor:
             try:
                 self.cursor.close()
                 logger.debug("Database cursor closed.")
             except mysql.connector.Error as err:
-                logger.warning(f"Error closing cursor: {err}")
+                logger.warning("Error closing cursor: %s", err)
 
         if self.connection:
             try:
                 # Rollback transaction if an exception occurred within the 'with' block
                 if exc_type is not None:
-                    logger.warning(f"Exception of type {exc_type.__name__} occurred in 'with' block, attempting transaction rollback.")
+                    logger.warning("Exception of type %s occurred in 'with' block, attempting transaction rollback.", exc_type.__name__)
                     try:
                         self.connection.rollback()
                         logger.info("Transaction rolled back successfully.")
                     except Exception as rb_err:
-                        logger.error(f"Error during transaction rollback: {rb_err}", exc_info=True)
+                        logger.error("Error during transaction rollback: %s", rb_err, exc_info=True)
+                elif self.connection.in_transaction:
+                    # Nothing committed (a read-only block): end the transaction here so the pooled connection
+                    # doesn't carry a stale snapshot to its next user when pool_reset_session is off
+                    self.connection.rollback()
                 # If no exception, it is expected that the user of this context manager
                 # will explicitly call connection.commit() if changes need to be saved.
-                # The connection is always returned to the pool.
-                self.connection.close() # Returns the connection to the pool
-                logger.debug("Database connection returned to pool.")
+                # The connection is always returned to the pool (a pinned one stays open for this thread's next block).
+                if not DB_PINNED:
+                    self.connection.close() # Returns the connection to the pool
+                    logger.debug("Database connection returned to pool.")
             except mysql.connector.Error as err:
-                 logger.error(f"Error returning connection to pool: {err}", exc_info=True)
+                 logger.error("Error returning connection to pool: %s", err, exc_info=True)
+                 if DB_PINNED:
+                     _drop_pinned_connection() # e.g. the rollback failed; don't reuse a session in an unknown state
         return False # Propagate exceptions if any (True would suppress them)
 
-def get_db_cursor(dictionary=False):
+def get_db_cursor(dictionary=False, readonly=False):
     """
     Convenience function to get a DBConnectionManager instance.
     Use this function with a 'with' statement to ensure proper
@@ -118,16 +237,10 @@ def get_db_cursor(dictionary=False):
     Args:
         dictionary (bool): If True, the cursor will return results as dictionaries.
                            Otherwise, results are returned as tuples.
+        readonly (bool): If True, the connection stays in autocommit mode. For blocks
+                         that only SELECT; don't write (or commit) through it.
 
     Returns:
         DBConnectionManager: An instance of the context manager for database operations.
     """
-    return DBConnectionManager(dictionary_cursor=dictionary)
-
-# Initialize the database pool when this module is imported.
-# In a Flask application, it's often more robust to call this from app.py
-# (e.g., within an app context setup or a dedicated initialization function)
-# to ensure it's precisely controlled during application startup.
-# However, for self-containment and to address potential circular imports with 'app',
-# initializing it here ensures the pool is ready as soon as 'db.py' is imported.
-initialize_db_pool()
\ No newline at end of file
+    return DBConnectionManager(dictionary_cursor=dictionary, readonly=readonly)
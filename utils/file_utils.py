@@ -1,27 +1,41 @@
 # utils/file_utils.py
 import os
 import logging
-from pydub import AudioSegment # Moved from app.py
+import subprocess
+
+ALLOWED_AUDIO_EXTENSIONS = frozenset(('.wav', '.mp3', '.m4a', '.aac'))
 
 def allowed_file(filename):
     """
     Checks if a filename has an allowed audio extension.
     """
-    ALLOWED_EXTENSIONS = {'wav', 'mp3', 'm4a', 'aac'}
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return os.path.splitext(filename)[1].lower() in ALLOWED_AUDIO_EXTENSIONS
 
 def is_audio_file(filepath):
     """
-    Attempts to load an audio file to validate its format.
+    Checks that a file holds an audio stream, reading only its headers (RIFF header for .wav,
+    ffprobe for everything else) instead of decoding the whole file.
     """
     if not os.path.exists(filepath):
         logging.error(f"Audio file not found at path: {filepath}")
         return False
     try:
-        audio = AudioSegment.from_file(filepath)
-        logging.debug(f"Validated audio file: {filepath}")
-        return True
+        if os.path.splitext(filepath)[1].lower() == '.wav':
+            with open(filepath, 'rb') as f:
+                header = f.read(12)
+            if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+                logging.debug(f"Validated audio file: {filepath}")
+                return True
+            # Not a plain RIFF/WAVE file; let ffprobe decide
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'a:0', '-show_entries', 'stream=codec_type', '-of', 'csv=p=0', filepath],
+            capture_output=True, timeout=5, check=False
+        )
+        if result.returncode == 0 and b'audio' in result.stdout:
+            logging.debug(f"Validated audio file: {filepath}")
+            return True
+        logging.error(f"Error validating audio file {filepath}: {result.stderr.decode('utf-8', 'replace').strip() or 'no audio stream'}")
+        return False
     except Exception as e:
         logging.error(f"Error validating audio file {filepath}: {e}", exc_info=True)
-        return False
\ No newline at end of file
+        return False
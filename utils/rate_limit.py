@@ -0,0 +1,36 @@
+# utils/rate_limit.py
+import threading
+import time
+
+class TokenBucket:
+    """
+    Token bucket on the monotonic clock, shared by the call dialer and the SMS sender.
+    acquire() only waits until the next token is due, so time the caller already spent
+    (originating, sending) counts toward the interval instead of adding to it.
+    """
+
+    def __init__(self, tokens_per_sec, burst=1, cancel_event=None):
+        self.interval = 1.0 / tokens_per_sec
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+        # Setting this (cancel(), or whoever owns a passed-in event) wakes and fails any acquire()
+        self.cancelled = cancel_event if cancel_event is not None else threading.Event()
+
+    def acquire(self):
+        """Takes one token, blocking until it's available. Returns False if cancelled meanwhile."""
+        while not self.cancelled.is_set():
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) / self.interval)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) * self.interval
+            self.cancelled.wait(wait)
+        return False
+
+    def cancel(self):
+        self.cancelled.set()
@@ -3,11 +3,16 @@ from flask import session, flash, redirect, url_for
 from functools import wraps
 import logging
 
+_login_url = None # url_for('auth.index'), built on the first redirect; the URL map doesn't change at runtime
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            flash('You need to be logged in to access this page.')
-            return redirect(url_for('auth.index'))
-        return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+        if 'user_id' in session:
+            return f(*args, **kwargs)
+        global _login_url
+        if _login_url is None:
+            _login_url = url_for('auth.index')
+        flash('You need to be logged in to access this page.')
+        return redirect(_login_url)
+    return decorated_function
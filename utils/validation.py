@@ -1,22 +1,56 @@
 ## utils/validation.py
 import logging
+import re
+
+_NON_DIGIT_RE = re.compile(r'\D+')
+
+def strip_non_digits(value):
+    """Returns only the digits of value (None-safe); the loop runs in C via a precompiled regex."""
+    if not value:
+        return ""
+    if value.isdecimal(): # already clean (stored numbers usually are): same set \d matches, no regex pass
+        return value
+    return _NON_DIGIT_RE.sub('', value)
+
+RESTRICTED_PHONE_PREFIXES = ('911', '411', '511')
+VALID_PHONE_LENGTHS = frozenset((4, 10))
+
+def normalize_phone_number(phone_number):
+    """
+    Strips a phone number to digits and validates it in one pass.
+    Returns (clean_number, None) for valid, (None, error_message) for invalid.
+    """
+    clean_number = strip_non_digits(phone_number)
+
+    if not clean_number:
+        return None, "Phone number cannot be empty."
+    if clean_number.startswith(RESTRICTED_PHONE_PREFIXES):
+        restricted = clean_number[:3] # every restricted prefix is three digits
+        return None, f"Cannot use restricted number '{restricted}'."
+    if len(clean_number) not in VALID_PHONE_LENGTHS:
+        return None, "Phone number must be 4 or 10 digits."
+    return clean_number, None
 
 def validate_phone_number(phone_number):
     """
     Validates a phone number, checking for restricted numbers and length.
     Returns (True, None) for valid, (False, error_message) for invalid.
     """
-    restricted_numbers = ['911', '411', '511']
-    clean_number = ''.join(filter(str.isdigit, phone_number or ""))
+    clean_number, error_message = normalize_phone_number(phone_number)
+    return clean_number is not None, error_message
 
-    if not clean_number:
-        return False, "Phone number cannot be empty."
-    for restricted in restricted_numbers:
-        if clean_number == restricted or clean_number.startswith(restricted):
-            return False, f"Cannot use restricted number '{restricted}'."
-    if not (len(clean_number) == 4 or len(clean_number) == 10):
-        return False, "Phone number must be 4 or 10 digits."
-    return True, None
+_E164_RE = re.compile(r'\+[1-9]\d{7,14}')
+
+def is_e164_phone_number(phone_number):
+    """True if phone_number is an E.164 string like '+15551234567' (the format Twilio expects)."""
+    # Cheap prefix/length reject before touching the regex
+    if not phone_number or phone_number[0] != '+' or not (9 <= len(phone_number) <= 16):
+        return False
+    return _E164_RE.fullmatch(phone_number) is not None
+
+# Anything that isn't a letter, number, whitespace or period; exactly the characters for which
+# c.isalnum() or c.isspace() or c == '.' is false (\w also matches '_', hence the alternative)
+_CALLER_ID_DISALLOWED_RE = re.compile(r'[^\w\s.]|_')
 
 def validate_caller_id_name(caller_id_name):
     """
@@ -26,8 +60,8 @@ def validate_caller_id_name(caller_id_name):
     if caller_id_name is None:
         return "" # Default to empty string or suitable default if None
     
-    # Remove any characters that are not letters, numbers, spaces, or periods
-    cleaned_name = ''.join(c for c in caller_id_name if c.isalnum() or c.isspace() or c == '.')
+    # Remove any characters that are not letters, numbers, spaces, or periods (one C-level pass)
+    cleaned_name = _CALLER_ID_DISALLOWED_RE.sub('', caller_id_name)
     
     # Trim to max 15 characters
     return cleaned_name[:15]
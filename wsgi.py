@@ -13,16 +13,22 @@ logging.basicConfig(stream=sys.stderr, level=logging.INFO)
 log = logging.getLogger(__name__)
 log.info("WSGI script started.")
 
-# Enable debug mode if environment variable is set
+# Enable debug mode if environment variable is set (on the root logger, so every module's logger inherits it)
 if os.environ.get("INFOCALL_DEBUG") == "1":
-    log.setLevel(logging.DEBUG)
+    logging.root.setLevel(logging.DEBUG)
     log.debug("Debug mode activated via INFOCALL_DEBUG environment variable.")
 
+def _flush_stderr():
+    sys.stderr.flush()
+
+def _excepthook(exc_type, exc_value, exc_tb):
+    log.critical("Unhandled top-level exception", exc_info=(exc_type, exc_value, exc_tb))
+
 # Ensure logs flush on exit
-atexit.register(lambda: sys.stderr.flush())
+atexit.register(_flush_stderr)
 
 # Trap top-level unhandled exceptions
-sys.excepthook = lambda *args: log.critical("Unhandled top-level exception", exc_info=args)
+sys.excepthook = _excepthook
 
 try:
     log.info("Attempting to import Flask app from app.py...")